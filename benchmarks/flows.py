@@ -0,0 +1,103 @@
+"""
+Benchmarks typical pydataproc flows against the in-memory fake DataProc API
+(pydataproc.testing), measuring wall time and the number of API calls made.
+
+Run from the repository root:
+
+    python -m benchmarks.flows [--latency 0.02] [--only create_and_wait ...]
+
+Latency is simulated per request (or batch), so timings reflect round trips
+rather than real cluster/job run times, which are scaled down to fractions
+of a second.
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+from pydataproc.jobs import Jobs
+from pydataproc.testing import FakeDataProc, FakeDataProcAPI
+from pydataproc.waiter import Waiter
+
+
+def fast_waiter():
+    # the fake's lifecycles are scaled down, so scale down polling to match
+    return Waiter(initial_interval=0.05, max_interval=0.5)
+
+
+def create_and_wait(dataproc):
+    dataproc.clusters().create('bench-cluster', block=True, waiter=fast_waiter())
+
+
+def submit_and_wait(dataproc):
+    dataproc.api.add_cluster('bench-cluster')
+    job = dataproc.clusters('bench-cluster').submit_job('gs://bench/job.py', args='--day 1')
+    job.wait(stream_logs=False, waiter=fast_waiter())
+
+
+def list_10k_jobs(dataproc):
+    for i in range(10000):
+        dataproc.api.add_job('job-{}'.format(i), state='DONE')
+    dataproc.api_stats.reset()
+
+    count = sum(1 for _ in dataproc.jobs().iter_jobs(running=False, page_size=100))
+    assert count == 10000
+
+
+def status_of_500_jobs_sequential(dataproc):
+    job_ids = _add_jobs(dataproc, 500)
+    for job_id in job_ids:
+        dataproc.jobs(job_id, lazy=True).status()
+
+
+def status_of_500_jobs_batched(dataproc):
+    job_ids = _add_jobs(dataproc, 500)
+    statuses = Jobs(dataproc).statuses(job_ids)
+    assert len(statuses) == 500
+
+
+def _add_jobs(dataproc, count):
+    job_ids = ['job-{}'.format(i) for i in range(count)]
+    for job_id in job_ids:
+        dataproc.api.add_job(job_id, state='RUNNING')
+    dataproc.api_stats.reset()
+    return job_ids
+
+
+BENCHMARKS = OrderedDict([
+    ('create_and_wait', create_and_wait),
+    ('submit_and_wait', submit_and_wait),
+    ('list_10k_jobs', list_10k_jobs),
+    ('status_of_500_jobs_sequential', status_of_500_jobs_sequential),
+    ('status_of_500_jobs_batched', status_of_500_jobs_batched),
+])
+
+
+def run(name, latency):
+    """
+    Runs a single benchmark against a fresh fake API.
+
+    :return: tuple of (wall time in seconds, number of API calls)
+    """
+    dataproc = FakeDataProc(FakeDataProcAPI(latency=latency))
+
+    start = time.time()
+    BENCHMARKS[name](dataproc)
+    return time.time() - start, dataproc.api_stats.total_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='simulated latency per request, in seconds (default: 0.02)')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS),
+                        help='only run the given benchmarks')
+    args = parser.parse_args()
+
+    print('{:<32} {:>10} {:>10}'.format('benchmark', 'wall (s)', 'API calls'))
+    for name in args.only or BENCHMARKS:
+        elapsed, calls = run(name, args.latency)
+        print('{:<32} {:>10.3f} {:>10}'.format(name, elapsed, calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmarks pydataproc startup: importing the package, constructing a DataProc
+and building the API client from the discovery document, both cold (fetched)
+and warm (from the on-disk cache).
+
+Run from the repository root:
+
+    python -m benchmarks.startup [--repeat 5]
+
+Each measurement runs in a fresh interpreter, so module caches don't carry
+over between runs. The cold client build needs network access, and is
+reported as n/a without it.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+IMPORT = """
+import time
+start = time.time()
+import pydataproc
+print(time.time() - start)
+"""
+
+CONSTRUCT = """
+import time
+start = time.time()
+from pydataproc import DataProc
+DataProc('bench-project')
+print(time.time() - start)
+"""
+
+BUILD_CLIENT = """
+import time
+start = time.time()
+from pydataproc.dataproc import _build_service
+_build_service('dataproc', 'v1')
+print(time.time() - start)
+"""
+
+
+def _time(script, env):
+    output = subprocess.check_output([sys.executable, '-c', script], env=env,
+                                     stderr=subprocess.STDOUT)
+    return float(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def _median(script, env, repeat, before=None):
+    times = []
+    for _ in range(repeat):
+        if before:
+            before()
+        try:
+            times.append(_time(script, env))
+        except subprocess.CalledProcessError:
+            return None
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs to take the median of (default: 5)')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    env = dict(os.environ, PYDATAPROC_CACHE_DIR=cache_dir)
+
+    def clear_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    try:
+        results = [
+            ('import pydataproc', _median(IMPORT, env, args.repeat)),
+            ('DataProc()', _median(CONSTRUCT, env, args.repeat)),
+            ('build client (cold)', _median(BUILD_CLIENT, env, args.repeat, before=clear_cache)),
+        ]
+        # leave the last cold build's document in the cache for the warm runs
+        warm = _median(BUILD_CLIENT, env, args.repeat) if results[-1][1] is not None else None
+        results.append(('build client (warm)', warm))
+    finally:
+        clear_cache()
+
+    print('{:<24} {:>12}'.format('benchmark', 'median (ms)'))
+    for name, elapsed in results:
+        print('{:<24} {:>12}'.format(name, 'n/a' if elapsed is None else
+                                     '{:.1f}'.format(elapsed * 1000)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""
+asyncio front end to pydataproc (Python 3.7+ only).
+
+API calls are run on a bounded pool of worker threads, so at most
+`max_concurrency` calls are in flight at once, while any waiting (for clusters
+to come up, or jobs to finish) is done on the event loop with asyncio.sleep,
+rather than tying up a thread.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+
+from pydataproc.cluster import Cluster
+from pydataproc.dataproc import DataProc
+from pydataproc.job import Job
+from pydataproc.logger import log
+from pydataproc.operation import Operation
+from pydataproc.waiter import Waiter
+
+
+async def _wait(waiter, poll, is_done, description='condition'):
+    """
+    Awaitable version of Waiter.wait: awaits poll() until is_done(result) is True,
+    sleeping on the event loop (for the Waiter's intervals) between polls.
+    """
+    waiter = waiter or Waiter()
+    start = waiter.clock()
+    intervals = waiter.intervals(start, description)
+
+    while True:
+        elapsed = waiter.clock() - start
+        value = await poll()
+        if waiter.on_progress:
+            waiter.on_progress(value, elapsed)
+
+        if is_done(value):
+            return value
+
+        await asyncio.sleep(next(intervals))
+
+
+async def _wait_for_operation(dataproc, operation, waiter):
+    """
+    Awaitable version of Operation.result: awaits the operation finishing,
+    raising an OperationFailedException if it failed.
+    """
+    if not operation.done(refresh=False):
+        log.info("Waiting for {}...".format(operation.description))
+        await _wait(
+            waiter,
+            lambda: dataproc._run(lambda dp: operation.info(refresh=True)),
+            lambda info: info.get('done'),
+            operation.description
+        )
+    operation.raise_for_error()
+    return operation
+
+
+class AsyncDataProc(object):
+    """
+    Mirrors DataProc, but with awaitable cluster/job operations, allowing many
+    clusters and jobs to be managed concurrently from a single event loop.
+
+    Any additional keyword arguments are passed to the underlying DataProc client.
+    """
+
+    def __init__(self, project, region='europe-west1', zone='europe-west1-b',
+                 max_concurrency=10, **kwargs):
+
+        assert max_concurrency > 0
+
+        self.project = project
+        self.region = region
+        self.zone = zone
+        self.max_concurrency = max_concurrency
+
+        kwargs.setdefault('max_connections', max_concurrency)
+        self.dataproc = self._build_dataproc(**kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def _build_dataproc(self, **kwargs):
+        """Builds the (thread-safe) DataProc client shared by the worker threads."""
+        return DataProc(self.project, region=self.region, zone=self.zone, **kwargs)
+
+    async def _run(self, fn, *args, **kwargs):
+        """
+        Runs fn(dataproc, *args, **kwargs) on a worker thread.
+        """
+        def call():
+            return fn(self.dataproc, *args, **kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    def clusters(self, cluster_name=None):
+        """
+        Allows the user to interact with a specific cluster or all
+        clusters (depending upon whether cluster_name is specified).
+
+        No API call is made to fetch the cluster: if it does not exist, a
+        NoSuchClusterException is raised on first use.
+
+        :param cluster_name: string, name of cluster to fetch (optional)
+        :return: AsyncCluster/AsyncClusters
+        """
+        if cluster_name:
+            return AsyncCluster(self, cluster_name)
+
+        return AsyncClusters(self)
+
+    def jobs(self, job_id=None):
+        """
+        Allows the user to interact with a specific job or all
+        jobs (depending upon whether job_id is specified).
+
+        No API call is made to fetch the job: if it does not exist, a
+        NoSuchJobException is raised on first use.
+
+        :param job_id: string, ID of job to fetch (optional)
+        :return: AsyncJob/AsyncJobs
+        """
+        if job_id:
+            return AsyncJob(self, job_id)
+
+        return AsyncJobs(self)
+
+    def close(self):
+        """
+        Shuts down the worker threads.
+
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncClusters(object):
+
+    def __init__(self, dataproc):
+
+        assert dataproc
+
+        self.dataproc = dataproc
+
+    async def list(self, minimal=True, filter=None):
+        """
+        Awaitable version of Clusters.list.
+
+        :param minimal: returns only the cluster state if set to True.
+        :param filter: string, API filter expression (optional)
+        :return: dict of cluster name -> cluster information
+        """
+        return await self.dataproc._run(
+            lambda dp: dp.clusters().list(minimal=minimal, filter=filter))
+
+    async def create(self, cluster_name, block=True, waiter=None, **kwargs):
+        """
+        Awaitable version of Clusters.create. Any additional keyword arguments
+        (num_workers, worker_type etc.) are passed to Clusters.create.
+
+        If block is set to True, waits (without blocking the event loop) until the
+        creation operation finishes. If the cluster errors, an
+        OperationFailedException will be raised.
+
+        :param cluster_name: the name of the cluster
+        :param block: whether to wait for the cluster to be ready.
+        :param waiter: the Waiter to poll with when blocking (optional)
+        :return: AsyncCluster object
+        """
+        created = await self.dataproc._run(
+            lambda dp: dp.clusters().create(cluster_name, block=False, **kwargs)
+        )
+        cluster = AsyncCluster(self.dataproc, cluster_name)
+        cluster.operation = created.operation
+
+        if not block:
+            return cluster
+
+        await _wait_for_operation(self.dataproc, cluster.operation, waiter)
+        log.info("Cluster '{}' is ready.".format(cluster_name))
+        return cluster
+
+
+class AsyncCluster(object):
+
+    def __init__(self, dataproc, cluster_name):
+
+        assert dataproc
+        assert cluster_name
+
+        self.dataproc = dataproc
+        self.cluster_name = cluster_name
+        self.operation = None
+
+    async def _run(self, method, *args, **kwargs):
+        def call(dp):
+            cluster = dp.clusters(self.cluster_name, lazy=True)
+            return getattr(cluster, method)(*args, **kwargs)
+
+        return await self.dataproc._run(call)
+
+    async def exists(self):
+        """Awaitable version of Cluster.exists."""
+        return await self._run('exists')
+
+    async def is_running(self, refresh=False):
+        """Awaitable version of Cluster.is_running."""
+        return await self._run('is_running', refresh=refresh)
+
+    async def status(self, refresh=False):
+        """Awaitable version of Cluster.status."""
+        return await self._run('status', refresh=refresh)
+
+    async def info(self, refresh=False):
+        """Awaitable version of Cluster.info."""
+        return await self._run('info', refresh=refresh)
+
+    async def bucket(self):
+        """Awaitable version of Cluster.bucket."""
+        return await self._run('bucket')
+
+    async def worker_counts(self, refresh=False):
+        """Awaitable version of Cluster.worker_counts."""
+        return await self._run('worker_counts', refresh=refresh)
+
+    async def change_worker_count(self, worker_count=None, block=False, waiter=None,
+                                  secondary_worker_count=None):
+        """Awaitable version of Cluster.change_worker_count."""
+        self.operation = await self._run('change_worker_count', worker_count,
+                                         secondary_worker_count=secondary_worker_count)
+        if block:
+            await _wait_for_operation(self.dataproc, self.operation, waiter)
+        return self.operation
+
+    async def delete(self, block=False, waiter=None):
+        """
+        Awaitable version of Cluster.delete. A cluster still being created or
+        updated is waited for (on the event loop) to settle before deleting it.
+        """
+        log.info('Tearing down cluster {}...'.format(self.cluster_name))
+        try:
+            result = await self._run('_request_delete')
+        except HttpError as e:
+            if e.resp['status'] != '400' or \
+                    await self.status(refresh=True) not in Cluster.BUSY_STATES:
+                raise e
+
+            log.info("Cluster '{}' is busy, waiting for it to settle before deleting...".format(
+                self.cluster_name))
+            await _wait(
+                waiter,
+                lambda: self.status(refresh=True),
+                lambda state: state not in Cluster.BUSY_STATES,
+                "cluster '{}' to settle".format(self.cluster_name)
+            )
+            result = await self._run('_request_delete')
+
+        self.operation = Operation(self.dataproc.dataproc, result['name'], result)
+        if block:
+            await _wait_for_operation(self.dataproc, self.operation, waiter)
+        return self.operation
+
+    async def submit_job(self, *args, **kwargs):
+        """
+        Awaitable version of Cluster.submit_job.
+
+        :return: AsyncJob object
+        """
+        job = await self._run('submit_job', *args, **kwargs)
+        return AsyncJob(self.dataproc, job.job_id)
+
+
+class AsyncJobs(object):
+
+    def __init__(self, dataproc):
+
+        assert dataproc
+
+        self.dataproc = dataproc
+
+    async def list(self, **kwargs):
+        """
+        Awaitable version of Jobs.list. Keyword arguments are passed to Jobs.list.
+
+        :return: dict of job ID -> job information
+        """
+        return await self.dataproc._run(lambda dp: dp.jobs().list(**kwargs))
+
+
+class AsyncJob(object):
+
+    def __init__(self, dataproc, job_id):
+
+        assert dataproc
+        assert job_id
+
+        self.dataproc = dataproc
+        self.job_id = job_id
+
+    async def _run(self, method, *args, **kwargs):
+        def call(dp):
+            job = dp.jobs(self.job_id, lazy=True)
+            return getattr(job, method)(*args, **kwargs)
+
+        return await self.dataproc._run(call)
+
+    async def exists(self):
+        """Awaitable version of Job.exists."""
+        return await self._run('exists')
+
+    async def info(self, refresh=False):
+        """Awaitable version of Job.info."""
+        return await self._run('info', refresh=refresh)
+
+    async def status(self, refresh=False):
+        """Awaitable version of Job.status."""
+        return await self._run('status', refresh=refresh)
+
+    async def wait(self, waiter=None):
+        """
+        Waits (without blocking the event loop) for the job to reach a finished state.
+
+        :param waiter: the Waiter to poll with (optional)
+        :return: string, status of the job once complete
+        """
+        log.info("Waiting for job {} to finish...".format(self.job_id))
+        status = await _wait(
+            waiter,
+            lambda: self.status(refresh=True),
+            lambda state: state in Job.FINISHED_STATES,
+            "job {} to finish".format(self.job_id)
+        )
+
+        log.debug("Job status: {}".format(status))
+        return status
@@ -0,0 +1,156 @@
+import math
+import threading
+import time
+from collections import namedtuple
+
+from pydataproc.cluster import Cluster
+from pydataproc.jobs import Jobs
+from pydataproc.logger import log
+
+# a change made to a cluster's (primary, secondary) worker counts
+ScalingEvent = namedtuple('ScalingEvent', ['cluster_name', 'active_jobs', 'workers', 'target'])
+
+
+class Autoscaler(object):
+    """
+    Scales a cluster's primary and secondary (preemptible) workers with its
+    load, measured as the number of active jobs on the cluster.
+
+    The cluster is sized for `jobs_per_worker` active jobs per worker, within
+    the given bounds. Extra workers are added to the primary group up to
+    `max_workers`, then to the secondary group, and removed in reverse.
+
+    To avoid flapping, after each change the cluster isn't scaled up again for
+    `scale_up_cooldown` seconds, or down for `scale_down_cooldown` seconds. It
+    is also only scaled down once its target size is more than `hysteresis`
+    (as a fraction of its current size) below its current size. Each update is
+    waited for, with the given Waiter, before deciding again.
+    """
+
+    def __init__(self, dataproc, cluster_name, min_workers=2, max_workers=10,
+                 min_secondary_workers=0, max_secondary_workers=0, jobs_per_worker=1,
+                 scale_up_cooldown=60, scale_down_cooldown=300, hysteresis=0.25,
+                 waiter=None, clock=time.time):
+
+        assert dataproc
+        assert cluster_name
+        assert 0 < min_workers <= max_workers
+        assert 0 <= min_secondary_workers <= max_secondary_workers
+        assert jobs_per_worker > 0
+        assert 0 <= hysteresis < 1
+
+        self.dataproc = dataproc
+        self.cluster = Cluster(dataproc, cluster_name, lazy=True)
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.min_secondary_workers = min_secondary_workers
+        self.max_secondary_workers = max_secondary_workers
+        self.jobs_per_worker = jobs_per_worker
+        self.scale_up_cooldown = scale_up_cooldown
+        self.scale_down_cooldown = scale_down_cooldown
+        self.hysteresis = hysteresis
+        self.waiter = waiter
+        self.clock = clock
+
+        self._jobs = Jobs(dataproc)
+        self._last_change = None
+        self._stopped = threading.Event()
+
+    def target(self, active_jobs):
+        """
+        Returns the worker counts the cluster should have for the given load.
+
+        :param active_jobs: int, number of active jobs on the cluster
+        :return: tuple of (primary worker count, secondary worker count)
+        """
+        total = int(math.ceil(active_jobs / float(self.jobs_per_worker)))
+        primary = min(max(total, self.min_workers), self.max_workers)
+        secondary = min(max(total - primary, self.min_secondary_workers),
+                        self.max_secondary_workers)
+        return primary, secondary
+
+    def step(self):
+        """
+        Checks the cluster's load once, resizing it (and waiting for the resize
+        to finish) if needed. Clusters that aren't RUNNING (e.g. are already
+        being updated) are left alone.
+
+        :return: the ScalingEvent if the cluster was resized, otherwise None
+        """
+        # fetch the full cluster, so worker_counts below is served from the cache
+        if self.cluster.info(refresh=True)['status']['state'] != 'RUNNING':
+            log.debug("Cluster '{}' is not running, not scaling it".format(
+                self.cluster.cluster_name))
+            return None
+
+        active_jobs = len(self._jobs.list(running=True, count=Jobs.MAX_JOBS,
+                                          cluster_name=self.cluster.cluster_name))
+        workers = self.cluster.worker_counts()
+        target = self.target(active_jobs)
+        if target == workers or not self._should_scale(workers, target):
+            return None
+
+        log.info("Scaling cluster '{}' from {} to {} (primary, secondary) workers "
+                 "for {} active jobs".format(self.cluster.cluster_name, workers, target,
+                                             active_jobs))
+        self.cluster.change_worker_count(
+            target[0] if target[0] != workers[0] else None,
+            block=True,
+            waiter=self.waiter,
+            secondary_worker_count=target[1] if target[1] != workers[1] else None
+        )
+        # cooldowns run from when the cluster finished resizing
+        self._last_change = self.clock()
+        return ScalingEvent(self.cluster.cluster_name, active_jobs, workers, target)
+
+    def _should_scale(self, workers, target):
+        since_change = None if self._last_change is None else self.clock() - self._last_change
+
+        if sum(target) >= sum(workers):
+            return since_change is None or since_change >= self.scale_up_cooldown
+
+        if since_change is not None and since_change < self.scale_down_cooldown:
+            return False
+
+        in_bounds = (self.min_workers <= workers[0] <= self.max_workers and
+                     self.min_secondary_workers <= workers[1] <= self.max_secondary_workers)
+        return not in_bounds or sum(target) < sum(workers) * (1 - self.hysteresis)
+
+    def run(self, interval=60):
+        """
+        Calls step() every `interval` seconds, until stop() is called. Errors
+        are logged rather than raised, so that one failed check doesn't stop
+        the autoscaler.
+
+        :param interval: seconds between checks
+        :return: None
+        """
+        self._stopped.clear()
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                log.info("Failed to autoscale cluster '{}': {}".format(
+                    self.cluster.cluster_name, e))
+            if self._stopped.wait(interval):
+                return
+
+    def start(self, interval=60):
+        """
+        Runs the autoscaler on a background (daemon) thread.
+
+        :param interval: seconds between checks
+        :return: the Thread
+        """
+        thread = threading.Thread(target=self.run, args=(interval,))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        """
+        Stops the autoscaler after its current check.
+
+        :return: None
+        """
+        self._stopped.set()
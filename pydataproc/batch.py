@@ -0,0 +1,68 @@
+from googleapiclient.errors import HttpError
+
+from pydataproc.logger import log
+
+# maximum number of calls the Google APIs accept in a single batch request
+BATCH_SIZE = 100
+
+
+def execute_batched(dataproc, requests, batch_size=BATCH_SIZE):
+    """
+    Executes a set of API requests, combining them into as few batched HTTP
+    calls as possible (at most `batch_size` requests per call).
+
+    Errors are collected per request rather than raised, so that one failing
+    request doesn't lose the results of the others. Requests failing
+    transiently (e.g. with a 429 or 503) are retried, in a new batch, according
+    to the client's RetryPolicy.
+
+    :param dataproc: the DataProc client the requests were built from
+    :param requests: dict of key -> request (e.g. the result of a jobs().get(...) call)
+    :param batch_size: maximum number of requests per batched HTTP call
+    :return: dict of key -> (response, HttpError), one of which will be None
+    """
+    assert batch_size > 0
+
+    retry_policy = dataproc.executor.retry_policy
+    results = {}
+    keys = list(requests)
+    attempt = 0
+
+    while keys:
+        attempt += 1
+        for start in range(0, len(keys), batch_size):
+            chunk = keys[start:start + batch_size]
+
+            def callback(request_id, response, exception, chunk=chunk):
+                key = chunk[int(request_id)]
+                if exception is not None and not isinstance(exception, HttpError):
+                    raise exception
+                results[key] = (response, exception)
+
+            batch = dataproc.client.new_batch_http_request(callback=callback)
+            for i, key in enumerate(chunk):
+                batch.add(requests[key], request_id=str(i))
+            # the batch only contains GETs, so is safe to retry
+            dataproc.execute(batch, idempotent=True)
+
+        failed = [(key, results[key][1]) for key in keys if results[key][1] is not None]
+        failed = [(key, error) for key, error in failed
+                  if retry_policy.should_retry(attempt, int(error.resp['status']))]
+        if not failed:
+            break
+
+        delay = max(retry_policy.delay(attempt, error.resp.get('retry-after'))
+                    for _, error in failed)
+        log.debug("{} batched requests failed transiently, retrying in {:.1f}s...".format(
+            len(failed), delay))
+        retry_policy.sleep(delay)
+        keys = [key for key, _ in failed]
+
+    return results
+
+
+def is_not_found(error):
+    """
+    Returns True if the given HttpError is a 404.
+    """
+    return error is not None and error.resp['status'] == '404'
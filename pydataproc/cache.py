@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class MetadataCache(object):
+    """
+    A small, thread-safe LRU cache for cluster/job metadata returned by the
+    DataProc API, so that repeated calls to e.g. Cluster.status() and
+    Cluster.bucket() don't each cost a round trip.
+
+    Entries expire `ttl` seconds after they were stored. Once the cache holds
+    `max_size` entries, the least recently used entry is evicted. A ttl of
+    0 (or None) disables caching altogether.
+    """
+
+    def __init__(self, ttl=5, max_size=256, clock=time.time):
+
+        assert max_size > 0
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.ttl) and self.ttl > 0
+
+    def get(self, key):
+        """
+        Fetches an entry from the cache, if present and not yet expired.
+
+        :param key: the cache key, e.g. ('cluster', 'my-cluster')
+        :return: the cached value, or None if absent/expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            # mark as most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores an entry in the cache, evicting the least recently used
+        entry if the cache is full.
+
+        :param key: the cache key, e.g. ('cluster', 'my-cluster')
+        :param value: the value to cache
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, self.clock() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """
+        Removes an entry from the cache, if present.
+
+        :param key: the cache key to remove
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns the cache hit/miss counters.
+
+        :return: dict of counter name -> value
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries)
+            }
+
+    def __len__(self):
+        return len(self._entries)
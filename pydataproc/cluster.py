@@ -1,8 +1,14 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 from googleapiclient.errors import HttpError
 
 from pydataproc.job import Job
 from pydataproc.logger import log
 from pydataproc.errors import NoSuchClusterException, ClusterHasGoneAwayException
+from pydataproc.operation import Operation
+from pydataproc.template import JobTemplate
+from pydataproc.waiter import Waiter
 
 
 class Cluster(object):
@@ -12,20 +18,39 @@ class Cluster(object):
 
     Currently, this will raise an Exception if the cluster does not exist
     during any method call.
+
+    If lazy is set, no API call is made on construction. Instead, the
+    existence of the cluster is checked on first use, and a
+    NoSuchClusterException raised from there if it does not exist.
+
+    `operation` holds the last long-running Operation (creation, update or
+    deletion) started through this object, if any.
     """
 
+    # states in which a cluster can't be deleted (until they finish)
+    BUSY_STATES = ('CREATING', 'UPDATING')
+
     # TODO handle cluster deletion more gracefully
-    def __init__(self, dataproc, cluster_name):
+    def __init__(self, dataproc, cluster_name, lazy=None):
 
         assert dataproc
         assert cluster_name
 
         self.dataproc = dataproc
         self.cluster_name = cluster_name
+        self.operation = None
+        self._verified = False
 
-        if not self.exists():
+        if lazy is None:
+            lazy = dataproc.lazy
+
+        if not lazy and not self.exists():
             raise NoSuchClusterException("Cluster '{}' does not exist".format(cluster_name))
 
+    @property
+    def _cache_key(self):
+        return 'cluster', self.cluster_name
+
     def exists(self):
         """
         Checks if the cluster exists.
@@ -33,54 +58,95 @@ class Cluster(object):
         :return: boolean, True if cluster exists, False otherwise.
         """
         try:
-            self.dataproc.client.projects().regions().clusters().get(
-                projectId=self.dataproc.project,
-                region=self.dataproc.region,
-                clusterName=self.cluster_name
-            ).execute()
+            self.info()
             return True
-        except HttpError as e:
-            if e.resp['status'] == '404':
-                return False
-            raise e
+        except (NoSuchClusterException, ClusterHasGoneAwayException):
+            return False
 
-    def is_running(self):
+    def is_running(self, refresh=False):
         """
         Returns True if the cluster is in the RUNNING state, or
         False otherwise.
 
+        :param refresh: bypass the metadata cache if set to True.
         :return: True if the cluster is RUNNING, False otherwise
         """
-        state = self.status()
+        state = self.status(refresh=refresh)
         return state and state == 'RUNNING'
 
 
-    def status(self):
+    def status(self, refresh=False):
         """
         Returns the current state of the cluster.
 
+        If refresh is set, only the cluster's state is fetched (as a partial
+        response), rather than its full information, which makes polling cheap.
+
+        :param refresh: bypass the metadata cache if set to True.
         :return: string, cluster state
         """
-        info = self.info()
-        return info['status']['state']
+        if not refresh:
+            return self.info()['status']['state']
 
-    def info(self):
+        state = self._get(fields='status.state')['status']['state']
+        cached = self.dataproc.cache.get(self._cache_key)
+        if cached is not None and cached['status']['state'] != state:
+            self.dataproc.cache.invalidate(self._cache_key)
+        return state
+
+    def info(self, refresh=False):
         """
         Returns the full cluster information.
 
+        This is served from the DataProc metadata cache where possible, so
+        the returned dict should be treated as read-only.
+
+        :param refresh: bypass the metadata cache if set to True.
         :return: dict, cluster information
         """
+        if not refresh:
+            cached = self.dataproc.cache.get(self._cache_key)
+            if cached is not None:
+                # seen, even if not by this handle, so it can be reported as gone
+                self._verified = True
+                return cached
+
+        info = self._get()
+        self.dataproc.cache.put(self._cache_key, info)
+        return info
+
+    def _get(self, fields=None):
+        """
+        Fetches the cluster, or only the given fields of it (e.g. 'status.state').
+        """
         try:
-            return self.dataproc.client.projects().regions().clusters().get(
+            request = self.dataproc.client.projects().regions().clusters().get(
                 projectId=self.dataproc.project,
                 region=self.dataproc.region,
-                clusterName=self.cluster_name
-            ).execute()
+                clusterName=self.cluster_name,
+                fields=fields
+            )
+            info = self.dataproc.execute(request)
         except HttpError as e:
             if e.resp['status'] == '404':
-                raise ClusterHasGoneAwayException("'{}' no longer exists".format(self.cluster_name))
+                self.dataproc.cache.invalidate(self._cache_key)
+                raise self._not_found()
             raise e
 
+        self._verified = True
+        return info
+
+    def _not_found(self):
+        """
+        Builds the exception to raise when the API reports the cluster as missing:
+        a NoSuchClusterException if this handle has never seen the cluster (i.e.
+        a lazy handle on first use), or ClusterHasGoneAwayException otherwise,
+        whether the cluster was seen through the API or the metadata cache.
+        """
+        if self._verified:
+            return ClusterHasGoneAwayException("'{}' no longer exists".format(self.cluster_name))
+        return NoSuchClusterException("Cluster '{}' does not exist".format(self.cluster_name))
+
 
     def bucket(self):
         """
@@ -91,86 +157,202 @@ class Cluster(object):
         info = self.info()
         return info['config']['configBucket']
 
-    # TODO allow changing of secondary worker count
-    def change_worker_count(self, worker_count):
+    def worker_counts(self, refresh=False):
         """
-        Update worker count for the cluster.
+        Returns the number of primary and secondary (preemptible) workers the
+        cluster is configured with.
 
-        :param worker_count: int, new worker count
-        :return:
+        :param refresh: bypass the metadata cache if set to True.
+        :return: tuple of (primary worker count, secondary worker count)
         """
-        assert worker_count
+        config = self.info(refresh=refresh)['config']
+        return (config.get('workerConfig', {}).get('numInstances', 0),
+                config.get('secondaryWorkerConfig', {}).get('numInstances', 0))
+
+    def change_worker_count(self, worker_count=None, block=False, waiter=None,
+                            secondary_worker_count=None):
+        """
+        Update the primary and/or secondary (preemptible) worker counts for the
+        cluster. Counts left as None are unchanged.
+
+        If block is set to True, waits for the update to complete, raising an
+        OperationFailedException if it fails.
 
-        patch_config = {
-            "config": {
-                "workerConfig": {
-                    "numInstances": worker_count
-                }
+        :param worker_count: int, new primary worker count
+        :param block: whether to block until the update completes.
+        :param waiter: the Waiter to poll with when blocking (optional)
+        :param secondary_worker_count: int, new secondary worker count
+        :return: the update Operation
+        """
+        assert worker_count or secondary_worker_count is not None
+
+        patch_config = {"config": {}}
+        update_mask = []
+        if worker_count:
+            patch_config["config"]["workerConfig"] = {"numInstances": worker_count}
+            update_mask.append('config.worker_config.num_instances')
+        if secondary_worker_count is not None:
+            patch_config["config"]["secondaryWorkerConfig"] = {
+                "numInstances": secondary_worker_count
             }
-        }
+            update_mask.append('config.secondary_worker_config.num_instances')
+
         try:
-            result = self.dataproc.client.projects().regions().clusters().patch(
+            request = self.dataproc.client.projects().regions().clusters().patch(
                 projectId=self.dataproc.project,
                 region=self.dataproc.region,
                 clusterName=self.cluster_name,
-                updateMask='config.worker_config.num_instances',
-                body=patch_config).execute()
+                updateMask=','.join(update_mask),
+                requestId=uuid.uuid4().hex,
+                body=patch_config)
+            result = self.dataproc.execute(request, idempotent=True)
         except HttpError as e:
             if e.resp['status'] == '404':
-                raise ClusterHasGoneAwayException("'{}' no longer exists".format(self.cluster_name))
+                raise self._not_found()
             raise e
+        finally:
+            self.dataproc.cache.invalidate(self._cache_key)
 
-        # TODO optionally wait for result
-        if result['metadata']['@type'] != 'type.googleapis.com/google.cloud.client.v1.ClusterOperationMetadata':
-            raise Exception('Failed to update worker count on cluster {}'.format(self.cluster_name))
-        return result
+        self.operation = Operation(self.dataproc, result['name'], result)
+        if block:
+            self.operation.result(waiter=waiter)
+        return self.operation
 
-    def delete(self):
+    def delete(self, block=False, waiter=None):
         """
         Deletes the cluster.
 
-        :return: the (dict) results of the deletion
+        Clusters that are still being created or updated can't be deleted until
+        that finishes, so for these the deletion waits (with the given Waiter)
+        for the cluster to settle first. Clusters in ERROR are deleted as normal.
+
+        If block is set to True, waits for the deletion to complete, raising an
+        OperationFailedException if it fails.
+
+        :param block: whether to block until the cluster is deleted.
+        :param waiter: the Waiter to poll with when waiting (optional)
+        :return: the deletion Operation
         """
-        # TODO this doesn't deal with clusters that aren't running (e.g. that failed on startup)
         log.info('Tearing down cluster {}...'.format(self.cluster_name))
         try:
-            return self.dataproc.client.projects().regions().clusters().delete(
+            result = self._request_delete()
+        except HttpError as e:
+            if e.resp['status'] != '400' or self.status(refresh=True) not in self.BUSY_STATES:
+                raise e
+
+            log.info("Cluster '{}' is {}, waiting for it to settle before deleting...".format(
+                self.cluster_name, self.status()))
+            (waiter or Waiter()).wait(
+                lambda: self.status(refresh=True),
+                lambda state: state not in self.BUSY_STATES,
+                "cluster '{}' to settle".format(self.cluster_name)
+            )
+            result = self._request_delete()
+
+        self.operation = Operation(self.dataproc, result['name'], result)
+        if block:
+            self.operation.result(waiter=waiter)
+        return self.operation
+
+    def _request_delete(self):
+        try:
+            request = self.dataproc.client.projects().regions().clusters().delete(
                 projectId=self.dataproc.project,
                 region=self.dataproc.region,
-                clusterName=self.cluster_name).execute()
+                clusterName=self.cluster_name,
+                requestId=uuid.uuid4().hex)
+            return self.dataproc.execute(request, idempotent=True)
         except HttpError as e:
             if e.resp['status'] == '404':
-                raise ClusterHasGoneAwayException("'{}' no longer exists".format(self.cluster_name))
+                raise self._not_found()
             raise e
+        finally:
+            self.dataproc.cache.invalidate(self._cache_key)
 
-    def submit_job(self, file_to_run=None, python_files=None, args="", job_details=None):
+    def submit_job(self, file_to_run=None, python_files=None, args="", job_details=None,
+                   job_id=None):
         """
         Submit a PySpark job to the cluster. Allows optional specification of
-        additional python files, and any job arguments required.
+        additional python files, and any job arguments required. To submit other
+        types of job, or many similar jobs, see JobTemplate.
+
+        The job ID and request ID are set client-side (unless already present in
+        job_details), so that retrying a submission can't launch the job twice.
 
         :param file_to_run: The PySpark file to run. Must be a Google Storage path.
         :param python_files: Specify additional files or a zip location containing additional
         python files to pass to the job. Must be Google Storage paths. Defaults to None.
         :param args: job arguments, as a string. Specify args as you would on the command line, e.g.
-        "-flag1 value_for_flag1 -flag2 value_for_flag2 unflagged_arg"
+        "-flag1 value_for_flag1 -flag2 'quoted value' unflagged_arg"
         :param job_details: the full job_details dict. If specified, overrides the other arguments,
         and is passed directly to the job submission call.
-        :return: the results of the job submission call
+        :param job_id: the ID to give the job. Defaults to a randomly generated ID.
+        :return: the submitted Job
         """
         job_details = job_details or self._build_job_details(file_to_run, python_files, args)
+        return self._submit(self._with_ids(job_details, job_id))
+
+    def submit_jobs(self, specs, max_workers=10):
+        """
+        Submits several jobs to the cluster concurrently.
+
+        Each spec is a dict of keyword arguments to submit_job, e.g.
+        {'file_to_run': 'gs://bucket/job.py', 'args': '-flag value'}. As with
+        submit_job, job and request IDs are set client-side, so retries are idempotent.
+
+        Errors (including invalid specs) are returned rather than raised, so
+        that one failed submission doesn't lose the results of the others.
 
+        :param specs: list of dicts of submit_job arguments
+        :param max_workers: maximum number of submissions in flight at once.
+        :return: list of the submitted Job (or the exception raised submitting it),
+        in the same order as specs
+        """
+        def submit(spec):
+            # build each job within the try, so a malformed spec only fails its own slot
+            try:
+                return self.submit_job(**spec)
+            except Exception as e:
+                log.info("Failed to submit job {}: {}".format(spec, e))
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(submit, specs))
+
+    def _submit(self, job_details):
         try:
-            result = self.dataproc.client.projects().regions().jobs().submit(
+            request = self.dataproc.client.projects().regions().jobs().submit(
                 projectId=self.dataproc.project,
                 region=self.dataproc.region,
                 body=job_details
-            ).execute()
-
-            return Job(self.dataproc, result['reference']['jobId'])
+            )
+            # the request ID makes resubmission safe
+            result = self.dataproc.execute(request, idempotent=True)
         except HttpError as e:
             if e.resp['status'] == '404':
-                raise ClusterHasGoneAwayException("'{}' no longer exists".format(self.cluster_name))
+                raise self._not_found()
             raise e
+        finally:
+            self.dataproc.cache.invalidate(self._cache_key)
+
+        self.dataproc.cache.put(('job', result['reference']['jobId']), result)
+        return Job(self.dataproc, result['reference']['jobId'], lazy=True)
+
+    @staticmethod
+    def _with_ids(job_details, job_id=None):
+        """
+        Returns a copy of job_details with the job's ID and the submission's request
+        ID set (if not already), making the submission idempotent.
+        """
+        job_details = dict(job_details)
+        job = job_details['job'] = dict(job_details['job'])
+        reference = job['reference'] = dict(job.get('reference', {}))
+
+        if job_id:
+            reference['jobId'] = job_id
+        reference.setdefault('jobId', uuid.uuid4().hex)
+        job_details.setdefault('requestId', uuid.uuid4().hex)
+        return job_details
 
     def _build_job_details(self, file_to_run, python_files=None, args=""):
         if python_files:
@@ -178,20 +360,6 @@ class Cluster(object):
 
         assert file_to_run
 
-        job_details = {
-            "projectId": self.dataproc.project,
-            "job": {
-                "placement": {
-                    "clusterName": self.cluster_name
-                },
-                "pysparkJob": {
-                    "mainPythonFileUri": file_to_run,
-                    "args": args.split()
-                },
-            }
-        }
-
-        if python_files:
-            job_details["job"]["pysparkJob"]["pythonFileUris"] = python_files
-
-        return job_details
+        template = JobTemplate('pyspark', mainPythonFileUri=file_to_run, args=args,
+                               pythonFileUris=python_files or None)
+        return template.render(self.dataproc.project, self.cluster_name)
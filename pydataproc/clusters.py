@@ -1,10 +1,16 @@
-import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from googleapiclient.errors import HttpError
 
+from pydataproc.batch import execute_batched, is_not_found
 from pydataproc.cluster import Cluster
 from pydataproc.logger import log
-from pydataproc.errors import ClusterAlreadyExistsException
+from pydataproc.errors import ClusterAlreadyExistsException, ClusterHasGoneAwayException, \
+    OperationFailedException
+from pydataproc.operation import Operation, wait_all
+from pydataproc.summary import ClusterSummary
+from pydataproc.watch import Watch
 
 class Clusters(object):
 
@@ -14,34 +20,212 @@ class Clusters(object):
 
         self.dataproc = dataproc
 
-    def list(self, minimal=True):
+    # partial response fields needed for minimal (state-only) results
+    MINIMAL_LIST_FIELDS = 'clusters(clusterName,status.state),nextPageToken'
+    MINIMAL_GET_FIELDS = 'clusterName,status.state'
+    # partial response fields needed to watch for changes
+    WATCH_LIST_FIELDS = 'clusters(clusterName,status.state,status.stateStartTime),nextPageToken'
+    WATCH_GET_FIELDS = 'clusterName,status.state,status.stateStartTime'
+
+    def list(self, minimal=True, filter=None):
         """
         Queries the DataProc API, returning a dict of all currently active clusters,
         keyed by cluster name.
 
-        If 'minimal' is specified, each cluster's current state will be returned,
-        otherwise the full cluster configuration will be returned.
+        If 'minimal' is specified, each cluster's current state will be returned
+        (and only that is fetched), otherwise the full cluster configuration will
+        be returned.
+
+        If filter is specified, only the matching clusters are returned. Filters
+        are evaluated by the API, and are of the form 'field = value', combined
+        with AND. The fields are status.state (a state, ACTIVE or INACTIVE),
+        clusterName and labels.[KEY] (where a value of * matches any), e.g.
+        'status.state = ACTIVE AND labels.env = staging'.
 
         :param minimal: returns only the cluster state if set to True.
+        :param filter: string, API filter expression (optional)
         :return: dict of cluster name -> cluster information
         """
-        result = self.dataproc.client.projects().regions().clusters().list(
-            projectId=self.dataproc.project,
-            region=self.dataproc.region).execute()
         if minimal:
-            return {c['clusterName']: c['status']['state'] for c in result.get('clusters', [])}
-        return {c['clusterName']: c for c in result.get('clusters', [])}
+            return {c['clusterName']: c['status']['state']
+                    for c in self.iter_clusters(filter=filter, fields=self.MINIMAL_LIST_FIELDS)}
+
+        result = {}
+        for c in self.iter_clusters(filter=filter):
+            self.dataproc.cache.put(('cluster', c['clusterName']), c)
+            result[c['clusterName']] = c
+        return result
+
+    def summaries(self, filter=None, keep_raw=False):
+        """
+        Queries the DataProc API, returning a compact ClusterSummary (name,
+        state, state start time, worker counts and labels) for each cluster,
+        rather than its full configuration. Only those fields are fetched,
+        unless keep_raw is set, in which case each summary also keeps the full
+        cluster resource as `raw`.
+
+        :param filter: string, API filter expression (see list)
+        :param keep_raw: keep each full cluster resource if set to True.
+        :return: list of ClusterSummary objects
+        """
+        return [
+            ClusterSummary.from_resource(c, keep_raw) for c in self.iter_clusters(
+                filter=filter, fields=None if keep_raw else ClusterSummary.LIST_FIELDS)
+        ]
+
+    def iter_clusters(self, page_size=None, filter=None, fields=None):
+        """
+        Queries the DataProc API, yielding the full information for each active
+        cluster in turn. Pages of results are only fetched as the generator is
+        consumed, so stopping iteration early stops any further API calls.
+
+        :param page_size: number of clusters to fetch per API call. Defaults to the API default.
+        :param filter: string, API filter expression (see list)
+        :param fields: partial response fields to fetch, e.g.
+        'clusters(clusterName,status.state),nextPageToken'. Defaults to everything.
+        :return: generator of cluster information dicts
+        """
+        page_token = None
+        while True:
+            request = self.dataproc.client.projects().regions().clusters().list(
+                projectId=self.dataproc.project,
+                region=self.dataproc.region,
+                filter=filter,
+                pageSize=page_size,
+                pageToken=page_token,
+                fields=fields
+            )
+            page = self.dataproc.execute(request)
+
+            for cluster in page.get('clusters', []):
+                yield cluster
+
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+
+    def infos(self, cluster_names):
+        """
+        Fetches the full information for several clusters at once, batching the
+        API calls into as few HTTP requests as possible.
 
+        Clusters that could not be fetched map to the exception raised fetching
+        them (a ClusterHasGoneAwayException if the cluster does not exist), rather
+        than raising.
+
+        :param cluster_names: iterable of cluster names
+        :return: dict of cluster name -> cluster information (or exception)
+        """
+        return self._fetch(cluster_names)
+
+    def _fetch(self, cluster_names, fields=None):
+        """
+        Fetches several clusters (or only the given fields of them) in batches,
+        caching them only if fetched in full.
+        """
+        requests = {
+            cluster_name: self.dataproc.client.projects().regions().clusters().get(
+                projectId=self.dataproc.project,
+                region=self.dataproc.region,
+                clusterName=cluster_name,
+                fields=fields
+            ) for cluster_name in set(cluster_names)
+        }
+
+        result = {}
+        for cluster_name, (info, error) in execute_batched(self.dataproc, requests).items():
+            if is_not_found(error):
+                result[cluster_name] = ClusterHasGoneAwayException(
+                    "'{}' no longer exists".format(cluster_name))
+            elif error is not None:
+                result[cluster_name] = error
+            else:
+                if fields is None:
+                    self.dataproc.cache.put(('cluster', cluster_name), info)
+                result[cluster_name] = info
+        return result
+
+    def statuses(self, cluster_names):
+        """
+        Fetches the current state of several clusters at once, batching the API
+        calls into as few HTTP requests as possible.
+
+        Clusters that could not be fetched map to the exception raised fetching
+        them (a ClusterHasGoneAwayException if the cluster does not exist), rather
+        than raising.
+
+        As with Cluster.status(refresh=True), cached cluster information is
+        invalidated for any cluster whose state has changed.
+
+        :param cluster_names: iterable of cluster names
+        :return: dict of cluster name -> cluster state (or exception)
+        """
+        result = {}
+        for cluster_name, info in self._fetch(cluster_names, self.MINIMAL_GET_FIELDS).items():
+            if isinstance(info, Exception):
+                result[cluster_name] = info
+                continue
+
+            state = result[cluster_name] = info['status']['state']
+            cached = self.dataproc.cache.get(('cluster', cluster_name))
+            if cached is not None and cached['status']['state'] != state:
+                self.dataproc.cache.invalidate(('cluster', cluster_name))
+        return result
+
+    def watch(self, filter=None, checkpoint=None, waiter=None):
+        """
+        Returns a change feed of clusters, which can be iterated over to wait
+        for changes, yielding a ChangeEvent for each cluster that appears,
+        changes state or is no longer listed, e.g. has been deleted (see Watch):
+
+            for event in dataproc.clusters().watch('labels.env = prod'):
+                print(event.name, event.old_state, event.new_state)
+
+        Each poll only lists each cluster's state and state start time, rather
+        than the full cluster configuration.
+
+        :param filter: string, API filter expression (see list)
+        :param checkpoint: dict, from an earlier Watch's checkpoint(), to resume from
+        :param waiter: the Waiter to poll with when iterating (optional)
+        :return: Watch
+        """
+        def list_states():
+            return {
+                c['clusterName']: (c['status']['state'], c['status'].get('stateStartTime'))
+                for c in self.iter_clusters(filter=filter, fields=self.WATCH_LIST_FIELDS)
+            }
+
+        def fetch_states(cluster_names):
+            if not filter:
+                # every cluster is listed, so any that aren't have been deleted
+                return {}
+            states = {}
+            for cluster_name, info in self._fetch(cluster_names, self.WATCH_GET_FIELDS).items():
+                if isinstance(info, ClusterHasGoneAwayException):
+                    continue
+                if isinstance(info, Exception):
+                    raise info
+                states[cluster_name] = (info['status']['state'],
+                                        info['status'].get('stateStartTime'))
+            return states
+
+        return Watch(self.dataproc, 'cluster', [filter], list_states, fetch_states,
+                     checkpoint=checkpoint, waiter=waiter)
 
     # TODO add support for preemptible workers
     def create(self, cluster_name, num_masters=1, num_workers=2,
                master_type='n1-standard-1', worker_type='n1-standard-1',
-               master_disk_gb=50, worker_disk_gb=50, init_scripts=[], block=True):
-        """Creates a DataProc cluster with the provided settings, returning a dict
-        of the results returned from the API. It can wait for cluster creation if desired.
+               master_disk_gb=50, worker_disk_gb=50, init_scripts=[], block=True,
+               waiter=None):
+        """Creates a DataProc cluster with the provided settings, returning a Cluster
+        object (whose `operation` is the creation Operation). It can wait for cluster
+        creation if desired.
 
-        If block is set to True, the method will block until the cluster reaches either
-        a RUNNING or an ERROR state. If the cluster errors, an Exception will be raised.
+        If block is set to True, the method will block until the creation operation
+        finishes, i.e. the cluster is RUNNING or has failed. If the cluster errors, an
+        OperationFailedException will be raised. Polling backs off according to the
+        given Waiter (or a default one, which waits indefinitely); if the Waiter times
+        out, a WaitTimeoutException is raised.
 
         :param cluster_name: the name of the cluster
         :param num_masters: the number of master instances to use (default: 1)
@@ -52,6 +236,7 @@ class Clusters(object):
         :param worker_type: the type of instance to use for each worker (default: n1-standard-1)
         :param init_scripts: location initialisation scripts (default: [])
         :param block: whether to block upon cluster creation.
+        :param waiter: the Waiter to poll with when blocking (optional)
 
         :return: Cluster object
         """
@@ -91,11 +276,14 @@ class Clusters(object):
         log.debug('Cluster settings: {}'.format(cluster_data))
 
         try:
-            result = self.dataproc.client.projects().regions().clusters().create(
+            request = self.dataproc.client.projects().regions().clusters().create(
                 projectId=self.dataproc.project,
                 region=self.dataproc.region,
+                requestId=uuid.uuid4().hex,
                 body=cluster_data
-            ).execute()
+            )
+            # the request ID makes retrying safe
+            result = self.dataproc.execute(request, idempotent=True)
         except HttpError as e:
             if e.resp['status'] == '409':
                 raise ClusterAlreadyExistsException("Cluster '{}' already exists".format(cluster_name))
@@ -103,22 +291,120 @@ class Clusters(object):
 
         log.debug("Create call for cluster '{}' returned: {}".format(cluster_name, result))
 
-        cluster = Cluster(self.dataproc, cluster_name)
+        cluster = Cluster(self.dataproc, cluster_name, lazy=True)
+        cluster.operation = Operation(self.dataproc, result['name'], result)
 
         if not block:
             return cluster
 
+        cluster.operation.result(waiter=waiter)
+        log.info("Cluster '{}' is ready.".format(cluster_name))
+        return cluster
 
-        status = cluster.status()
-        log.info("Waiting for cluster to be ready...")
-        while not status in ['RUNNING', 'ERROR']:
-            time.sleep(5)
-            status = cluster.status()
+    def create_many(self, specs, block=True, waiter=None, max_workers=10):
+        """
+        Creates several clusters at once. The create calls are made concurrently,
+        and (if block is set to True) the creation operations are then waited for
+        together, polling all of them with one batched API call.
 
-        if status == 'ERROR':
-            cluster_info = cluster.info()
-            status_detail = cluster_info['status'].get('detail', '')
-            raise Exception("Cluster encountered an error: {}".format(status_detail))
+        Errors are returned rather than raised, so that one failed cluster
+        doesn't lose the results of the others.
 
-        log.info("Cluster '{}' is ready.".format(cluster_name))
-        return cluster
+        :param specs: list of dicts of create arguments, each including cluster_name,
+        e.g. {'cluster_name': 'my-cluster', 'num_workers': 4}
+        :param block: whether to block until every cluster is RUNNING (or has failed).
+        :param waiter: the Waiter to poll with when blocking (optional)
+        :param max_workers: maximum number of create calls in flight at once.
+        :return: dict of cluster name -> Cluster (or the exception raised creating it)
+        """
+        for spec in specs:
+            assert spec.get('cluster_name'), "Each spec must include a cluster_name"
+            assert 'block' not in spec and 'waiter' not in spec
+
+        def create(spec):
+            try:
+                return self.create(block=False, **spec)
+            except Exception as e:
+                log.info("Failed to create cluster '{}': {}".format(spec['cluster_name'], e))
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip([spec['cluster_name'] for spec in specs],
+                               executor.map(create, specs)))
+
+        if block:
+            self._wait_for_all(results, {
+                cluster_name: cluster.operation for cluster_name, cluster in results.items()
+                if not isinstance(cluster, Exception)
+            }, waiter)
+        return results
+
+    def delete_many(self, cluster_names=None, predicate=None, block=True, waiter=None,
+                    max_workers=10):
+        """
+        Deletes several clusters at once, given either their names, or a predicate
+        to select them (called with the full information for each active cluster).
+
+        The delete calls are made concurrently (clusters still being created or
+        updated are waited for first, as in Cluster.delete), and (if block is set
+        to True) the deletions are then waited for together, polling all of their
+        operations with one batched API call.
+
+        Errors are returned rather than raised, so that one failed deletion
+        doesn't lose the results of the others.
+
+        :param cluster_names: iterable of cluster names
+        :param predicate: function taking a cluster information dict, returning True to delete it
+        :param block: whether to block until every deletion has finished.
+        :param waiter: the Waiter to poll with when waiting (optional)
+        :param max_workers: maximum number of delete calls in flight at once.
+        :return: dict of cluster name -> deletion Operation (or the exception raised deleting it)
+        """
+        assert (cluster_names is None) != (predicate is None), \
+            "Specify one of cluster_names or predicate"
+
+        if predicate is not None:
+            cluster_names = [name for name, info in self.list(minimal=False).items()
+                             if predicate(info)]
+        cluster_names = sorted(set(cluster_names))
+
+        def delete(cluster_name):
+            try:
+                return Cluster(self.dataproc, cluster_name, lazy=True).delete(waiter=waiter)
+            except Exception as e:
+                log.info("Failed to delete cluster '{}': {}".format(cluster_name, e))
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip(cluster_names, executor.map(delete, cluster_names)))
+
+        if block:
+            self._wait_for_all(results, {
+                cluster_name: operation for cluster_name, operation in results.items()
+                if not isinstance(operation, Exception)
+            }, waiter)
+        return results
+
+    @staticmethod
+    def _wait_for_all(results, operations, waiter):
+        """
+        Waits for the given operations together, replacing the result for each
+        cluster whose operation failed (or didn't finish) with the exception.
+
+        :param results: dict of cluster name -> result, updated in place
+        :param operations: dict of cluster name -> Operation
+        """
+        try:
+            wait_all(operations.values(), waiter)
+        except Exception as e:
+            log.info("Failed waiting for {} operations: {}".format(len(operations), e))
+            for cluster_name, operation in operations.items():
+                if not operation.done(refresh=False):
+                    results[cluster_name] = e
+
+        for cluster_name, operation in operations.items():
+            if operation.done(refresh=False):
+                try:
+                    operation.raise_for_error()
+                except OperationFailedException as e:
+                    results[cluster_name] = e
@@ -1,56 +1,269 @@
-import googleapiclient
-from googleapiclient import discovery
+import copy
+import threading
 
+from pydataproc import discovery_cache
+from pydataproc.cache import MetadataCache
 from pydataproc.cluster import Cluster
 from pydataproc.clusters import Clusters
 from pydataproc.job import Job
 from pydataproc.jobs import Jobs
+from pydataproc.operation import Operation, Operations
+from pydataproc.stats import Stats
+from pydataproc.storage import GcsStorage
+from pydataproc.transport import HttpPool, RequestExecutor, rate_limiter_for
+
+SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+# clients built from the discovery document, shared between DataProc instances
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _build_service(name, version):
+    """
+    Builds a client to a Google API (from its cached discovery document), or
+    returns the one already built in this process.
+    """
+    with _clients_lock:
+        if (name, version) not in _clients:
+            _clients[(name, version)] = discovery_cache.build(name, version)
+        return _clients[(name, version)]
 
 
 class DataProc(object):
     """
     Wraps a DataProc client and region/project information, giving a
     single point to interact with Clusters and Jobs.
+
+    Cluster and job metadata fetched from the API is cached for `cache_ttl`
+    seconds (0 disables caching), holding at most `cache_size` entries.
+
+    If `lazy` is set, Cluster and Job handles are created without checking
+    that the cluster/job exists; this is instead checked on first use.
+
+    A DataProc instance (and the Clusters/Jobs objects it hands out) can be
+    shared between threads: each API call checks an HTTP connection out of
+    a pool of at most `max_connections`.
+
+    Job output is read from Google Storage, unless another `storage` backend
+    (e.g. a MemoryStorage) is given.
+
+    Idempotent requests failing with a 429/5xx are retried according to
+    `retry_policy` (a RetryPolicy). If `rate_limit` is set, requests are limited
+    to that many per second, shared between all clients for the same project
+    with the same limit.
+    If `hedge` is set, slow GETs are hedged with a duplicate request.
+
+    If a `history` (a JobHistory) is given, past jobs can be queried from it
+    locally, with Jobs.query.
     """
 
-    def __init__(self, project, region='europe-west1', zone='europe-west1-b'):
-        self.client = self._get_client()
+    def __init__(self, project, region='europe-west1', zone='europe-west1-b',
+                 cache_ttl=5, cache_size=256, lazy=False, max_connections=10, storage=None,
+                 retry_policy=None, rate_limit=None, hedge=False, history=None):
         self.project = project
         self.region = region
         self.zone = zone
+        self.lazy = lazy
+        self.history = history
+        self.cache = MetadataCache(ttl=cache_ttl, max_size=cache_size)
+        self.http_pool = HttpPool(self._build_http, size=max_connections)
+        self.api_stats = Stats()
+        self.executor = RequestExecutor(
+            self.http_pool,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter_for(project, rate_limit) if rate_limit else None,
+            hedge=hedge,
+            stats=self.api_stats
+        )
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+        self._storage = storage
+
+    @property
+    def client(self):
+        """
+        The client to the DataProc API, used to build requests. This is only
+        built on first use, so creating a DataProc is cheap.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._get_client()
+        return self._client
+
+    @property
+    def storage(self):
+        """
+        The storage backend (by default, Google Storage) used to read job output.
+        """
+        if self._storage is None:
+            self._storage = self._get_storage()
+        return self._storage
 
     def _get_client(self):
-        """Builds a client to the DataProc API."""
-        return googleapiclient.discovery.build('dataproc', 'v1', cache_discovery=False)
+        """
+        Builds a client to the DataProc API. The client is only used to build
+        requests (they're executed over pooled connections), so a single client
+        is built per process, parsing the discovery document once. The document
+        itself is cached on disk (see discovery_cache).
+        """
+        return _build_service('dataproc', 'v1')
+
+    def _get_storage(self):
+        """Builds the storage backend used to read job output."""
+        return GcsStorage(self, _build_service('storage', 'v1'))
+
+    def _build_http(self):
+        """Builds an authorized HTTP connection for the connection pool."""
+        from googleapiclient import _auth
+
+        with self._credentials_lock:
+            if self._credentials is None:
+                self._credentials = _auth.with_scopes(_auth.default_credentials(), SCOPES)
+        return _auth.authorized_http(self._credentials)
 
-    def clusters(self, cluster_name=None):
+    def for_region(self, region, zone=None):
+        """
+        Returns a client for another region of the same project, sharing this
+        client's connection pool, retry/rate limiting settings and stats (but
+        not its metadata cache). A JobHistory holds a single region's jobs, so
+        the returned client has no history store; set its `history` to give it one.
+
+        :param region: string, the region
+        :param zone: string, the zone within it (default: the region's 'b' zone)
+        :return: DataProc
+        """
+        dataproc = copy.copy(self)
+        dataproc.region = region
+        dataproc.zone = zone or '{}-b'.format(region)
+        dataproc.cache = MetadataCache(ttl=self.cache.ttl, max_size=self.cache.max_size)
+        dataproc.history = None
+        return dataproc
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Releases the client's background resources (the threads used to hedge
+        requests). Clients returned by for_region share these, so are closed too.
+
+        :return: None
+        """
+        self.executor.close()
+
+    def execute(self, request, idempotent=None):
+        """
+        Executes an API request (as built from self.client) over a pooled connection,
+        retrying transient failures if the request is idempotent.
+
+        :param request: the request to execute
+        :param idempotent: whether the request is safe to retry. Defaults to
+        True for GETs, False otherwise.
+        :return: the (dict) response
+        """
+        return self.executor.execute(request, idempotent=idempotent)
+
+    def cache_stats(self):
+        """
+        Returns the hit/miss counters of the cluster/job metadata cache.
+
+        :return: dict of counter name -> value
+        """
+        return self.cache.stats()
+
+    def stats(self):
+        """
+        Returns the API call counts, retry counts, HTTP statuses and latency
+        histograms for each API operation called so far, along with the
+        metadata cache counters.
+
+        :return: dict with 'calls' (operation name -> stats) and 'cache' entries
+        """
+        return {
+            'calls': self.api_stats.snapshot(),
+            'cache': self.cache.stats()
+        }
+
+    def measure(self):
+        """
+        Collects API call stats for just the calls made within a with block:
+
+            with dataproc.measure() as stats:
+                ...
+            print(stats.total_calls, stats.snapshot())
+
+        :return: context manager yielding a Stats object
+        """
+        return self.api_stats.scope()
+
+    def add_stats_hook(self, hook):
+        """
+        Adds a function to be called with a CallEvent (operation, latency,
+        status, retries) for every API call, e.g. to export metrics.
+
+        :param hook: function taking a CallEvent
+        :return: None
+        """
+        self.api_stats.add_hook(hook)
+
+    def clusters(self, cluster_name=None, lazy=None):
         """
         Allows the user to interact with a specific cluster or all
         clusters (depending upon whether cluster_name is specified).
 
         If cluster_name is specified, but there is no cluster with
-        that name, raises a NoSuchClusterException
+        that name, raises a NoSuchClusterException (on first use of the
+        cluster, if lazy).
 
         :param cluster_name: string, name of cluster to fetch (optional)
+        :param lazy: skip the existence check until first use. Defaults to
+        the client-wide setting.
         :return: Cluster/Clusters
         """
         if cluster_name:
-            return Cluster(self, cluster_name)
+            return Cluster(self, cluster_name, lazy=lazy)
 
         return Clusters(self)
 
-    def jobs(self, job_id=None):
+    def jobs(self, job_id=None, lazy=None):
         """
         Allows the user to interact with a specific job or all
         jobs (depending upon whether job_id is specified).
 
-        If job_id is specified, but there is no cluster with
-        that name, raises a NoSuchJobException
+        If job_id is specified, but there is no job with
+        that ID, raises a NoSuchJobException (on first use of the
+        job, if lazy).
 
         :param job_id: string, ID of job to fetch (optional)
+        :param lazy: skip the existence check until first use. Defaults to
+        the client-wide setting.
         :return: Job/Jobs
         """
         if job_id:
-            return Job(self, job_id)
+            return Job(self, job_id, lazy=lazy)
 
         return Jobs(self)
+
+    def operations(self, operation_name=None):
+        """
+        Allows the user to interact with a specific long-running operation or
+        all operations (depending upon whether operation_name is specified).
+
+        No API call is made to fetch the operation: if it does not exist, a
+        NoSuchOperationException is raised on first use.
+
+        :param operation_name: string, full name of operation to fetch (optional)
+        :return: Operation/Operations
+        """
+        if operation_name:
+            return Operation(self, operation_name)
+
+        return Operations(self)
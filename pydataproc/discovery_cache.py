@@ -0,0 +1,126 @@
+"""
+Builds Google API clients from discovery documents cached on disk, so that
+building a client doesn't need a network round trip (or, usually, credentials).
+
+Documents are cached under $PYDATAPROC_CACHE_DIR, or pydataproc/discovery in
+the user's cache directory, keyed by API name and version, and refreshed once
+they are more than a week old.
+"""
+import io
+import os
+import tempfile
+import time
+
+from pydataproc.logger import log
+
+DISCOVERY_URIS = (
+    'https://{api}.googleapis.com/$discovery/rest?version={version}',
+    'https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest',
+)
+
+MAX_AGE = 7 * 24 * 60 * 60
+
+# os.replace overwrites atomically on Windows too, but is Python 3 only
+_replace = getattr(os, 'replace', os.rename)
+
+
+def cache_dir():
+    """
+    Returns the directory discovery documents are cached in.
+
+    :return: string, directory path
+    """
+    if os.environ.get('PYDATAPROC_CACHE_DIR'):
+        return os.environ['PYDATAPROC_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pydataproc', 'discovery')
+
+
+def _cache_path(api, version):
+    return os.path.join(cache_dir(), '{}.{}.json'.format(api, version))
+
+
+def _read_cached(api, version, max_age):
+    path = _cache_path(api, version)
+    try:
+        if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with io.open(path, encoding='utf-8') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _write_cached(api, version, document):
+    path = _cache_path(api, version)
+    tmp_path = None
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        # write to a temporary file first, so readers never see a partial document
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with io.open(fd, 'w', encoding='utf-8') as f:
+            f.write(document)
+        _replace(tmp_path, path)
+    except (IOError, OSError) as e:
+        log.debug('Unable to cache discovery document for {} {}: {}'.format(api, version, e))
+        if tmp_path is not None and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _fetch(api, version):
+    import httplib2
+
+    for uri in DISCOVERY_URIS:
+        resp, content = httplib2.Http(timeout=30).request(uri.format(api=api, version=version))
+        if resp.status == 200:
+            return content.decode('utf-8')
+    raise Exception('Unable to fetch discovery document for {} {}'.format(api, version))
+
+
+def load_document(api, version, max_age=MAX_AGE):
+    """
+    Returns the discovery document for an API, from the on-disk cache if it's
+    there and fresh, otherwise fetching (and caching) it. If fetching fails, a
+    stale cached document is used if there is one.
+
+    :param api: string, API name, e.g. 'dataproc'
+    :param version: string, API version, e.g. 'v1'
+    :param max_age: maximum age, in seconds, of a cached document
+    :return: string, the discovery document
+    """
+    document = _read_cached(api, version, max_age)
+    if document is not None:
+        return document
+
+    try:
+        document = _fetch(api, version)
+    except Exception:
+        document = _read_cached(api, version, max_age=None)
+        if document is None:
+            raise
+        log.debug('Using stale discovery document for {} {}'.format(api, version))
+        return document
+
+    _write_cached(api, version, document)
+    return document
+
+
+def build(api, version):
+    """
+    Builds a client for an API from its (cached) discovery document.
+
+    The client isn't authorized: requests must be executed with an authorized
+    http (as DataProc.execute does).
+
+    :param api: string, API name, e.g. 'dataproc'
+    :param version: string, API version, e.g. 'v1'
+    :return: the API client
+    """
+    import httplib2
+    from googleapiclient import discovery
+
+    return discovery.build_from_document(load_document(api, version), http=httplib2.Http())
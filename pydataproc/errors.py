@@ -10,3 +10,27 @@ class ClusterHasGoneAwayException(Exception):
 
 class NoSuchJobException(Exception):
     pass
+
+class WaitTimeoutException(Exception):
+    pass
+
+class ClusterPoolClosedException(Exception):
+    pass
+
+class NoSuchOperationException(Exception):
+    pass
+
+class OperationFailedException(Exception):
+    pass
+
+class RegionsFailedException(Exception):
+    """
+    Raised when a query across several regions fails in some of them. `errors`
+    holds the exception for each region that failed, and `results` whatever
+    was found in the others.
+    """
+
+    def __init__(self, message, errors, results):
+        super(RegionsFailedException, self).__init__(message)
+        self.errors = errors
+        self.results = results
@@ -0,0 +1,348 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+from pydataproc.errors import NoSuchJobException
+from pydataproc.job import Job
+from pydataproc.jobs import Jobs
+from pydataproc.logger import log
+from pydataproc.summary import JOB_TYPES, JobSummary
+
+# partial response fields needed to store a job, and to list jobs to store
+SYNC_GET_FIELDS = ','.join(
+    ['reference.jobId', 'placement.clusterName', 'status(state,stateStartTime)',
+     'statusHistory(state,stateStartTime)', 'driverOutputResourceUri', 'labels'] +
+    ['{}({})'.format(key, fields) for key, _, fields in JOB_TYPES]
+)
+SYNC_FIELDS = 'jobs({}),nextPageToken'.format(SYNC_GET_FIELDS)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    cluster_name TEXT,
+    state TEXT,
+    state_start_time TEXT,
+    submitted_time TEXT,
+    started_time TEXT,
+    finished_time TEXT,
+    runtime REAL,
+    job_type TEXT,
+    driver_output_uri TEXT,
+    labels TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_cluster_name ON jobs (cluster_name, submitted_time);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, submitted_time);
+CREATE INDEX IF NOT EXISTS jobs_submitted_time ON jobs (submitted_time);
+CREATE INDEX IF NOT EXISTS jobs_state_start_time ON jobs (state_start_time);
+CREATE TABLE IF NOT EXISTS job_labels (
+    job_id TEXT,
+    key TEXT,
+    value TEXT,
+    PRIMARY KEY (job_id, key)
+);
+CREATE INDEX IF NOT EXISTS job_labels_key_value ON job_labels (key, value);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+def _submitted_time(job):
+    """Returns when a job (with its statusHistory) was submitted, as an API timestamp."""
+    return (job.get('statusHistory', []) + [job['status']])[0].get('stateStartTime')
+
+
+def _timestamp(value):
+    """Converts a datetime to the API's timestamp format, leaving strings as they are."""
+    if value is None or not hasattr(value, 'strftime'):
+        return value
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class JobHistory(object):
+    """
+    A local store (an SQLite database) of the jobs in a project's region, so
+    that questions about past jobs (e.g. how long a job has taken over the last
+    month) can be answered without paging through the whole job list again.
+
+    The store is filled by sync(), which lists jobs (fetching only the fields
+    stored), writing only those that are new or have changed state since the
+    last sync. The first sync lists every job. Each page is committed as it is
+    fetched, along with the token for the next one, so an interrupted first
+    sync resumes where it left off.
+
+    Later syncs are incremental: they refresh the jobs that were still active,
+    then list jobs (newest first) only until a page has no job submitted after
+    the newest one stored by the last complete sync.
+
+    Jobs are indexed by cluster, state, labels and submission time. A store
+    holds the jobs of one project and region; use a separate `path` for others.
+
+    :param path: path of the database file (default: in memory)
+    """
+
+    def __init__(self, path=':memory:', clock=time.time):
+
+        self.path = path
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Closes the database.
+
+        :return: None
+        """
+        with self._lock:
+            self._db.close()
+
+    def _get_state(self, key):
+        row = self._db.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self._db.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)',
+                         (key, value))
+
+    def last_synced(self):
+        """
+        Returns when the last complete sync started (anything that changed
+        since then may not be in the store yet).
+
+        :return: time, according to the store's clock, or None if never synced
+        """
+        with self._lock:
+            value = self._get_state('last_synced')
+        return float(value) if value is not None else None
+
+    def age(self):
+        """
+        Returns how long ago the last complete sync started.
+
+        :return: seconds, or None if never synced
+        """
+        last_synced = self.last_synced()
+        return self.clock() - last_synced if last_synced is not None else None
+
+    def sync(self, dataproc, page_size=Jobs.MAX_JOBS, full=False):
+        """
+        Brings the store up to date with the DataProc API, resuming the last
+        sync if it didn't finish.
+
+        :param dataproc: the DataProc client to list jobs with
+        :param page_size: number of jobs to fetch per API call
+        :param full: list every job, rather than stopping at those already synced
+        :return: int, number of jobs added or updated
+        """
+        location = '{}/{}'.format(dataproc.project, dataproc.region)
+        with self._lock:
+            stored_location = self._get_state('location')
+            assert stored_location in (None, location), \
+                "Job history at '{}' is for {}, not {}".format(self.path, stored_location,
+                                                               location)
+            page_token = self._get_state('page_token')
+            high_water = self._get_state('high_water')
+            full = full or page_token is not None or self._get_state('last_synced') is None
+            if page_token is None:
+                self._start_sync(location)
+            else:
+                log.info("Resuming sync of job history for {}...".format(location))
+
+        jobs = Jobs(dataproc)
+        changed = 0 if full else self._refresh_active(jobs)
+        try:
+            changed += self._crawl(jobs, page_size, page_token, incremental=not full,
+                                   high_water=high_water)
+        except HttpError as e:
+            # page tokens expire, so if the saved one is rejected, start again
+            if page_token is None or e.resp['status'] != '400':
+                raise e
+            log.info("Unable to resume sync of job history for {} ({}), restarting it".format(
+                location, e))
+            with self._lock:
+                self._start_sync(location)
+            changed += self._crawl(jobs, page_size, None, incremental=False)
+
+        log.debug("Synced job history for {}: {} jobs changed".format(location, changed))
+        return changed
+
+    def _start_sync(self, location):
+        """Records the start of a new sync. Call with the lock held."""
+        self._set_state('location', location)
+        self._set_state('page_token', None)
+        self._set_state('sync_started', repr(self.clock()))
+        self._db.commit()
+
+    def _refresh_active(self, jobs):
+        """
+        Writes the currently active jobs, and the current state of any stored
+        as active that no longer are, returning how many jobs changed.
+        """
+        active = list(jobs.iter_jobs(running=True, page_size=Jobs.MAX_JOBS, fields=SYNC_FIELDS))
+        active_ids = set(j['reference']['jobId'] for j in active)
+        with self._lock:
+            changed = self._write(active)
+            self._db.commit()
+            stored = [row[0] for row in self._db.execute(
+                'SELECT job_id FROM jobs WHERE state NOT IN ({})'.format(
+                    ','.join('?' * len(Job.FINISHED_STATES))), Job.FINISHED_STATES)]
+
+        finished = []
+        for job_id, info in jobs._fetch(set(stored) - active_ids, SYNC_GET_FIELDS).items():
+            if isinstance(info, NoSuchJobException):
+                continue
+            if isinstance(info, Exception):
+                raise info
+            finished.append(info)
+
+        with self._lock:
+            changed += self._write(finished)
+            self._db.commit()
+        return changed
+
+    def _crawl(self, jobs, page_size, page_token, incremental, high_water=None):
+        """
+        Lists jobs from the given page on, writing those that changed, returning
+        how many did. If incremental, stops at the first page with no job
+        submitted after `high_water` (the newest submission time stored by the
+        last complete sync). Jobs already written by _refresh_active count too,
+        so a page full of active jobs doesn't end the crawl early.
+        """
+        changed = 0
+        pages = jobs.iter_pages(running=False, page_size=page_size, fields=SYNC_FIELDS,
+                                page_token=page_token)
+        for page, page_token in pages:
+            with self._lock:
+                changed += self._write(page)
+                newer = [job for job in page
+                         if high_water is None or _submitted_time(job) > high_water]
+                done = page_token is None or (incremental and not newer)
+                # incremental syncs start from the newest jobs again, so aren't resumed
+                self._set_state('page_token', None if incremental or done else page_token)
+                if done:
+                    self._set_state('last_synced', self._get_state('sync_started'))
+                    self._set_state('high_water', self._db.execute(
+                        'SELECT MAX(submitted_time) FROM jobs').fetchone()[0])
+                self._db.commit()
+            if done:
+                break
+        return changed
+
+    def _write(self, jobs):
+        """Writes the jobs that are new or have changed state, returning how many there were."""
+        stored = {}
+        for start in range(0, len(jobs), 500):
+            ids = [j['reference']['jobId'] for j in jobs[start:start + 500]]
+            stored.update(self._db.execute(
+                'SELECT job_id, state_start_time FROM jobs WHERE job_id IN ({})'.format(
+                    ','.join('?' * len(ids))), ids).fetchall())
+
+        changed = 0
+        for job in jobs:
+            summary = JobSummary.from_resource(job)
+            if summary.job_id in stored and stored[summary.job_id] == summary.state_start_time:
+                continue
+
+            history = job.get('statusHistory', []) + [job['status']]
+            started = [s.get('stateStartTime') for s in history if s['state'] == 'RUNNING']
+            finished = summary.state_start_time if summary.state in Job.FINISHED_STATES else None
+
+            self._db.execute(
+                'INSERT OR REPLACE INTO jobs VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, (julianday(?) - julianday(?)) * 86400, ?, ?, ?)',
+                (summary.job_id, summary.cluster_name, summary.state, summary.state_start_time,
+                 _submitted_time(job), started[0] if started else None, finished,
+                 finished, started[0] if started else None, summary.job_type,
+                 summary.driver_output_uri, json.dumps(summary.labels, sort_keys=True))
+            )
+            self._db.execute('DELETE FROM job_labels WHERE job_id = ?', (summary.job_id,))
+            self._db.executemany(
+                'INSERT INTO job_labels (job_id, key, value) VALUES (?, ?, ?)',
+                [(summary.job_id, key, value) for key, value in summary.labels.items()]
+            )
+            changed += 1
+        return changed
+
+    def _where(self, cluster_name=None, state=None, job_type=None, labels=None, since=None,
+               until=None):
+        """Builds the WHERE clause (and its parameters) for the given query filters."""
+        clauses, params = [], []
+        for column, value in (('cluster_name', cluster_name), ('state', state),
+                              ('job_type', job_type)):
+            if value is not None:
+                clauses.append('{} = ?'.format(column))
+                params.append(value)
+        if since is not None:
+            clauses.append('submitted_time >= ?')
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append('submitted_time < ?')
+            params.append(_timestamp(until))
+        for key, value in sorted((labels or {}).items()):
+            clauses.append('job_id IN (SELECT job_id FROM job_labels WHERE key = ? AND value = ?)')
+            params.extend([key, value])
+        return ' WHERE ' + ' AND '.join(clauses) if clauses else '', params
+
+    def query(self, cluster_name=None, state=None, job_type=None, labels=None, since=None,
+              until=None, limit=None):
+        """
+        Returns the stored jobs matching all the given filters, most recently
+        submitted first.
+
+        :param cluster_name: only jobs that ran on this cluster
+        :param state: only jobs in this state, e.g. 'DONE'
+        :param job_type: only jobs of this type, e.g. 'pyspark'
+        :param labels: dict, only jobs with all of these labels
+        :param since: only jobs submitted at or after this time (datetime or API timestamp)
+        :param until: only jobs submitted before this time (datetime or API timestamp)
+        :param limit: maximum number of jobs to return
+        :return: list of JobSummary objects
+        """
+        where, params = self._where(cluster_name, state, job_type, labels, since, until)
+        sql = ('SELECT job_id, cluster_name, state, state_start_time, job_type, '
+               'driver_output_uri, labels FROM jobs{} ORDER BY submitted_time DESC'.format(where))
+        if limit is not None:
+            sql += ' LIMIT {:d}'.format(limit)
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [JobSummary(*row[:6], labels=json.loads(row[6])) for row in rows]
+
+    def runtimes(self, **filters):
+        """
+        Returns the runtimes (from RUNNING to finishing) of the stored jobs
+        matching the given filters (see query), that have finished.
+
+        :return: list of runtimes, in seconds, shortest first
+        """
+        where, params = self._where(**filters)
+        where += ' AND ' if where else ' WHERE '
+        sql = 'SELECT runtime FROM jobs{}runtime IS NOT NULL ORDER BY runtime'.format(where)
+
+        with self._lock:
+            return [row[0] for row in self._db.execute(sql, params).fetchall()]
+
+    def runtime_percentile(self, percentile, **filters):
+        """
+        Returns a percentile (nearest-rank) of the runtimes of the stored jobs
+        matching the given filters (see query), e.g. runtime_percentile(95,
+        labels={'job': 'daily-report'}, state='DONE').
+
+        :param percentile: the percentile, between 0 and 100
+        :return: runtime, in seconds, or None if no matching jobs have finished
+        """
+        assert 0 <= percentile <= 100
+
+        runtimes = self.runtimes(**filters)
+        if not runtimes:
+            return None
+        rank = int(math.ceil(percentile / 100.0 * len(runtimes)))
+        return runtimes[max(rank - 1, 0)]
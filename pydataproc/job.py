@@ -1,14 +1,26 @@
-import subprocess
+import codecs
+import sys
 
 from googleapiclient.errors import HttpError
 
 from pydataproc.logger import log
 from pydataproc.errors import NoSuchJobException
+from pydataproc.storage import OutputTail
+from pydataproc.waiter import Waiter
 
 
 class Job(object):
+    """
+    Class to wrap a selection of utility methods for querying a DataProc job.
 
-    def __init__(self, dataproc, job_id):
+    If lazy is set, no API call is made on construction. Instead, the
+    existence of the job is checked on first use, and a NoSuchJobException
+    raised from there if it does not exist.
+    """
+
+    FINISHED_STATES = ('DONE', 'ERROR', 'CANCELLED')
+
+    def __init__(self, dataproc, job_id, lazy=None):
 
         assert dataproc
         assert job_id
@@ -16,71 +28,120 @@ class Job(object):
         self.dataproc = dataproc
         self.job_id = job_id
 
-        if not self.exists():
+        if lazy is None:
+            lazy = dataproc.lazy
+
+        if not lazy and not self.exists():
             raise NoSuchJobException("Job '{}' does not exist".format(job_id))
 
-    def info(self):
+    @property
+    def _cache_key(self):
+        return 'job', self.job_id
+
+    def info(self, refresh=False):
         """
         Returns the full configuration information associated with a given
-        job. If the job does not exist, returns None.
+        job. If the job does not exist, raises a NoSuchJobException.
+
+        This is served from the DataProc metadata cache where possible, so
+        the returned dict should be treated as read-only.
+
+        :param refresh: bypass the metadata cache if set to True.
+        :return: dict of job information
+        """
+        if not refresh:
+            cached = self.dataproc.cache.get(self._cache_key)
+            if cached is not None:
+                return cached
+
+        info = self._get()
+        self.dataproc.cache.put(self._cache_key, info)
+        return info
 
-        :return: dict of job information, or None if no such cluster
+    def _get(self, fields=None):
+        """
+        Fetches the job, or only the given fields of it (e.g. 'status.state').
         """
         try:
-            return self.dataproc.client.projects().regions().jobs().get(
+            request = self.dataproc.client.projects().regions().jobs().get(
                 projectId=self.dataproc.project,
                 region=self.dataproc.region,
-                jobId=self.job_id
-            ).execute()
+                jobId=self.job_id,
+                fields=fields
+            )
+            return self.dataproc.execute(request)
         except HttpError as e:
             if e.resp['status'] == '404':
+                self.dataproc.cache.invalidate(self._cache_key)
                 raise NoSuchJobException("No job found with ID {}".format(self.job_id))
             raise e
 
-    def wait(self, stream_logs=True):
+    def wait(self, stream_logs=True, output=None, waiter=None):
         """
         A blocking call that waits for the job to reach a finished state.
-        By default streams job logs to stdout, using the 'gcloud client jobs wait'
-        command and subprocess.
+        By default streams the job's driver output to stdout (or the given
+        output) as it is written.
 
+        :param stream_logs: whether to stream the job's driver output.
+        :param output: file-like object to stream the output to (default: stdout)
+        :param waiter: the Waiter to poll with (optional)
         :return: string, status of the job once complete
         """
         log.info("Waiting for job {} to finish...".format(self.job_id))
-        self._stream_logs(stream_logs)
 
-        status = self.status()
+        if stream_logs:
+            output = output or sys.stdout
+            output.write('\nJOB LOGS (job ID: {}):\n--------------------------\n\n'.format(
+                self.job_id))
+            for text in self.iter_output(waiter=waiter):
+                output.write(text)
+                output.flush()
+            output.write('\n--------------------------\n\n')
+            status = self.status(refresh=True)
+        else:
+            status = (waiter or Waiter()).wait(
+                lambda: self.status(refresh=True),
+                lambda state: state in self.FINISHED_STATES,
+                "job {} to finish".format(self.job_id)
+            )
+
         if status == 'ERROR':
-            log.info('Error running job: {}'.format(self.info()['status']['details']))
+            log.info('Error running job: {}'.format(self.info()['status'].get('details', '')))
         elif status == 'DONE':
             log.info('Job finished.')
         log.debug("Job status: {}".format(status))
         return status
 
-    def _stream_logs(self, stream_logs=False):
+    def iter_output(self, follow=True, waiter=None):
         """
-        Streams the job logs to stdout, using the 'gcloud client jobs wait'
-        command and subprocess.
+        Yields the job's driver output, as text, as it is written.
 
-        :return: None
+        Only the output written since the previous poll is fetched each time,
+        using ranged reads from storage (the DataProc client's `storage`).
+
+        :param follow: if True, keeps polling until the job finishes, otherwise
+        just yields the output written so far.
+        :param waiter: the Waiter to poll with (optional)
+        :return: generator of strings
         """
-        # piping stdout to PIPE ensures that the job configuration isn't output
-        # when the job completes
-        # This isn't yet supported by the DataProc API/Python lib, so must be done
-        # using subprocess and the gcloud CLI tools
-        if stream_logs:
-            print('\nJOB LOGS (job ID: {}):\n--------------------------\n'.format(self.job_id))
-            subprocess.call(
-                "gcloud dataproc jobs wait --region {} {}".format(self.dataproc.region, self.job_id).split(),
-                stdout=subprocess.PIPE
-            )
-            print('\n--------------------------\n')
-        else:
-            # piping stderr to PIPE suppresses all output
-            subprocess.call(
-                "gcloud dataproc jobs wait --region {} {}".format(self.dataproc.region, self.job_id).split(),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+        tail = OutputTail(self.dataproc.storage, self.info()['driverOutputResourceUri'])
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        for _ in (waiter or Waiter()).ticks("job {} to finish".format(self.job_id)):
+            # check the state before reading, so no output is missed after the job finishes
+            finished = not follow or self.status(refresh=True) in self.FINISHED_STATES
+
+            for chunk in tail.read_new():
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+
+            if finished:
+                break
+
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
 
     def exists(self):
         """
@@ -89,23 +150,52 @@ class Job(object):
         :return: boolean, True if job exists, False otherwise.
         """
         try:
-            self.dataproc.client.projects().regions().jobs().get(
-                projectId=self.dataproc.project,
-                region=self.dataproc.region,
-                jobId=self.job_id
-            ).execute()
+            self.info()
             return True
-        except HttpError as e:
-            if e.resp['status'] == '404':
-                return False
-            raise e
+        except NoSuchJobException:
+            return False
 
-    def status(self):
+    def status(self, refresh=False):
         """
         Fetch status of job
 
+        If refresh is set, only the job's state is fetched (as a partial
+        response), rather than its full information, which makes polling cheap.
+
+        :param refresh: bypass the metadata cache if set to True.
         :return: string, job status
         """
-        return self.info()['status']['state']
+        if not refresh:
+            return self.info()['status']['state']
+
+        state = self._get(fields='status.state')['status']['state']
+        cached = self.dataproc.cache.get(self._cache_key)
+        if cached is not None and cached['status']['state'] != state:
+            self.dataproc.cache.invalidate(self._cache_key)
+        return state
+
+    def cancel(self):
+        """
+        Requests cancellation of the job. Cancellation is asynchronous, so the
+        job may not be CANCELLED yet when this returns.
+
+        :return: dict of job information
+        """
+        log.info("Cancelling job {}...".format(self.job_id))
+        try:
+            request = self.dataproc.client.projects().regions().jobs().cancel(
+                projectId=self.dataproc.project,
+                region=self.dataproc.region,
+                jobId=self.job_id
+            )
+            info = self.dataproc.execute(request)
+        except HttpError as e:
+            if e.resp['status'] == '404':
+                raise NoSuchJobException("No job found with ID {}".format(self.job_id))
+            raise e
+        finally:
+            self.dataproc.cache.invalidate(self._cache_key)
+
+        return info
 
-    # TODO delete/cancel/is_running/succeeded
+    # TODO delete/is_running/succeeded
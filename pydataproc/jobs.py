@@ -1,24 +1,40 @@
+import itertools
+
 from googleapiclient.errors import HttpError
 
+from pydataproc.batch import execute_batched, is_not_found
+from pydataproc.errors import NoSuchJobException
+from pydataproc.job import Job
 from pydataproc.logger import log
+from pydataproc.summary import JobSummary
+from pydataproc.waiter import Waiter
+from pydataproc.watch import Watch
 
 
 class Jobs(object):
 
     MAX_JOBS = 500
 
+    # partial response fields needed for minimal (state-only) results
+    MINIMAL_LIST_FIELDS = 'jobs(reference.jobId,status.state),nextPageToken'
+    MINIMAL_GET_FIELDS = 'reference.jobId,status.state'
+    # partial response fields needed to watch for changes
+    WATCH_LIST_FIELDS = 'jobs(reference.jobId,status.state,status.stateStartTime),nextPageToken'
+    WATCH_GET_FIELDS = 'reference.jobId,status.state,status.stateStartTime'
+
     def __init__(self, dataproc):
 
         assert dataproc
 
         self.dataproc = dataproc
 
-    def list(self, minimal=True, running=True, count=10, cluster_name=None):
+    def list(self, minimal=True, running=True, count=10, cluster_name=None, filter=None):
         """
         Queries the DataProc API, returning a dict of jobs, keyed by job ID.
 
-        If 'minimal' is set to True, each job's current state will be returned,
-        otherwise the full job configuration will be returned.
+        If 'minimal' is set to True, each job's current state will be returned
+        (and only that is fetched), otherwise the full job configuration will be
+        returned.
 
         If cluster_name is specified and not None, the list of jobs will be filtered
         to only those that ran on this cluster.
@@ -27,54 +43,354 @@ class Jobs(object):
         :param running: returns only ACTIVE jobs if set to True.
         :param count: maximum number of jobs to return.
         :param cluster_name: filter by cluster name. Defaults to None.
+        :param filter: string, API filter expression, e.g. 'labels.env = staging' (optional)
         :return: dict of job ID -> job information
         """
-        filter = None
-        if running:
-            filter = 'status.state = ACTIVE'
-
-        cluster_name_filter = None
-        if cluster_name:
-            cluster_name_filter = cluster_name
-
         if count > self.MAX_JOBS:
             log.info('count of {} too high, limiting to {} jobs...'.format(count, self.MAX_JOBS))
             count = self.MAX_JOBS
 
-        try:
-            result = self.dataproc.client.projects().regions().jobs().list(
-                projectId=self.dataproc.project,
-                region=self.dataproc.region,
-                filter=filter,
-                clusterName=cluster_name_filter
-            ).execute()
-        except HttpError as e:
-            if e.resp['status'] == '404':
-                raise Exception("'{}' is not a valid cluster".format(cluster_name))
-            raise e
-
-        if 'jobs' not in result:
-            return {}
-
-        # TODO investigate using generators here
-        page_token = result['nextPageToken']
-        while len(result['jobs']) < count:
-            moar = self.dataproc.client.projects().regions().jobs().list(
+        jobs = itertools.islice(
+            self.iter_jobs(running=running, cluster_name=cluster_name, page_size=count,
+                           filter=filter, fields=self.MINIMAL_LIST_FIELDS if minimal else None),
+            count
+        )
+
+        if minimal:
+            return {j['reference']['jobId']: j['status']['state'] for j in jobs}
+
+        result = {}
+        for j in jobs:
+            self.dataproc.cache.put(('job', j['reference']['jobId']), j)
+            result[j['reference']['jobId']] = j
+        return result
+
+    def summaries(self, running=True, count=None, cluster_name=None, filter=None,
+                  keep_raw=False):
+        """
+        Queries the DataProc API, returning a compact JobSummary (ID, cluster,
+        state, state start time, type, driver output URI and labels) for each
+        job, rather than its full configuration. Only those fields are fetched,
+        unless keep_raw is set, in which case each summary also keeps the full
+        job resource as `raw`.
+
+        Summaries take around a tenth of the memory of the full job resources,
+        so suit loading many jobs at once, e.g. for reporting (see to_columns
+        and to_dataframe in pydataproc.summary).
+
+        :param running: returns only ACTIVE jobs if set to True.
+        :param count: maximum number of jobs to return. Defaults to all of them.
+        :param cluster_name: filter by cluster name. Defaults to None.
+        :param filter: string, API filter expression (see list)
+        :param keep_raw: keep each full job resource if set to True.
+        :return: list of JobSummary objects
+        """
+        jobs = self.iter_jobs(
+            running=running, cluster_name=cluster_name,
+            page_size=min(count or self.MAX_JOBS, self.MAX_JOBS), filter=filter,
+            fields=None if keep_raw else JobSummary.LIST_FIELDS
+        )
+        return [JobSummary.from_resource(j, keep_raw) for j in itertools.islice(jobs, count)]
+
+    def query(self, max_age=300, **filters):
+        """
+        Queries the jobs in the client's local job history store (see
+        JobHistory), rather than the API, syncing the store first if it was
+        last synced more than `max_age` seconds ago.
+
+        :param max_age: how out of date (in seconds) the store can be
+        :param filters: filters to apply (see JobHistory.query), e.g. cluster_name='my-cluster'
+        :return: list of JobSummary objects, most recently submitted first
+        """
+        history = self.dataproc.history
+        assert history is not None, "No job history store was given to the DataProc client"
+
+        age = history.age()
+        if age is None or age > max_age:
+            history.sync(self.dataproc)
+        return history.query(**filters)
+
+    def iter_jobs(self, running=True, cluster_name=None, page_size=None, filter=None,
+                  fields=None):
+        """
+        Queries the DataProc API, yielding the full information for each job
+        in turn. Pages of results are only fetched as the generator is consumed,
+        so stopping iteration early stops any further API calls.
+
+        :param running: yields only ACTIVE jobs if set to True.
+        :param cluster_name: filter by cluster name. Defaults to None.
+        :param page_size: number of jobs to fetch per API call. Defaults to the API default.
+        :param filter: string, API filter expression, combined with the running filter (optional)
+        :param fields: partial response fields to fetch, e.g.
+        'jobs(reference.jobId,status.state),nextPageToken'. Defaults to everything.
+        :return: generator of job information dicts
+        """
+        for jobs, _ in self.iter_pages(running, cluster_name, page_size, filter, fields):
+            for job in jobs:
+                yield job
+
+    def iter_pages(self, running=True, cluster_name=None, page_size=None, filter=None,
+                   fields=None, page_token=None):
+        """
+        Queries the DataProc API, yielding each page of jobs in turn, along
+        with the token for the next page, so that paging can be resumed later.
+
+        :param page_token: the token of the page to start from (optional)
+        :return: generator of (list of job information dicts, next page token or None)
+        """
+        if running:
+            filter = ' AND '.join(f for f in ('status.state = ACTIVE', filter) if f)
+
+        while True:
+            try:
+                request = self.dataproc.client.projects().regions().jobs().list(
+                    projectId=self.dataproc.project,
+                    region=self.dataproc.region,
+                    filter=filter,
+                    clusterName=cluster_name,
+                    pageSize=page_size,
+                    pageToken=page_token,
+                    fields=fields
+                )
+                page = self.dataproc.execute(request)
+            except HttpError as e:
+                if e.resp['status'] == '404':
+                    raise Exception("'{}' is not a valid cluster".format(cluster_name))
+                raise e
+
+            page_token = page.get('nextPageToken')
+            yield page.get('jobs', []), page_token
+            if not page_token:
+                break
+
+    def infos(self, job_ids):
+        """
+        Fetches the full information for several jobs at once, batching the
+        API calls into as few HTTP requests as possible.
+
+        Jobs that could not be fetched map to the exception raised fetching them
+        (a NoSuchJobException if the job does not exist), rather than raising.
+
+        :param job_ids: iterable of job IDs
+        :return: dict of job ID -> job information (or exception)
+        """
+        return self._fetch(job_ids)
+
+    def _fetch(self, job_ids, fields=None):
+        """
+        Fetches several jobs (or only the given fields of them) in batches,
+        caching them only if fetched in full.
+        """
+        requests = {
+            job_id: self.dataproc.client.projects().regions().jobs().get(
                 projectId=self.dataproc.project,
                 region=self.dataproc.region,
-                filter=filter,
-                clusterName=cluster_name_filter,
-                pageToken=page_token
-            ).execute()
-            if len(moar['jobs']) == 0:
-                break
-            result['jobs'].extend(moar['jobs'])
-            if 'nextPageToken' not in page_token:
+                jobId=job_id,
+                fields=fields
+            ) for job_id in set(job_ids)
+        }
+
+        result = {}
+        for job_id, (info, error) in execute_batched(self.dataproc, requests).items():
+            if is_not_found(error):
+                result[job_id] = NoSuchJobException("No job found with ID {}".format(job_id))
+            elif error is not None:
+                result[job_id] = error
+            else:
+                if fields is None:
+                    self.dataproc.cache.put(('job', job_id), info)
+                result[job_id] = info
+        return result
+
+    def statuses(self, job_ids):
+        """
+        Fetches the current state of several jobs at once, batching the API
+        calls into as few HTTP requests as possible.
+
+        Jobs that could not be fetched map to the exception raised fetching them
+        (a NoSuchJobException if the job does not exist), rather than raising.
+
+        As with Job.status(refresh=True), cached job information is invalidated
+        for any job whose state has changed.
+
+        :param job_ids: iterable of job IDs
+        :return: dict of job ID -> job state (or exception)
+        """
+        result = {}
+        for job_id, info in self._fetch(job_ids, self.MINIMAL_GET_FIELDS).items():
+            if isinstance(info, Exception):
+                result[job_id] = info
+                continue
+
+            state = result[job_id] = info['status']['state']
+            cached = self.dataproc.cache.get(('job', job_id))
+            if cached is not None and cached['status']['state'] != state:
+                self.dataproc.cache.invalidate(('job', job_id))
+        return result
+
+    def watch(self, running=True, cluster_name=None, filter=None, checkpoint=None, waiter=None):
+        """
+        Returns a change feed of jobs, which can be iterated over to wait for
+        changes, yielding a ChangeEvent for each job that appears, changes
+        state or is no longer listed (see Watch):
+
+            for event in dataproc.jobs().watch():
+                print(event.name, event.old_state, event.new_state)
+
+        Each poll only lists each job's state and state start time, rather than
+        the full job configuration. The API can't filter on when jobs changed
+        state, so watching running jobs only (the default) keeps polls small;
+        jobs that finish are then reported with their final state, and no
+        longer tracked.
+
+        :param running: watches only ACTIVE jobs if set to True.
+        :param cluster_name: filter by cluster name. Defaults to None.
+        :param filter: string, API filter expression (see list)
+        :param checkpoint: dict, from an earlier Watch's checkpoint(), to resume from
+        :param waiter: the Waiter to poll with when iterating (optional)
+        :return: Watch
+        """
+        def list_states():
+            return {
+                j['reference']['jobId']: (j['status']['state'], j['status'].get('stateStartTime'))
+                for j in self.iter_jobs(running=running, cluster_name=cluster_name,
+                                        page_size=self.MAX_JOBS, filter=filter,
+                                        fields=self.WATCH_LIST_FIELDS)
+            }
+
+        def fetch_states(job_ids):
+            states = {}
+            for job_id, info in self._fetch(job_ids, self.WATCH_GET_FIELDS).items():
+                if isinstance(info, NoSuchJobException):
+                    continue
+                if isinstance(info, Exception):
+                    raise info
+                states[job_id] = (info['status']['state'], info['status'].get('stateStartTime'))
+            return states
+
+        return Watch(self.dataproc, 'job', [running, cluster_name, filter], list_states,
+                     fetch_states, checkpoint=checkpoint, waiter=waiter)
+
+
+class JobGroup(object):
+    """
+    Tracks a group of jobs, waiting on all of them with a single polling loop:
+    each poll refreshes the state of every unfinished job with one batched API
+    call, rather than one call per job.
+    """
+
+    def __init__(self, dataproc, jobs=()):
+
+        assert dataproc
+
+        self.dataproc = dataproc
+        self.jobs = []
+        for job in jobs:
+            self.add(job)
+
+    def add(self, job):
+        """
+        Adds a job to the group.
+
+        :param job: Job object
+        :return: None
+        """
+        assert isinstance(job, Job)
+        self.jobs.append(job)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def as_completed(self, waiter=None, fail_fast=False):
+        """
+        Waits for the jobs in the group to finish, yielding each job as it
+        reaches a finished (DONE, ERROR or CANCELLED) state.
+
+        If fail_fast is set, the first job to end in ERROR causes all unfinished
+        jobs to be cancelled (they are then yielded as they become CANCELLED).
+
+        If a job no longer exists, a NoSuchJobException is raised. Other errors
+        fetching a job's state (e.g. transient API errors) are logged, and the
+        job polled again on the next tick.
+
+        :param waiter: the Waiter to poll with (optional)
+        :param fail_fast: cancel the remaining jobs if one fails.
+        :return: generator of finished Job objects, in order of completion
+        """
+        for job, _ in self._iter_completed(waiter, fail_fast):
+            yield job
+
+    def _iter_completed(self, waiter=None, fail_fast=False):
+        """
+        As as_completed, but yields each finished job along with the final
+        state it was seen in.
+
+        :return: generator of (Job, state)
+        """
+        pending = {job.job_id: job for job in self.jobs}
+        cancelled = False
+
+        for _ in (waiter or Waiter()).ticks("{} jobs to finish".format(len(pending))):
+            statuses = Jobs(self.dataproc).statuses(pending)
+
+            failed = False
+            for job_id, state in statuses.items():
+                if isinstance(state, NoSuchJobException):
+                    raise state
+                if isinstance(state, Exception):
+                    log.info("Failed to fetch the state of job {}, retrying: {}".format(
+                        job_id, state))
+                    continue
+                if state in Job.FINISHED_STATES:
+                    failed = failed or state == 'ERROR'
+                    yield pending.pop(job_id), state
+
+            if fail_fast and failed and pending and not cancelled:
+                log.info("Job failed, cancelling {} remaining jobs...".format(len(pending)))
+                for job in pending.values():
+                    # the job may have finished since it was polled, so can't be cancelled
+                    try:
+                        job.cancel()
+                    except Exception as e:
+                        log.info("Failed to cancel job {}: {}".format(job.job_id, e))
+                cancelled = True
+
+            if not pending:
                 break
-            page_token = moar['nextPageToken']
 
-        result['jobs'] = result['jobs'][:count]
+    def wait_all(self, waiter=None, fail_fast=False):
+        """
+        Waits for all the jobs in the group to finish.
 
-        if minimal:
-            return {j['reference']['jobId']: j['status']['state'] for j in result.get('jobs', [])}
-        return {j['reference']['jobId']: j for j in result.get('jobs', [])}
+        :param waiter: the Waiter to poll with (optional)
+        :param fail_fast: cancel the remaining jobs if one fails.
+        :return: dict of job ID -> final job state
+        """
+        return {job.job_id: state for job, state in self._iter_completed(waiter, fail_fast)}
+
+
+def as_completed(jobs, waiter=None, fail_fast=False):
+    """
+    Waits for the given jobs to finish, yielding each one as it finishes.
+    See JobGroup.as_completed.
+
+    :param jobs: list of Job objects, from the same DataProc client
+    :return: generator of finished Job objects, in order of completion
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return iter([])
+    return JobGroup(jobs[0].dataproc, jobs).as_completed(waiter, fail_fast)
+
+
+def wait_all(jobs, waiter=None, fail_fast=False):
+    """
+    Waits for all the given jobs to finish. See JobGroup.wait_all.
+
+    :param jobs: list of Job objects, from the same DataProc client
+    :return: dict of job ID -> final job state
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return {}
+    return JobGroup(jobs[0].dataproc, jobs).wait_all(waiter, fail_fast)
@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pydataproc.cache import MetadataCache
+from pydataproc.dataproc import DataProc
+from pydataproc.errors import NoSuchClusterException, NoSuchJobException, \
+    RegionsFailedException
+
+
+class MultiRegionDataProc(object):
+    """
+    Gives a single point to query clusters and jobs across several regions of
+    a project.
+
+    Listings are run against every region concurrently (sharing one connection
+    pool), and merged, keyed by (region, name). Cluster and job handles are
+    routed to the right region through an index of where each cluster/job
+    lives. The index is filled from listings, or by looking in every region at
+    once on a miss, and its entries last `index_ttl` seconds.
+
+    If a query fails in some regions, a RegionsFailedException is raised once
+    every region has answered, carrying the error from each failed region and
+    the results from the rest.
+
+    `zones` optionally maps regions to the zones clusters are created in (by
+    default, each region's 'b' zone). Any additional keyword arguments are
+    passed to the underlying DataProc clients, except that a `history` (which
+    holds a single region's jobs) is only given to the first region's client.
+    """
+
+    def __init__(self, project, regions, zones=None, index_ttl=300, index_size=10000, **kwargs):
+
+        assert project
+        assert regions
+
+        self.project = project
+        self.regions = list(regions)
+        zones = zones or {}
+
+        base = self._build_dataproc(self.regions[0], zones.get(self.regions[0]), **kwargs)
+        self._dataprocs = OrderedDict([(self.regions[0], base)])
+        for region in self.regions[1:]:
+            self._dataprocs[region] = base.for_region(region, zones.get(region))
+        self._index = MetadataCache(ttl=index_ttl, max_size=index_size)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.regions))
+
+    def _build_dataproc(self, region, zone, **kwargs):
+        """Builds the client for the first region, which the others share connections with."""
+        return DataProc(self.project, region=region, zone=zone or '{}-b'.format(region), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def dataproc(self, region):
+        """
+        Returns the client for a single region, e.g. to create a cluster there.
+
+        :param region: string, one of the regions
+        :return: DataProc
+        """
+        assert region in self._dataprocs, "'{}' is not one of {}".format(region, self.regions)
+        return self._dataprocs[region]
+
+    def _fan_out(self, fn):
+        """
+        Calls fn(dataproc) for every region concurrently.
+
+        :return: OrderedDict of region -> result (or the exception raised in that region)
+        """
+        futures = OrderedDict(
+            (region, self._executor.submit(fn, dataproc))
+            for region, dataproc in self._dataprocs.items()
+        )
+        return OrderedDict(
+            (region, future.exception() or future.result()) for region, future in futures.items()
+        )
+
+    @staticmethod
+    def _raise_for_errors(description, results, partial):
+        """
+        Raises a RegionsFailedException, carrying the partial results, if any
+        of the per-region results is an exception.
+
+        :param description: what was being done, for the error message
+        :param results: OrderedDict of region -> result or exception, as returned by _fan_out
+        :param partial: the results gathered from the regions that succeeded
+        """
+        errors = OrderedDict((region, result) for region, result in results.items()
+                             if isinstance(result, Exception))
+        if errors:
+            raise RegionsFailedException("Failed {} in {}: {}".format(
+                description, list(errors),
+                '; '.join('{}: {}'.format(region, e) for region, e in errors.items())),
+                errors, partial)
+
+    def list_clusters(self, minimal=True, filter=None):
+        """
+        Lists the clusters in every region. See Clusters.list.
+
+        :param minimal: returns only the cluster state if set to True.
+        :param filter: string, API filter expression (optional)
+        :return: dict of (region, cluster name) -> cluster information
+        """
+        result = {}
+        results = self._fan_out(lambda dp: dp.clusters().list(minimal=minimal, filter=filter))
+        for region, clusters in results.items():
+            if isinstance(clusters, Exception):
+                continue
+            for cluster_name, info in clusters.items():
+                self._index.put(('cluster', cluster_name), region)
+                result[(region, cluster_name)] = info
+
+        self._raise_for_errors('listing clusters', results, result)
+        return result
+
+    def list_jobs(self, minimal=True, running=True, count=10, cluster_name=None, filter=None):
+        """
+        Lists the jobs in every region (up to `count` per region). See Jobs.list.
+
+        :param minimal: returns only the job state if set to True.
+        :param running: returns only ACTIVE jobs if set to True.
+        :param count: maximum number of jobs to return per region.
+        :param cluster_name: filter by cluster name. Defaults to None.
+        :param filter: string, API filter expression (optional)
+        :return: dict of (region, job ID) -> job information
+        """
+        result = {}
+        results = self._fan_out(lambda dp: dp.jobs().list(
+            minimal=minimal, running=running, count=count, cluster_name=cluster_name,
+            filter=filter))
+        for region, jobs in results.items():
+            if isinstance(jobs, Exception):
+                continue
+            for job_id, info in jobs.items():
+                self._index.put(('job', job_id), region)
+                result[(region, job_id)] = info
+
+        self._raise_for_errors('listing jobs', results, result)
+        return result
+
+    def region_of(self, cluster_name=None, job_id=None):
+        """
+        Finds the region a cluster or job is in, from the index if possible,
+        otherwise by looking in every region concurrently.
+
+        :param cluster_name: string, name of the cluster to find
+        :param job_id: string, ID of the job to find
+        :return: string, the region, or None if it wasn't found in any region
+        """
+        assert (cluster_name is None) != (job_id is None), "Specify one of cluster_name or job_id"
+
+        key = ('cluster', cluster_name) if cluster_name else ('job', job_id)
+
+        def exists(dp):
+            if cluster_name:
+                return dp.clusters(cluster_name, lazy=True).exists()
+            return dp.jobs(job_id, lazy=True).exists()
+
+        region = self._index.get(key)
+        if region is None:
+            results = self._fan_out(exists)
+            found = [region for region, present in results.items() if present is True]
+            if not found:
+                # it may be in a region that couldn't be checked
+                self._raise_for_errors("looking for {} '{}'".format(*key), results, {})
+                return None
+            region = found[0]
+            self._index.put(key, region)
+        return region
+
+    def clusters(self, cluster_name, lazy=None):
+        """
+        Returns a cluster, from whichever region it is in.
+
+        :param cluster_name: string, name of cluster to fetch
+        :param lazy: skip the existence check until first use.
+        :return: Cluster
+        """
+        region = self.region_of(cluster_name=cluster_name)
+        if region is None:
+            raise NoSuchClusterException("Cluster '{}' does not exist in any of {}".format(
+                cluster_name, self.regions))
+        return self._dataprocs[region].clusters(cluster_name, lazy=lazy)
+
+    def jobs(self, job_id, lazy=None):
+        """
+        Returns a job, from whichever region it is in.
+
+        :param job_id: string, ID of job to fetch
+        :param lazy: skip the existence check until first use.
+        :return: Job
+        """
+        region = self.region_of(job_id=job_id)
+        if region is None:
+            raise NoSuchJobException("No job found with ID {} in any of {}".format(
+                job_id, self.regions))
+        return self._dataprocs[region].jobs(job_id, lazy=lazy)
+
+    def close(self):
+        """
+        Shuts down the threads used to query regions concurrently, and closes
+        the underlying DataProc clients.
+
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
+        # the other regions' clients share the first region's resources
+        self._dataprocs[self.regions[0]].close()
@@ -0,0 +1,247 @@
+import copy
+
+from googleapiclient.errors import HttpError
+
+from pydataproc.batch import execute_batched, is_not_found
+from pydataproc.errors import NoSuchOperationException, OperationFailedException
+from pydataproc.logger import log
+from pydataproc.waiter import Waiter
+
+# how each type of cluster operation is described in log/error messages
+DESCRIPTIONS = {
+    'CREATE': 'creation',
+    'UPDATE': 'update',
+    'DELETE': 'deletion'
+}
+
+
+class Operation(object):
+    """
+    A long-running DataProc operation, e.g. creating, updating or deleting a
+    cluster, as returned by those calls.
+
+    Operations are polled through the operations API, which returns only the
+    (small) operation resource, and reports exactly when the operation
+    finished and whether it failed.
+    """
+
+    def __init__(self, dataproc, name, info=None):
+
+        assert dataproc
+        assert name
+
+        self.dataproc = dataproc
+        self.name = name
+        self._info = info
+
+    def info(self, refresh=False):
+        """
+        Returns the operation resource. Once an operation is done, it doesn't
+        change, so is never fetched again.
+
+        :param refresh: fetch the operation, rather than using the last fetched version.
+        :return: dict, operation resource
+        """
+        if self._info is not None and (not refresh or self._info.get('done')):
+            return self._info
+
+        try:
+            request = self.dataproc.client.projects().regions().operations().get(name=self.name)
+            self._info = self.dataproc.execute(request)
+        except HttpError as e:
+            if e.resp['status'] == '404':
+                raise NoSuchOperationException("Operation '{}' does not exist".format(self.name))
+            raise e
+
+        return self._info
+
+    @property
+    def metadata(self):
+        return self.info().get('metadata', {})
+
+    @property
+    def cluster_name(self):
+        return self.metadata.get('clusterName')
+
+    @property
+    def operation_type(self):
+        return self.metadata.get('operationType')
+
+    @property
+    def description(self):
+        if self.cluster_name and self.operation_type in DESCRIPTIONS:
+            return "{} of cluster '{}'".format(DESCRIPTIONS[self.operation_type],
+                                               self.cluster_name)
+        return "operation '{}'".format(self.name)
+
+    def done(self, refresh=True):
+        """
+        Returns True if the operation has finished, successfully or not.
+
+        :param refresh: fetch the operation's current state, if not already known to be done.
+        :return: boolean
+        """
+        return bool(self.info(refresh=refresh).get('done'))
+
+    def error(self):
+        """
+        Returns the error the operation failed with, if it has finished and failed.
+
+        :return: dict with 'code' and 'message', or None
+        """
+        return self.info().get('error')
+
+    def wait(self, timeout=None, waiter=None):
+        """
+        Waits for the operation to finish, successfully or not.
+
+        :param timeout: maximum time to wait, in seconds, after which a
+        WaitTimeoutException is raised. Overrides the waiter's timeout.
+        :param waiter: the Waiter to poll with (optional)
+        :return: the Operation
+        """
+        waiter = copy.copy(waiter or Waiter())
+        if timeout is not None:
+            waiter.timeout = timeout
+
+        if not self.done(refresh=False):
+            log.info("Waiting for {}...".format(self.description))
+            waiter.wait(lambda: self.info(refresh=True), lambda info: info.get('done'),
+                        self.description)
+        return self
+
+    def result(self, timeout=None, waiter=None):
+        """
+        Waits for the operation to finish, raising an OperationFailedException
+        if it failed.
+
+        :param timeout: maximum time to wait, in seconds (see wait)
+        :param waiter: the Waiter to poll with (optional)
+        :return: dict, the operation's response
+        """
+        self.wait(timeout, waiter)
+        self.raise_for_error()
+        return self.info().get('response', {})
+
+    def raise_for_error(self):
+        """
+        Raises an OperationFailedException if the operation has failed.
+
+        :return: None
+        """
+        error = self.error()
+        if error is not None:
+            description = self.description
+            raise OperationFailedException("{} failed: {}".format(
+                description[0].upper() + description[1:], error.get('message', '')))
+
+    def cancel(self):
+        """
+        Asks for the operation to be cancelled. Not every operation can be, so
+        wait for it and check its result to see whether it was.
+
+        :return: None
+        """
+        log.info("Cancelling {}...".format(self.description))
+        try:
+            request = self.dataproc.client.projects().regions().operations().cancel(
+                name=self.name)
+            self.dataproc.execute(request, idempotent=True)
+        except HttpError as e:
+            if e.resp['status'] == '404':
+                raise NoSuchOperationException("Operation '{}' does not exist".format(self.name))
+            raise e
+
+
+class Operations(object):
+
+    def __init__(self, dataproc):
+
+        assert dataproc
+
+        self.dataproc = dataproc
+
+    def list(self, cluster_name=None, running=False):
+        """
+        Queries the DataProc API, returning a dict of operations in the region,
+        keyed by operation name.
+
+        :param cluster_name: only return operations on this cluster, if specified.
+        :param running: only return operations that haven't finished if set to True.
+        :return: dict of operation name -> Operation
+        """
+        return {
+            operation.name: operation for operation in self.iter_operations()
+            if (cluster_name is None or operation.cluster_name == cluster_name) and
+            not (running and operation.done(refresh=False))
+        }
+
+    def iter_operations(self, page_size=None):
+        """
+        Queries the DataProc API, yielding each operation in the region in
+        turn. Pages of results are only fetched as the generator is consumed.
+
+        :param page_size: number of operations to fetch per API call. Defaults to the API default.
+        :return: generator of Operation objects
+        """
+        page_token = None
+        while True:
+            request = self.dataproc.client.projects().regions().operations().list(
+                name='projects/{}/regions/{}/operations'.format(
+                    self.dataproc.project, self.dataproc.region),
+                pageSize=page_size,
+                pageToken=page_token
+            )
+            page = self.dataproc.execute(request)
+
+            for info in page.get('operations', []):
+                yield Operation(self.dataproc, info['name'], info)
+
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+
+
+def wait_all(operations, waiter=None):
+    """
+    Waits for all the given operations to finish, successfully or not, polling
+    them together with one batched API call per poll. Check each operation's
+    error() (or call its result()) afterwards to see whether it succeeded.
+
+    Operations that still fail transiently (e.g. with a 429 or 503) once the
+    batch's own retries are used up are polled again on the next tick, rather
+    than raised. If the waiter times out, a WaitTimeoutException is raised;
+    operations that finished in time will have done() True.
+
+    :param operations: list of Operation objects, from the same DataProc client
+    :param waiter: the Waiter to poll with (optional)
+    :return: None
+    """
+    pending = {operation.name: operation for operation in operations
+               if not operation.done(refresh=False)}
+    if not pending:
+        return
+
+    dataproc = next(iter(pending.values())).dataproc
+    retry_statuses = dataproc.executor.retry_policy.retry_statuses
+    log.info("Waiting for {} operations to finish...".format(len(pending)))
+    for _ in (waiter or Waiter()).ticks("{} operations to finish".format(len(pending))):
+        requests = {
+            name: dataproc.client.projects().regions().operations().get(name=name)
+            for name in pending
+        }
+        for name, (info, error) in execute_batched(dataproc, requests).items():
+            if is_not_found(error):
+                raise NoSuchOperationException("Operation '{}' does not exist".format(name))
+            elif error is not None and int(error.resp['status']) in retry_statuses:
+                log.debug("Failed to poll operation '{}', retrying: {}".format(name, error))
+                continue
+            elif error is not None:
+                raise error
+
+            pending[name]._info = info
+            if info.get('done'):
+                del pending[name]
+
+        if not pending:
+            break
@@ -0,0 +1,366 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from pydataproc.cluster import Cluster
+from pydataproc.clusters import Clusters
+from pydataproc.logger import log
+from pydataproc.errors import ClusterAlreadyExistsException, ClusterHasGoneAwayException, \
+    ClusterPoolClosedException, NoSuchClusterException, WaitTimeoutException
+
+# the Clusters.create arguments making up a pool's cluster spec
+SPEC_KEYS = ('num_masters', 'num_workers', 'master_type', 'worker_type',
+             'master_disk_gb', 'worker_disk_gb', 'init_scripts')
+
+
+class ClusterPool(object):
+    """
+    Keeps a pool of warm clusters, all created to the same spec (any of the
+    Clusters.create arguments in SPEC_KEYS), and leases them out, so that jobs
+    don't each have to wait for a cluster to boot.
+
+    The pool keeps `size` clusters. If all of them are leased, more are created
+    on demand, up to `max_size` (default: `size`); once those have been idle for
+    `idle_ttl` seconds, they are deleted again. Clusters are health-checked when
+    leased and released, and any that have gone into ERROR (or away) are deleted
+    and replaced. Clusters in other states, e.g. UPDATING while being resized,
+    are left alone.
+
+    Idle clusters are also checked, and retired, every `maintenance_interval`
+    seconds by a background thread (or whenever maintain() is called).
+
+    Clusters are named `name_prefix` followed by a random suffix. Closing the
+    pool deletes all of its clusters (leased ones once they are released).
+    """
+
+    # consecutive failed creations before lease() gives up
+    MAX_CREATE_FAILURES = 3
+
+    # states in which a cluster is replaced; DELETING clusters are as good as gone
+    UNHEALTHY_STATES = ('ERROR', 'DELETING')
+
+    def __init__(self, dataproc, size=1, max_size=None, idle_ttl=None, maintenance_interval=60,
+                 name_prefix='pydataproc-pool', waiter=None, clock=time.time, **spec):
+
+        assert dataproc
+        assert size >= 0
+        assert max_size is None or max_size >= max(size, 1)
+        assert name_prefix
+        assert set(spec) <= set(SPEC_KEYS), "Unknown cluster spec: {}".format(
+            sorted(set(spec) - set(SPEC_KEYS)))
+
+        self.dataproc = dataproc
+        self.size = size
+        self.max_size = max_size or max(size, 1)
+        self.idle_ttl = idle_ttl
+        self.maintenance_interval = maintenance_interval
+        self.name_prefix = name_prefix
+        self.waiter = waiter
+        self.clock = clock
+        self.spec = spec
+
+        self._clusters = Clusters(dataproc)
+        # (cluster, time it became idle), most recently released last
+        self._idle = []
+        self._leased = {}
+        self._creating = 0
+        self._waiting = 0
+        self._failures = 0
+        self._last_error = None
+        self._closed = False
+        self._available = threading.Condition(threading.Lock())
+        self._executor = ThreadPoolExecutor(max_workers=self.max_size)
+        self._stopped = threading.Event()
+        self._maintenance_thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """
+        Starts creating the pool's clusters (without waiting for them to be
+        ready), and the background maintenance thread.
+
+        :return: the ClusterPool
+        """
+        with self._available:
+            self._check_open()
+            self._replenish()
+
+        if self.maintenance_interval and self._maintenance_thread is None:
+            self._maintenance_thread = threading.Thread(target=self._maintain_periodically)
+            self._maintenance_thread.daemon = True
+            self._maintenance_thread.start()
+        return self
+
+    def lease(self, timeout=None):
+        """
+        Leases a running cluster from the pool, waiting for one to become
+        available (or be created) if need be. The cluster must be handed back
+        with release() once finished with.
+
+        :param timeout: maximum time to wait, in seconds. Defaults to waiting indefinitely.
+        :return: the leased Cluster
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            cluster = self._take(deadline)
+            try:
+                healthy = self._is_healthy(cluster)
+            except Exception:
+                # couldn't tell, so keep the cluster for next time
+                self._return(cluster)
+                raise
+
+            if healthy:
+                log.debug("Leased cluster '{}' from the pool".format(cluster.cluster_name))
+                return cluster
+
+            log.info("Pool cluster '{}' is unhealthy, replacing it".format(
+                cluster.cluster_name))
+            self._discard(cluster)
+
+    def release(self, cluster):
+        """
+        Hands a leased cluster back to the pool. If it has gone into ERROR (or
+        away), it is deleted and replaced.
+
+        :param cluster: the Cluster, as returned by lease()
+        :return: None
+        """
+        with self._available:
+            assert self._leased.get(cluster.cluster_name) is cluster, \
+                "'{}' is not leased from this pool".format(cluster.cluster_name)
+
+        try:
+            healthy = self._is_healthy(cluster)
+        except Exception as e:
+            # the next lease checks it again anyway
+            log.debug("Unable to check pool cluster '{}': {}".format(cluster.cluster_name, e))
+            healthy = True
+
+        if healthy:
+            self._return(cluster)
+        else:
+            log.info("Pool cluster '{}' is unhealthy, replacing it".format(
+                cluster.cluster_name))
+            self._discard(cluster)
+
+    @contextmanager
+    def leased(self, timeout=None):
+        """
+        Leases a cluster for the duration of the with block.
+
+        :param timeout: maximum time to wait for a cluster, in seconds
+        :return: context manager yielding the leased Cluster
+        """
+        cluster = self.lease(timeout)
+        try:
+            yield cluster
+        finally:
+            self.release(cluster)
+
+    def maintain(self):
+        """
+        Checks the idle clusters (in a single batched API call), replacing any
+        that have gone into ERROR (or away), and deletes any clusters beyond `size`
+        that have been idle for longer than `idle_ttl`.
+
+        :return: None
+        """
+        with self._available:
+            if self._closed:
+                return
+            idle = list(self._idle)
+
+        statuses = self._clusters.statuses([c.cluster_name for c, _ in idle]) if idle else {}
+
+        retired = []
+        with self._available:
+            for entry in idle:
+                cluster, _ = entry
+                status = statuses[cluster.cluster_name]
+                # leased since, or unknown (e.g. the check itself failed)
+                if entry not in self._idle or (
+                        isinstance(status, Exception) and
+                        not isinstance(status, ClusterHasGoneAwayException)):
+                    continue
+                if isinstance(status, Exception) or status in self.UNHEALTHY_STATES:
+                    log.info("Pool cluster '{}' is unhealthy, replacing it".format(
+                        cluster.cluster_name))
+                    self._idle.remove(entry)
+                    retired.append(cluster)
+
+            if self.idle_ttl is not None:
+                now = self.clock()
+                for entry in sorted(self._idle, key=lambda e: e[1]):
+                    if self._total() <= self.size or now - entry[1] <= self.idle_ttl:
+                        break
+                    log.info("Retiring idle pool cluster '{}'".format(entry[0].cluster_name))
+                    self._idle.remove(entry)
+                    retired.append(entry[0])
+
+            # the pool may have been closed since the check, shutting down the executor
+            if not self._closed:
+                self._replenish()
+
+        for cluster in retired:
+            self._delete(cluster)
+
+    def counts(self):
+        """
+        Returns the number of clusters in the pool, by state.
+
+        :return: dict of 'idle', 'leased' and 'creating' counts
+        """
+        with self._available:
+            return {
+                'idle': len(self._idle),
+                'leased': len(self._leased),
+                'creating': self._creating
+            }
+
+    def close(self):
+        """
+        Closes the pool, deleting its idle clusters. Leased clusters are deleted
+        when they are released, and clusters still being created once they are
+        ready. Creations that haven't started yet are skipped.
+
+        :return: None
+        """
+        with self._available:
+            if self._closed:
+                return
+            self._closed = True
+            idle = [cluster for cluster, _ in self._idle]
+            self._idle = []
+            self._available.notify_all()
+
+        self._stopped.set()
+        for cluster in idle:
+            self._delete(cluster)
+        self._executor.shutdown(wait=False)
+
+    def _check_open(self):
+        if self._closed:
+            raise ClusterPoolClosedException("Cluster pool '{}' is closed".format(self.name_prefix))
+
+    def _total(self):
+        return len(self._idle) + len(self._leased) + self._creating
+
+    def _take(self, deadline):
+        with self._available:
+            self._waiting += 1
+            try:
+                while True:
+                    self._check_open()
+                    if self._idle:
+                        cluster, _ = self._idle.pop()
+                        self._leased[cluster.cluster_name] = cluster
+                        return cluster
+
+                    if self._failures >= self.MAX_CREATE_FAILURES:
+                        self._failures = 0
+                        raise Exception("Unable to create a cluster for the pool: {}".format(
+                            self._last_error))
+
+                    # only create clusters for leases that pending creations won't satisfy
+                    if self._creating < self._waiting and self._total() < self.max_size:
+                        self._create()
+
+                    if deadline is None:
+                        self._available.wait()
+                    else:
+                        remaining = deadline - self.clock()
+                        if remaining <= 0:
+                            raise WaitTimeoutException(
+                                "Timed out waiting for a cluster from pool '{}'".format(
+                                    self.name_prefix))
+                        self._available.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _return(self, cluster):
+        with self._available:
+            del self._leased[cluster.cluster_name]
+            if not self._closed:
+                self._idle.append((cluster, self.clock()))
+                self._available.notify()
+                return
+        self._delete(cluster)
+
+    def _discard(self, cluster):
+        with self._available:
+            del self._leased[cluster.cluster_name]
+            if not self._closed:
+                self._replenish()
+        self._delete(cluster)
+
+    def _replenish(self):
+        """Starts creating clusters to bring the pool back up to size. Call with the lock held."""
+        while self._total() < self.size:
+            self._create()
+
+    def _create(self):
+        """Starts creating a cluster in the background. Call with the lock held."""
+        self._creating += 1
+        self._executor.submit(self._build)
+
+    def _build(self):
+        with self._available:
+            # queued before the pool was closed, so there's nothing left to create it for
+            if self._closed:
+                self._creating -= 1
+                self._available.notify_all()
+                return
+
+        cluster_name = '{}-{}'.format(self.name_prefix, uuid.uuid4().hex[:8])
+        try:
+            cluster = self._clusters.create(cluster_name, block=True, waiter=self.waiter,
+                                            **self.spec)
+        except Exception as e:
+            log.info("Failed to create pool cluster '{}': {}".format(cluster_name, e))
+            if not isinstance(e, ClusterAlreadyExistsException):
+                # e.g. a cluster that went into ERROR on startup
+                self._delete(Cluster(self.dataproc, cluster_name, lazy=True))
+            with self._available:
+                self._creating -= 1
+                self._failures += 1
+                self._last_error = e
+                self._available.notify_all()
+            return
+
+        with self._available:
+            self._creating -= 1
+            self._failures = 0
+            if not self._closed:
+                self._idle.append((cluster, self.clock()))
+                self._available.notify()
+                return
+        self._delete(cluster)
+
+    def _is_healthy(self, cluster):
+        try:
+            return cluster.status(refresh=True) not in self.UNHEALTHY_STATES
+        except (NoSuchClusterException, ClusterHasGoneAwayException):
+            return False
+
+    def _delete(self, cluster):
+        try:
+            cluster.delete()
+        except (NoSuchClusterException, ClusterHasGoneAwayException):
+            pass
+        except Exception as e:
+            log.info("Failed to delete pool cluster '{}': {}".format(cluster.cluster_name, e))
+
+    def _maintain_periodically(self):
+        while not self._stopped.wait(self.maintenance_interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                log.info("Cluster pool maintenance failed: {}".format(e))
@@ -0,0 +1,184 @@
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from pydataproc.logger import log
+
+# a single (possibly retried) API call
+CallEvent = namedtuple('CallEvent', ['operation', 'latency', 'status', 'retries'])
+
+
+class Histogram(object):
+    """
+    Latency histogram with fixed (Prometheus-style, cumulative) buckets.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):
+        """
+        Returns an estimate (the upper bound of the containing bucket) of the
+        p-th percentile, or None if nothing has been observed.
+        """
+        if not self.count:
+            return None
+        target = self.count * p / 100.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': list(zip(self.buckets, self.counts))
+        }
+
+
+class OperationStats(object):
+    """
+    Counters and latency histogram for a single API operation.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses = {}
+        self.latency = Histogram()
+
+    def record(self, event):
+        self.calls += 1
+        self.retries += event.retries
+        if event.status is None or event.status >= 400:
+            self.errors += 1
+        self.statuses[event.status] = self.statuses.get(event.status, 0) + 1
+        self.latency.observe(event.latency)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'statuses': dict(self.statuses),
+            'latency': self.latency.to_dict()
+        }
+
+
+class Stats(object):
+    """
+    Collects per-operation API call counts, retry counts, HTTP statuses and
+    latency histograms.
+
+    Hooks (functions taking a CallEvent) can be added to export each call
+    elsewhere, e.g. to Prometheus or OpenTelemetry. Errors raised by hooks are
+    logged, so never affect the API call itself.
+    """
+
+    def __init__(self):
+        self._operations = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        """
+        Records a single API call.
+
+        :param event: CallEvent
+        :return: None
+        """
+        with self._lock:
+            if event.operation not in self._operations:
+                self._operations[event.operation] = OperationStats()
+            self._operations[event.operation].record(event)
+            hooks = list(self._hooks)
+
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception:
+                log.exception("Stats hook {!r} failed".format(hook))
+
+    def add_hook(self, hook):
+        """
+        Adds a function to be called with the CallEvent of every API call.
+
+        :param hook: function taking a CallEvent
+        :return: None
+        """
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """
+        Removes a hook previously added with add_hook.
+
+        :param hook: the hook to remove
+        :return: None
+        """
+        with self._lock:
+            self._hooks.remove(hook)
+
+    @property
+    def total_calls(self):
+        with self._lock:
+            return sum(op.calls for op in self._operations.values())
+
+    def snapshot(self):
+        """
+        Returns the stats collected so far.
+
+        :return: dict of operation name -> dict of stats
+        """
+        with self._lock:
+            return {name: op.to_dict() for name, op in self._operations.items()}
+
+    def reset(self):
+        """
+        Clears all stats collected so far (hooks are kept).
+
+        :return: None
+        """
+        with self._lock:
+            self._operations.clear()
+
+    @contextmanager
+    def scope(self):
+        """
+        Collects stats for only the API calls made within the with block
+        (from any thread).
+
+        :return: context manager yielding a Stats object
+        """
+        scoped = Stats()
+        self.add_hook(scoped.record)
+        try:
+            yield scoped
+        finally:
+            self.remove_hook(scoped.record)
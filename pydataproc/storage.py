@@ -0,0 +1,146 @@
+import threading
+
+from googleapiclient.errors import HttpError
+
+
+def split_gcs_uri(uri):
+    """
+    Splits a gs://bucket/path URI into its bucket and object path.
+
+    :param uri: string, Google Storage URI
+    :return: tuple of (bucket, object path)
+    """
+    assert uri.startswith('gs://'), "'{}' is not a Google Storage URI".format(uri)
+    bucket, _, path = uri[len('gs://'):].partition('/')
+    return bucket, path
+
+
+class GcsStorage(object):
+    """
+    Minimal read-only access to Google Storage objects, through the GCS JSON API.
+    Requests are executed over the DataProc client's connection pool.
+    """
+
+    def __init__(self, dataproc, client):
+
+        assert dataproc
+        assert client
+
+        self.dataproc = dataproc
+        self.client = client
+
+    def list(self, bucket, prefix):
+        """
+        Lists the objects in a bucket under the given prefix.
+
+        :param bucket: string, bucket name
+        :param prefix: string, object name prefix
+        :return: list of (object name, size in bytes) tuples, sorted by name
+        """
+        objects = []
+        page_token = None
+        while True:
+            request = self.client.objects().list(
+                bucket=bucket,
+                prefix=prefix,
+                fields='items(name,size),nextPageToken',
+                pageToken=page_token
+            )
+            page = self.dataproc.execute(request)
+            objects.extend((o['name'], int(o['size'])) for o in page.get('items', []))
+
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+
+        return sorted(objects)
+
+    def read(self, bucket, name, start=0):
+        """
+        Reads the contents of an object, from the given byte offset onwards.
+
+        :param bucket: string, bucket name
+        :param name: string, object name
+        :param start: int, byte offset to read from
+        :return: bytes
+        """
+        request = self.client.objects().get_media(bucket=bucket, object=name)
+        if start:
+            request.headers['range'] = 'bytes={}-'.format(start)
+        try:
+            return self.dataproc.execute(request)
+        except HttpError as e:
+            # nothing beyond the offset yet
+            if e.resp['status'] == '416':
+                return b''
+            raise e
+
+
+class MemoryStorage(object):
+    """
+    In-memory stand-in for GcsStorage, e.g. for testing code that tails job output.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def append(self, uri, data):
+        """
+        Appends data to an object, creating it if needed.
+
+        :param uri: string, gs://bucket/path URI of the object
+        :param data: bytes to append
+        :return: None
+        """
+        with self._lock:
+            self.objects.setdefault(split_gcs_uri(uri), bytearray()).extend(data)
+
+    def list(self, bucket, prefix):
+        with self._lock:
+            return sorted(
+                (name, len(data)) for (b, name), data in self.objects.items()
+                if b == bucket and name.startswith(prefix)
+            )
+
+    def read(self, bucket, name, start=0):
+        with self._lock:
+            return bytes(self.objects[(bucket, name)][start:])
+
+
+class OutputTail(object):
+    """
+    Incrementally reads job driver output from storage.
+
+    DataProc writes driver output to a series of objects sharing a common prefix
+    (driveroutput.000000000, driveroutput.000000001, ...). Each call to
+    read_new() only fetches the bytes written since the previous call, using
+    ranged reads.
+    """
+
+    def __init__(self, storage, uri):
+
+        assert storage
+        assert uri
+
+        self.storage = storage
+        self.bucket, self.prefix = split_gcs_uri(uri)
+        self._offsets = {}
+
+    def read_new(self):
+        """
+        Reads any output written since the last call.
+
+        :return: list of bytes chunks, in output order
+        """
+        chunks = []
+        for name, size in self.storage.list(self.bucket, self.prefix):
+            offset = self._offsets.get(name, 0)
+            if size <= offset:
+                continue
+
+            data = self.storage.read(self.bucket, name, start=offset)
+            if data:
+                self._offsets[name] = offset + len(data)
+                chunks.append(data)
+        return chunks
@@ -0,0 +1,195 @@
+from collections import OrderedDict
+
+try:
+    from sys import intern
+except ImportError:
+    # Python 2, where intern is a builtin
+    pass
+
+# the key of each type of job in the API's job resource, the short name of
+# that type, and the fields (one of which is always set) identifying it
+JOB_TYPES = (
+    ('hadoopJob', 'hadoop', 'mainClass,mainJarFileUri'),
+    ('sparkJob', 'spark', 'mainClass,mainJarFileUri'),
+    ('pysparkJob', 'pyspark', 'mainPythonFileUri'),
+    ('hiveJob', 'hive', 'queryFileUri,queryList'),
+    ('pigJob', 'pig', 'queryFileUri,queryList'),
+    ('sparkRJob', 'sparkR', 'mainRFileUri'),
+    ('sparkSqlJob', 'sparkSql', 'queryFileUri,queryList'),
+    ('prestoJob', 'presto', 'queryFileUri,queryList')
+)
+
+
+def _intern(value):
+    # states, types and cluster names repeat across many records, so share them
+    return intern(value) if isinstance(value, str) else value
+
+
+class _Summary(object):
+    """
+    Base for compact, read-only records of API resources, holding only a few
+    fields in __slots__ rather than the full (nested dict) resource.
+    """
+
+    __slots__ = ('_labels', 'raw')
+
+    FIELDS = ()
+
+    @property
+    def labels(self):
+        return dict(self._labels)
+
+    def as_tuple(self):
+        """
+        :return: tuple of the values of FIELDS
+        """
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_tuple() == other.as_tuple()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.as_tuple()[0])
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(field, value) for field, value in zip(self.FIELDS, self.as_tuple())))
+
+
+class JobSummary(_Summary):
+    """
+    The main fields of a job: its ID, cluster, state (and when it entered that
+    state), type (e.g. 'pyspark'), driver output URI and labels.
+
+    The full job resource is only kept (as `raw`) if asked for, otherwise `raw`
+    is None.
+    """
+
+    __slots__ = ('job_id', 'cluster_name', 'state', 'state_start_time', 'job_type',
+                 'driver_output_uri')
+
+    FIELDS = ('job_id', 'cluster_name', 'state', 'state_start_time', 'job_type',
+              'driver_output_uri', 'labels')
+
+    # partial response fields needed to build summaries
+    LIST_FIELDS = 'jobs({}),nextPageToken'.format(','.join(
+        ['reference.jobId', 'placement.clusterName', 'status(state,stateStartTime)',
+         'driverOutputResourceUri', 'labels'] +
+        ['{}({})'.format(key, fields) for key, _, fields in JOB_TYPES]
+    ))
+
+    def __init__(self, job_id, cluster_name, state, state_start_time=None, job_type=None,
+                 driver_output_uri=None, labels=(), raw=None):
+        self.job_id = job_id
+        self.cluster_name = _intern(cluster_name)
+        self.state = _intern(state)
+        self.state_start_time = state_start_time
+        self.job_type = _intern(job_type)
+        self.driver_output_uri = driver_output_uri
+        self._labels = tuple(sorted(dict(labels).items()))
+        self.raw = raw
+
+    @classmethod
+    def from_resource(cls, job, keep_raw=False):
+        """
+        Builds a summary of a job resource, as returned by the API.
+
+        :param job: dict, the job resource
+        :param keep_raw: keep the job resource as the summary's `raw` if set to True.
+        :return: JobSummary
+        """
+        return cls(
+            job['reference']['jobId'],
+            job.get('placement', {}).get('clusterName'),
+            job['status']['state'],
+            job['status'].get('stateStartTime'),
+            next((name for key, name, _ in JOB_TYPES if key in job), None),
+            job.get('driverOutputResourceUri'),
+            job.get('labels', {}),
+            raw=job if keep_raw else None
+        )
+
+
+class ClusterSummary(_Summary):
+    """
+    The main fields of a cluster: its name, state (and when it entered that
+    state), primary and secondary worker counts, and labels.
+
+    The full cluster resource is only kept (as `raw`) if asked for, otherwise
+    `raw` is None.
+    """
+
+    __slots__ = ('cluster_name', 'state', 'state_start_time', 'workers', 'secondary_workers')
+
+    FIELDS = ('cluster_name', 'state', 'state_start_time', 'workers', 'secondary_workers',
+              'labels')
+
+    # partial response fields needed to build summaries
+    LIST_FIELDS = ('clusters(clusterName,status(state,stateStartTime),labels,'
+                   'config(workerConfig.numInstances,secondaryWorkerConfig.numInstances)),'
+                   'nextPageToken')
+
+    def __init__(self, cluster_name, state, state_start_time=None, workers=0,
+                 secondary_workers=0, labels=(), raw=None):
+        self.cluster_name = cluster_name
+        self.state = _intern(state)
+        self.state_start_time = state_start_time
+        self.workers = workers
+        self.secondary_workers = secondary_workers
+        self._labels = tuple(sorted(dict(labels).items()))
+        self.raw = raw
+
+    @classmethod
+    def from_resource(cls, cluster, keep_raw=False):
+        """
+        Builds a summary of a cluster resource, as returned by the API.
+
+        :param cluster: dict, the cluster resource
+        :param keep_raw: keep the cluster resource as the summary's `raw` if set to True.
+        :return: ClusterSummary
+        """
+        config = cluster.get('config', {})
+        return cls(
+            cluster['clusterName'],
+            cluster['status']['state'],
+            cluster['status'].get('stateStartTime'),
+            config.get('workerConfig', {}).get('numInstances', 0),
+            config.get('secondaryWorkerConfig', {}).get('numInstances', 0),
+            cluster.get('labels', {}),
+            raw=cluster if keep_raw else None
+        )
+
+
+def to_columns(summaries, fields=None):
+    """
+    Converts summaries (all of the same type) into columns, e.g. for analysis:
+    the result can be passed straight to pandas.DataFrame.
+
+    :param summaries: iterable of JobSummary or ClusterSummary objects
+    :param fields: the fields to include (default: all of the summary's FIELDS)
+    :return: OrderedDict of field name -> list of values
+    """
+    summaries = list(summaries)
+    if fields is None:
+        fields = type(summaries[0]).FIELDS if summaries else ()
+
+    return OrderedDict(
+        (field, [getattr(summary, field) for summary in summaries]) for field in fields
+    )
+
+
+def to_dataframe(summaries, fields=None):
+    """
+    Converts summaries into a pandas DataFrame, with a column per field (see
+    to_columns). Requires pandas to be installed.
+
+    :param summaries: iterable of JobSummary or ClusterSummary objects
+    :param fields: the fields to include (default: all of the summary's FIELDS)
+    :return: pandas.DataFrame
+    """
+    import pandas
+
+    return pandas.DataFrame(to_columns(summaries, fields))
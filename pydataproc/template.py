@@ -0,0 +1,238 @@
+import shlex
+
+from pydataproc.summary import JOB_TYPES
+
+# the job resource key for each short job type name, e.g. 'pyspark' -> 'pysparkJob'
+JOB_TYPE_KEYS = {name: key for key, name, _ in JOB_TYPES}
+
+_URI_LISTS = ('jarFileUris', 'fileUris', 'archiveUris')
+_SPARK_FIELDS = ('mainClass', 'mainJarFileUri', 'args', 'properties', 'loggingConfig') + \
+    _URI_LISTS
+_QUERY_FIELDS = ('queryFileUri', 'queryList', 'scriptVariables', 'properties',
+                 'continueOnFailure', 'loggingConfig', 'jarFileUris')
+
+# for each job type: the fields (exactly one of which must be set) naming what
+# to run, and all the fields that type of job accepts
+JOB_TYPE_FIELDS = {
+    'hadoop': (('mainClass', 'mainJarFileUri'), _SPARK_FIELDS),
+    'spark': (('mainClass', 'mainJarFileUri'), _SPARK_FIELDS),
+    'pyspark': (('mainPythonFileUri',), ('mainPythonFileUri', 'pythonFileUris', 'args',
+                                         'properties', 'loggingConfig') + _URI_LISTS),
+    'hive': (('queryFileUri', 'queryList'), _QUERY_FIELDS),
+    'pig': (('queryFileUri', 'queryList'), _QUERY_FIELDS),
+    'sparkR': (('mainRFileUri',), ('mainRFileUri', 'args', 'properties', 'loggingConfig',
+                                   'fileUris', 'archiveUris')),
+    'sparkSql': (('queryFileUri', 'queryList'), _QUERY_FIELDS),
+    'presto': (('queryFileUri', 'queryList'), ('queryFileUri', 'queryList', 'properties',
+                                               'continueOnFailure', 'outputFormat',
+                                               'clientTags', 'loggingConfig'))
+}
+
+_LIST_FIELDS = ('args', 'pythonFileUris', 'clientTags') + _URI_LISTS
+_DICT_FIELDS = ('properties', 'scriptVariables')
+
+# str and unicode on Python 2
+_STRING_TYPES = (str, type(u''))
+
+
+def parse_args(args):
+    """
+    Splits job arguments given as a string the way a shell would, so quoted
+    arguments containing spaces are kept together. Lists are returned as they
+    are (with any numbers converted to strings).
+
+    :param args: string or list of strings
+    :return: list of strings
+    """
+    if args is None:
+        return []
+    if isinstance(args, _STRING_TYPES):
+        return shlex.split(args)
+    if not isinstance(args, (list, tuple)):
+        raise TypeError("args must be a string or a list, not {!r}".format(args))
+
+    for arg in args:
+        if not isinstance(arg, _STRING_TYPES + (int, float)) or isinstance(arg, bool):
+            raise TypeError("args must be strings, not {!r}".format(arg))
+    return [arg if isinstance(arg, _STRING_TYPES) else str(arg) for arg in args]
+
+
+def _validate(job_type, config):
+    """
+    Checks a job type's config, returning a normalised copy of it. Raises a
+    ValueError (or TypeError, for values of the wrong type) if it is invalid.
+    """
+    main_fields, fields = JOB_TYPE_FIELDS[job_type]
+
+    unknown = sorted(set(config) - set(fields))
+    if unknown:
+        raise ValueError("Unknown fields for a {} job: {}".format(job_type, unknown))
+
+    config = {field: value for field, value in config.items() if value is not None}
+    set_main_fields = [field for field in main_fields if field in config]
+    if len(set_main_fields) != 1:
+        raise ValueError("A {} job needs exactly one of {}".format(job_type, list(main_fields)))
+
+    for field, value in config.items():
+        if field == 'args':
+            config[field] = parse_args(value)
+        elif field == 'queryList':
+            config[field] = _query_list(value)
+        elif field in _LIST_FIELDS:
+            if not isinstance(value, (list, tuple)) or \
+                    not all(isinstance(v, _STRING_TYPES) for v in value):
+                raise TypeError("{} must be a list of strings, not {!r}".format(field, value))
+            config[field] = list(value)
+        elif field in _DICT_FIELDS:
+            if not isinstance(value, dict):
+                raise TypeError("{} must be a dict, not {!r}".format(field, value))
+            config[field] = {str(k): str(v) for k, v in value.items()}
+        elif field.endswith('Uri') or field in ('mainClass', 'outputFormat'):
+            if not isinstance(value, _STRING_TYPES) or not value:
+                raise TypeError("{} must be a non-empty string, not {!r}".format(field, value))
+        elif field == 'continueOnFailure':
+            if not isinstance(value, bool):
+                raise TypeError("continueOnFailure must be a bool, not {!r}".format(value))
+        elif field == 'loggingConfig':
+            if not isinstance(value, dict):
+                raise TypeError("loggingConfig must be a dict, not {!r}".format(value))
+    return config
+
+
+def _query_list(value):
+    """Normalises a queryList, given as a list of queries or as the API's dict."""
+    if isinstance(value, (list, tuple)):
+        value = {'queries': list(value)}
+    if not isinstance(value, dict) or set(value) != {'queries'} or \
+            not isinstance(value['queries'], list) or \
+            not all(isinstance(q, _STRING_TYPES) for q in value['queries']):
+        raise TypeError("queryList must be a list of queries, or a dict of 'queries' -> "
+                        "list of queries, not {!r}".format(value))
+    return value
+
+
+class JobTemplate(object):
+    """
+    A reusable job spec, for any type of DataProc job (hadoop, spark, pyspark,
+    hive, pig, sparkR, sparkSql or presto), validated once when the template
+    is created, so a malformed spec fails (with a ValueError or TypeError)
+    before any API call.
+
+    Jobs are stamped out of the template with render() (or submitted with
+    submit/submit_many), optionally overriding any of the job type's fields.
+    args given as a string are split as a shell would split them.
+
+        template = JobTemplate('pyspark', mainPythonFileUri='gs://bucket/job.py',
+                               properties={'spark.executor.memory': '4g'})
+        template.submit(cluster, args='--day 1 --name "daily report"')
+
+    :param job_type: the type of job, e.g. 'pyspark'
+    :param labels: dict of labels to give each job
+    :param max_failures_per_hour: how many times the job's driver may be
+    restarted per hour if it fails (default: not restarted)
+    :param config: the job's fields, as named in the API, e.g. mainJarFileUri,
+    args, properties. queryList can be given as a list of queries.
+    """
+
+    def __init__(self, job_type, labels=None, max_failures_per_hour=None, **config):
+
+        if job_type not in JOB_TYPE_FIELDS:
+            raise ValueError("Unknown job type '{}', expected one of {}".format(
+                job_type, sorted(JOB_TYPE_FIELDS)))
+        if max_failures_per_hour is not None and not (
+                isinstance(max_failures_per_hour, int) and max_failures_per_hour >= 0):
+            raise ValueError("max_failures_per_hour must be a non-negative int, not {!r}".format(
+                max_failures_per_hour))
+
+        self.job_type = job_type
+        self.key = JOB_TYPE_KEYS[job_type]
+        self.config = _validate(job_type, config)
+        self.labels = {str(k): str(v) for k, v in (labels or {}).items()}
+        self.max_failures_per_hour = max_failures_per_hour
+
+    def render(self, project, cluster_name, labels=None, **overrides):
+        """
+        Builds the job_details to submit a job from the template. Unless
+        fields are overridden (in which case the job is validated again), the
+        job's config is the template's own, so the result should be treated as
+        read-only.
+
+        Overridden fields replace the template's, except properties and
+        scriptVariables (and labels), which are added to the template's. Fields
+        overridden with None are removed.
+
+        :param project: the project the cluster is in
+        :param cluster_name: the cluster to run the job on
+        :param labels: dict of labels to add to the template's
+        :param overrides: fields of the job to override, e.g. args
+        :return: dict, the job_details (as taken by Cluster.submit_job)
+        """
+        config = self.config
+        if overrides:
+            config = dict(self.config)
+            for field in _DICT_FIELDS:
+                if overrides.get(field) is not None and field in config:
+                    if not isinstance(overrides[field], dict):
+                        raise TypeError("{} must be a dict, not {!r}".format(
+                            field, overrides[field]))
+                    overrides[field] = dict(config[field], **overrides[field])
+            config.update(overrides)
+            # drop the template's main field if another is given (e.g. a query file for a list)
+            main_fields = JOB_TYPE_FIELDS[self.job_type][0]
+            if any(field in overrides for field in main_fields):
+                for field in main_fields:
+                    if field not in overrides:
+                        config.pop(field, None)
+            config = _validate(self.job_type, config)
+
+        job = {
+            'placement': {'clusterName': cluster_name},
+            self.key: config
+        }
+        if self.labels or labels:
+            job['labels'] = dict(self.labels, **{str(k): str(v) for k, v in
+                                                 (labels or {}).items()})
+        if self.max_failures_per_hour is not None:
+            job['scheduling'] = {'maxFailuresPerHour': self.max_failures_per_hour}
+
+        return {'projectId': project, 'job': job}
+
+    def submit(self, cluster, job_id=None, labels=None, **overrides):
+        """
+        Submits a job from the template to the given cluster.
+
+        :param cluster: the Cluster to run the job on
+        :param job_id: the ID to give the job. Defaults to a randomly generated ID.
+        :param labels: dict of labels to add to the template's
+        :param overrides: fields of the job to override (see render)
+        :return: the submitted Job
+        """
+        return cluster.submit_job(
+            job_details=self.render(cluster.dataproc.project, cluster.cluster_name, labels,
+                                    **overrides),
+            job_id=job_id
+        )
+
+    def submit_many(self, cluster, overrides, max_workers=10):
+        """
+        Submits a job from the template to the given cluster for each set of
+        overrides, concurrently (see Cluster.submit_jobs). Every job is rendered,
+        and so validated, before any is submitted.
+
+        :param cluster: the Cluster to run the jobs on
+        :param overrides: list of dicts of overrides (see render), each of which
+        may also include a job_id
+        :param max_workers: maximum number of submissions in flight at once.
+        :return: list of the submitted Job (or the exception raised submitting it),
+        in the same order as overrides
+        """
+        specs = []
+        for override in overrides:
+            override = dict(override)
+            job_id = override.pop('job_id', None)
+            specs.append({
+                'job_details': self.render(cluster.dataproc.project, cluster.cluster_name,
+                                           **override),
+                'job_id': job_id
+            })
+        return cluster.submit_jobs(specs, max_workers=max_workers)
@@ -0,0 +1,620 @@
+"""
+An in-memory stand-in for the (subset of the) DataProc v1 REST API used by
+pydataproc, for testing and benchmarking without a GCP project.
+
+FakeDataProcAPI mimics the googleapiclient discovery client (clusters
+get/list/create/patch/delete, jobs get/list/submit/cancel, operations
+get/list/cancel and batch requests), simulating cluster/job lifecycles in
+(scaled down) real time, per-request latency, pagination and injected
+errors. FakeDataProc is a DataProc client wired up to it, via
+DataProc._get_client:
+
+    api = FakeDataProcAPI(latency=0.01)
+    dataproc = FakeDataProc(api)
+    dataproc.clusters().create('my-cluster')
+"""
+import copy
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from pydataproc.dataproc import DataProc
+from pydataproc.storage import MemoryStorage
+
+OPERATION_METADATA_TYPE = 'type.googleapis.com/google.cloud.dataproc.v1.ClusterOperationMetadata'
+
+ACTIVE_CLUSTER_STATES = ('CREATING', 'RUNNING', 'UPDATING')
+
+ACTIVE_JOB_STATES = ('PENDING', 'SETUP_DONE', 'RUNNING', 'CANCEL_PENDING')
+
+
+def _timestamp(t):
+    return '{}.{:06d}Z'.format(
+        time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(t)), int(t % 1 * 1000000))
+
+
+def http_error(status, message='', retry_after=None):
+    """
+    Builds an HttpError, as raised by googleapiclient.
+
+    :param status: int, HTTP status
+    :param message: error message
+    :param retry_after: value for the Retry-After header (optional)
+    :return: HttpError
+    """
+    headers = {'status': str(status)}
+    if retry_after is not None:
+        headers['retry-after'] = str(retry_after)
+    content = '{{"error": {{"code": {}, "message": "{}"}}}}'.format(status, message)
+    return HttpError(httplib2.Response(headers), content.encode('utf-8'))
+
+
+def _parse_fields(fields):
+    """
+    Parses a partial response `fields` parameter, e.g.
+    'clusters(clusterName,status.state),nextPageToken', into a tree of dicts.
+    """
+    tree = {}
+    end = _parse_selection(fields, 0, tree)
+    if end != len(fields):
+        raise http_error(400, "Invalid fields '{}'".format(fields))
+    return tree
+
+
+def _parse_selection(fields, pos, tree):
+    while True:
+        match = re.compile(r'\s*([\w*]+(?:[./][\w*]+)*)\s*').match(fields, pos)
+        if not match:
+            raise http_error(400, "Invalid fields '{}'".format(fields))
+        node = tree
+        for name in re.split('[./]', match.group(1)):
+            node = node.setdefault(name, {})
+        pos = match.end()
+
+        if fields[pos:pos + 1] == '(':
+            pos = _parse_selection(fields, pos + 1, node)
+            if fields[pos:pos + 1] != ')':
+                raise http_error(400, "Invalid fields '{}'".format(fields))
+            pos += 1
+        if fields[pos:pos + 1] != ',':
+            return pos
+        pos += 1
+
+
+def _select_fields(value, tree):
+    """Returns the parts of a response selected by a tree from _parse_fields."""
+    if not tree or '*' in tree:
+        return value
+    if isinstance(value, list):
+        return [_select_fields(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {k: _select_fields(value[k], sub) for k, sub in tree.items() if k in value}
+    return value
+
+
+class FakeRequest(object):
+    """
+    Mimics googleapiclient.http.HttpRequest: built by the fake client, executed later.
+    """
+
+    def __init__(self, api, method_id, method, handler, params):
+        self.api = api
+        self.methodId = method_id
+        self.method = method
+        self.headers = {}
+        self.handler = handler
+        self.params = params
+
+    def execute(self, http=None, num_retries=0):
+        self.api._simulate_latency()
+        return self.api._call(self)
+
+
+class FakeBatch(object):
+    """
+    Mimics googleapiclient.http.BatchHttpRequest.
+    """
+
+    def __init__(self, api, callback=None):
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if request_id is None:
+            request_id = str(len(self.requests))
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self, http=None):
+        self.api._simulate_latency()
+        self.api._count('batch')
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = self.api._call(request), None
+            except HttpError as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class _Resource(object):
+
+    def __init__(self, api, methods):
+        self._api = api
+        self._methods = methods
+
+    def __getattr__(self, name):
+        if name not in self._methods:
+            raise AttributeError(name)
+        method_id, method, handler = self._methods[name]
+
+        def build_request(**params):
+            # like googleapiclient, drop any parameters set to None
+            params = {k: v for k, v in params.items() if v is not None}
+            return FakeRequest(self._api, method_id, method, handler, params)
+
+        return build_request
+
+
+class FakeDataProcAPI(object):
+    """
+    In-memory fake of the DataProc v1 API, mimicking the client returned by
+    googleapiclient.discovery.build('dataproc', 'v1').
+
+    Clusters take `cluster_create_time` seconds to go from CREATING to the state
+    returned by `cluster_outcome(cluster)` (default RUNNING), updates and
+    deletes similarly, and jobs `job_run_time` seconds to finish, ending in the
+    state returned by `job_outcome(job)` (default DONE). Every request (or
+    batch) takes `latency` seconds. Lists return at most `max_page_size` results
+    per page, and support the status.state, clusterName and labels filters.
+    Responses are trimmed to any `fields` requested.
+
+    Errors can be injected for the next matching requests with inject_error.
+    """
+
+    def __init__(self, latency=0, cluster_create_time=0.5, cluster_update_time=0.2,
+                 cluster_delete_time=0.2, job_run_time=0.2, max_page_size=100,
+                 clock=time.time, sleep=time.sleep):
+        self.latency = latency
+        self.cluster_create_time = cluster_create_time
+        self.cluster_update_time = cluster_update_time
+        self.cluster_delete_time = cluster_delete_time
+        self.job_run_time = job_run_time
+        self.max_page_size = max_page_size
+        self.clock = clock
+        self.sleep = sleep
+        self.cluster_outcome = lambda cluster: 'RUNNING'
+        self.job_outcome = lambda job: 'DONE'
+
+        self.storage = MemoryStorage()
+        self.clusters_by_name = OrderedDict()
+        self.jobs_by_id = OrderedDict()
+        self.operations_by_name = {}
+        self.calls = {}
+
+        self._timelines = {}
+        self._request_ids = {}
+        self._errors = deque()
+        self._lock = threading.RLock()
+
+    # -- client interface --
+
+    def projects(self):
+        return self
+
+    def regions(self):
+        return self
+
+    def _resource(self, name, methods):
+        return _Resource(self, {
+            method: ('dataproc.projects.regions.{}.{}'.format(name, method), http_method,
+                     getattr(self, '_{}_{}'.format(name, method)))
+            for method, http_method in methods
+        })
+
+    def clusters(self):
+        return self._resource('clusters', [('get', 'GET'), ('list', 'GET'), ('create', 'POST'),
+                                           ('patch', 'PATCH'), ('delete', 'DELETE')])
+
+    def jobs(self):
+        return self._resource('jobs', [('get', 'GET'), ('list', 'GET'), ('submit', 'POST'),
+                                       ('cancel', 'POST')])
+
+    def operations(self):
+        return self._resource('operations', [('get', 'GET'), ('list', 'GET'),
+                                             ('cancel', 'POST')])
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    # -- test helpers --
+
+    def inject_error(self, status=503, method_id=None, count=1, retry_after=None):
+        """
+        Makes the next `count` requests (matching method_id, e.g.
+        'dataproc.projects.regions.clusters.get', if given) fail.
+
+        :return: None
+        """
+        with self._lock:
+            for _ in range(count):
+                self._errors.append((method_id, status, retry_after))
+
+    def add_cluster(self, cluster_name, state='RUNNING', labels=None, **config):
+        """
+        Adds an existing cluster directly, without going through create.
+
+        :return: dict, the cluster resource
+        """
+        with self._lock:
+            cluster = self._new_cluster({'clusterName': cluster_name, 'config': config,
+                                         'labels': labels or {}})
+            cluster['status'] = self._status(state)
+            self.clusters_by_name[cluster_name] = cluster
+            return cluster
+
+    def add_job(self, job_id, cluster_name='fake-cluster', state='DONE', **job):
+        """
+        Adds an existing job directly, without going through submit.
+
+        :return: dict, the job resource
+        """
+        with self._lock:
+            job = self._new_job(dict(job, reference={'jobId': job_id},
+                                     placement={'clusterName': cluster_name}))
+            job['status'] = self._status(state)
+            self.jobs_by_id[job_id] = job
+            return job
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    # -- internals --
+
+    def _simulate_latency(self):
+        if self.latency:
+            self.sleep(self.latency)
+
+    def _count(self, method_id):
+        with self._lock:
+            self.calls[method_id] = self.calls.get(method_id, 0) + 1
+
+    def _call(self, request):
+        self._count(request.methodId)
+        with self._lock:
+            for i, (method_id, status, retry_after) in enumerate(self._errors):
+                if method_id is None or method_id == request.methodId:
+                    del self._errors[i]
+                    raise http_error(status, 'Injected error', retry_after)
+
+            self._advance()
+            response = request.handler(**request.params)
+            if request.params.get('fields'):
+                response = _select_fields(response, _parse_fields(request.params['fields']))
+            return copy.deepcopy(response)
+
+    def _status(self, state, detail=None):
+        status = {'state': state, 'stateStartTime': _timestamp(self.clock())}
+        if detail:
+            status['detail'] = detail
+        return status
+
+    def _set_state(self, resource, state):
+        if resource['status']['state'] != state:
+            resource.setdefault('statusHistory', []).append(resource['status'])
+            resource['status'] = self._status(state)
+
+    def _advance(self):
+        """Moves clusters, jobs and operations along their simulated timelines."""
+        now = self.clock()
+        due = sorted((ready_at, key) for key, (ready_at, _) in self._timelines.items()
+                     if now >= ready_at)
+        for _, key in due:
+            _, on_ready = self._timelines.pop(key)
+            on_ready()
+
+    def _schedule(self, key, delay, on_ready):
+        self._timelines[key] = (self.clock() + delay, on_ready)
+
+    def _matches(self, resource, filter, cluster_name, active_states):
+        """
+        Evaluates a list filter, e.g. 'status.state = ACTIVE AND labels.env = prod',
+        against a cluster or job.
+        """
+        for term in re.split(r'\s+AND\s+', filter.strip(), flags=re.IGNORECASE):
+            field, equals, value = (part.strip() for part in term.partition('='))
+            value = value.strip('"\'')
+            if not equals:
+                raise http_error(400, "Invalid filter '{}'".format(filter))
+
+            if field == 'status.state':
+                state = resource['status']['state']
+                if value.upper() == 'ACTIVE':
+                    matches = state in active_states
+                elif value.upper() in ('INACTIVE', 'NON_ACTIVE'):
+                    matches = state not in active_states
+                else:
+                    matches = state == value.upper()
+            elif field == 'clusterName':
+                matches = cluster_name == value
+            elif field.startswith('labels.'):
+                label = resource.get('labels', {}).get(field[len('labels.'):])
+                matches = label is not None and value in ('*', label)
+            else:
+                raise http_error(400, "Unsupported filter field '{}'".format(field))
+
+            if not matches:
+                return False
+        return True
+
+    def _not_found(self, what):
+        return http_error(404, '{} not found'.format(what))
+
+    def _page(self, items, page_size, page_token):
+        page_size = min(int(page_size or self.max_page_size), self.max_page_size)
+        start = int(page_token or 0)
+        return items[start:start + page_size], (
+            str(start + page_size) if start + page_size < len(items) else None)
+
+    def _new_operation(self, cluster_name, operation_type):
+        name = 'projects/fake/regions/fake/operations/{}'.format(uuid.uuid4())
+        operation = {
+            'name': name,
+            'metadata': {
+                '@type': OPERATION_METADATA_TYPE,
+                'clusterName': cluster_name,
+                'operationType': operation_type,
+                'status': {'state': 'RUNNING'}
+            },
+            'done': False
+        }
+        self.operations_by_name[name] = operation
+        return operation
+
+    def _finish_operation(self, operation, error=None, code=13):
+        operation['done'] = True
+        operation['metadata']['status'] = {'state': 'DONE'}
+        if error:
+            operation['error'] = {'code': code, 'message': error}
+        else:
+            operation['response'] = {}
+
+    # clusters
+
+    def _new_cluster(self, body):
+        cluster = copy.deepcopy(body)
+        cluster.setdefault('config', {})
+        cluster['config'].setdefault('configBucket', 'fake-bucket')
+        cluster['clusterUuid'] = str(uuid.uuid4())
+        cluster['statusHistory'] = []
+        return cluster
+
+    def _clusters_get(self, projectId, region, clusterName, **params):
+        if clusterName not in self.clusters_by_name:
+            raise self._not_found("Cluster '{}'".format(clusterName))
+        return self.clusters_by_name[clusterName]
+
+    def _clusters_list(self, projectId, region, pageSize=None, pageToken=None, filter=None,
+                       **params):
+        clusters = [c for c in self.clusters_by_name.values() if not filter or self._matches(
+            c, filter, c['clusterName'], ACTIVE_CLUSTER_STATES)]
+        clusters, next_page_token = self._page(clusters, pageSize, pageToken)
+        page = {}
+        if clusters:
+            page['clusters'] = clusters
+        if next_page_token:
+            page['nextPageToken'] = next_page_token
+        return page
+
+    def _clusters_create(self, projectId, region, body, requestId=None, **params):
+        if requestId and requestId in self._request_ids:
+            return self.operations_by_name[self._request_ids[requestId]]
+
+        cluster_name = body['clusterName']
+        if cluster_name in self.clusters_by_name:
+            raise http_error(409, "Cluster '{}' already exists".format(cluster_name))
+
+        cluster = self._new_cluster(body)
+        cluster['status'] = self._status('CREATING')
+        self.clusters_by_name[cluster_name] = cluster
+
+        operation = self._new_operation(cluster_name, 'CREATE')
+        if requestId:
+            self._request_ids[requestId] = operation['name']
+
+        def ready():
+            state = self.cluster_outcome(cluster)
+            self._set_state(cluster, state)
+            if state == 'ERROR':
+                self._finish_operation(operation, error='Cluster failed to start')
+            else:
+                self._finish_operation(operation)
+
+        self._schedule(('cluster', cluster_name), self.cluster_create_time, ready)
+        return operation
+
+    def _clusters_patch(self, projectId, region, clusterName, body, updateMask, requestId=None,
+                        **params):
+        if requestId and requestId in self._request_ids:
+            return self.operations_by_name[self._request_ids[requestId]]
+
+        cluster = self._clusters_get(projectId, region, clusterName)
+        if cluster['status']['state'] != 'RUNNING':
+            raise http_error(400, "Cluster '{}' is not RUNNING".format(clusterName))
+
+        config = body.get('config', {})
+        for mask in updateMask.split(','):
+            group = {
+                'config.worker_config.num_instances': 'workerConfig',
+                'config.secondary_worker_config.num_instances': 'secondaryWorkerConfig'
+            }.get(mask)
+            if group is None:
+                raise http_error(400, "Unsupported update mask '{}'".format(mask))
+            cluster['config'].setdefault(group, {})['numInstances'] = \
+                config[group]['numInstances']
+
+        self._set_state(cluster, 'UPDATING')
+        operation = self._new_operation(clusterName, 'UPDATE')
+        if requestId:
+            self._request_ids[requestId] = operation['name']
+
+        def ready():
+            self._set_state(cluster, 'RUNNING')
+            self._finish_operation(operation)
+
+        self._schedule(('cluster', clusterName), self.cluster_update_time, ready)
+        return operation
+
+    def _clusters_delete(self, projectId, region, clusterName, requestId=None, **params):
+        if requestId and requestId in self._request_ids:
+            return self.operations_by_name[self._request_ids[requestId]]
+
+        cluster = self._clusters_get(projectId, region, clusterName)
+        if cluster['status']['state'] in ('CREATING', 'UPDATING', 'DELETING'):
+            raise http_error(400, "Cluster '{}' is {}".format(
+                clusterName, cluster['status']['state']))
+        self._set_state(cluster, 'DELETING')
+        operation = self._new_operation(clusterName, 'DELETE')
+        if requestId:
+            self._request_ids[requestId] = operation['name']
+
+        def ready():
+            self.clusters_by_name.pop(clusterName, None)
+            self._finish_operation(operation)
+
+        self._schedule(('cluster', clusterName), self.cluster_delete_time, ready)
+        return operation
+
+    # jobs
+
+    def _new_job(self, job):
+        job = copy.deepcopy(job)
+        job_id = job.setdefault('reference', {}).setdefault('jobId', uuid.uuid4().hex)
+        job['reference']['projectId'] = 'fake'
+        job['driverOutputResourceUri'] = \
+            'gs://fake-bucket/google-cloud-dataproc-metainfo/fake/jobs/{}/driveroutput'.format(
+                job_id)
+        job['statusHistory'] = []
+        return job
+
+    def _jobs_get(self, projectId, region, jobId, **params):
+        if jobId not in self.jobs_by_id:
+            raise self._not_found("Job '{}'".format(jobId))
+        return self.jobs_by_id[jobId]
+
+    def _jobs_list(self, projectId, region, pageSize=None, pageToken=None, clusterName=None,
+                   filter=None, **params):
+        # newest first, as the API returns them
+        jobs = [
+            j for j in reversed(list(self.jobs_by_id.values()))
+            if (not clusterName or j['placement']['clusterName'] == clusterName) and
+            (not filter or self._matches(j, filter, j['placement']['clusterName'],
+                                         ACTIVE_JOB_STATES))
+        ]
+        jobs, next_page_token = self._page(jobs, pageSize, pageToken)
+        page = {}
+        if jobs:
+            page['jobs'] = jobs
+        if next_page_token:
+            page['nextPageToken'] = next_page_token
+        return page
+
+    def _jobs_submit(self, projectId, region, body, **params):
+        request_id = body.get('requestId')
+        if request_id and request_id in self._request_ids:
+            return self.jobs_by_id[self._request_ids[request_id]]
+
+        cluster_name = body['job']['placement']['clusterName']
+        if cluster_name not in self.clusters_by_name:
+            raise self._not_found("Cluster '{}'".format(cluster_name))
+
+        job = self._new_job(body['job'])
+        job_id = job['reference']['jobId']
+        if job_id in self.jobs_by_id:
+            raise http_error(409, "Job '{}' already exists".format(job_id))
+
+        job['status'] = self._status('PENDING')
+        self.jobs_by_id[job_id] = job
+        if request_id:
+            self._request_ids[request_id] = job_id
+
+        def running():
+            self._set_state(job, 'RUNNING')
+            self.storage.append(job['driverOutputResourceUri'] + '.000000000',
+                                'Running job {}\n'.format(job_id).encode('utf-8'))
+
+        def finished():
+            self.storage.append(job['driverOutputResourceUri'] + '.000000000',
+                                'Job {} finished\n'.format(job_id).encode('utf-8'))
+            self._set_state(job, self.job_outcome(job))
+
+        self._schedule(('job-start', job_id), self.job_run_time / 2.0, running)
+        self._schedule(('job', job_id), self.job_run_time, finished)
+        return job
+
+    def _jobs_cancel(self, projectId, region, jobId, **params):
+        job = self._jobs_get(projectId, region, jobId)
+        if job['status']['state'] not in ACTIVE_JOB_STATES:
+            raise http_error(400, "Job '{}' is not active (state: {})".format(
+                jobId, job['status']['state']))
+        self._timelines.pop(('job-start', jobId), None)
+        self._timelines.pop(('job', jobId), None)
+        self._set_state(job, 'CANCELLED')
+        return job
+
+    # operations
+
+    def _operations_get(self, name, **params):
+        if name not in self.operations_by_name:
+            raise self._not_found("Operation '{}'".format(name))
+        return self.operations_by_name[name]
+
+    def _operations_list(self, name, pageSize=None, pageToken=None, **params):
+        operations, next_page_token = self._page(
+            list(self.operations_by_name.values()), pageSize, pageToken)
+        page = {}
+        if operations:
+            page['operations'] = operations
+        if next_page_token:
+            page['nextPageToken'] = next_page_token
+        return page
+
+    def _operations_cancel(self, name, **params):
+        operation = self._operations_get(name)
+        metadata = operation['metadata']
+        if operation['done'] or metadata['operationType'] == 'DELETE':
+            raise http_error(400, "Operation '{}' can't be cancelled".format(name))
+
+        self._timelines.pop(('cluster', metadata['clusterName']), None)
+        cluster = self.clusters_by_name.get(metadata['clusterName'])
+        if cluster is not None:
+            # a cancelled update leaves the cluster as it was, a cancelled creation broken
+            cancelled_state = 'ERROR' if metadata['operationType'] == 'CREATE' else 'RUNNING'
+            self._set_state(cluster, cancelled_state)
+        self._finish_operation(operation, error='Operation cancelled', code=1)
+        return {}
+
+
+class FakeDataProc(DataProc):
+    """
+    A DataProc client talking to a FakeDataProcAPI (and its in-memory storage)
+    rather than Google Cloud. Any keyword arguments are passed to DataProc.
+    """
+
+    def __init__(self, api=None, project='fake-project', **kwargs):
+        self.api = api or FakeDataProcAPI()
+        kwargs.setdefault('storage', self.api.storage)
+        super(FakeDataProc, self).__init__(project, **kwargs)
+
+    def _get_client(self):
+        return self.api
+
+    def _build_http(self):
+        # requests never leave the process, so there's nothing to authorize
+        return object()
@@ -0,0 +1,339 @@
+import copy
+import random
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from contextlib import contextmanager
+
+from googleapiclient.errors import HttpError
+
+from pydataproc.logger import log
+from pydataproc.stats import CallEvent
+
+
+class HttpPool(object):
+    """
+    A bounded pool of HTTP transports (e.g. authorized httplib2.Http objects).
+
+    httplib2.Http is not thread-safe, so rather than sharing a single one
+    between threads, each request checks a transport out of the pool for its
+    duration. Transports are reused between requests, so their keep-alive
+    connections are too. If all `size` transports are in use, callers block
+    until one is returned.
+    """
+
+    def __init__(self, factory, size=10):
+
+        assert factory
+        assert size > 0
+
+        self.factory = factory
+        self.size = size
+
+        self._idle = []
+        self._created = 0
+        self._available = threading.Condition(threading.Lock())
+
+    def _checkout(self):
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+
+            if self._idle:
+                return self._idle.pop()
+
+            # reserve the slot before building, so the factory can run outside the lock
+            self._created += 1
+
+        try:
+            return self.factory()
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def _checkin(self, http):
+        with self._available:
+            self._idle.append(http)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks a transport out of the pool for the duration of the with block.
+
+        :return: context manager yielding an HTTP transport
+        """
+        http = self._checkout()
+        try:
+            yield http
+        finally:
+            self._checkin(http)
+
+
+class RetryPolicy(object):
+    """
+    Decides whether (and after how long) to retry a failed request.
+
+    Requests failing with one of `retry_statuses`, or a connection error, are
+    retried up to `max_attempts` attempts in total, backing off exponentially
+    from `initial_backoff` seconds (with full jitter) up to `max_backoff`. If
+    the server sends a Retry-After header, it is honoured.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_attempts=5, initial_backoff=1, max_backoff=32, multiplier=2,
+                 retry_statuses=RETRY_STATUSES, sleep=time.sleep, random=random.random):
+
+        assert max_attempts > 0
+
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.retry_statuses = retry_statuses
+        self.sleep = sleep
+        self.random = random
+
+    def should_retry(self, attempt, status=None):
+        """
+        Returns True if a request should be retried.
+
+        :param attempt: the number of attempts made so far
+        :param status: the HTTP status of the failure, or None for a connection error
+        :return: boolean
+        """
+        if attempt >= self.max_attempts:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Returns how long to wait before the next attempt.
+
+        :param attempt: the number of attempts made so far
+        :param retry_after: the value of the Retry-After header, if any
+        :return: delay in seconds
+        """
+        backoff = min(self.initial_backoff * self.multiplier ** (attempt - 1), self.max_backoff)
+        delay = backoff * self.random()
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                # an HTTP date rather than a number of seconds
+                delay = max(delay, backoff)
+        return delay
+
+
+class TokenBucket(object):
+    """
+    Client-side rate limiter, allowing on average `rate` requests per second,
+    with bursts of up to `burst` requests.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+
+        assert rate > 0
+
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.clock = clock
+        self.sleep = sleep
+
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, blocking until one is available.
+
+        :return: None
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # reserve a token, even if that leaves us in debt
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait > 0:
+            self.sleep(wait)
+
+
+# rate limiters, shared by all clients for the same project
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def rate_limiter_for(project, rate, burst=None):
+    """
+    Returns the rate limiter for a project and limit, creating it if needed, so
+    that all clients for the project with the same rate and burst size share
+    the same quota. Clients given a different limit get a limiter of their own.
+
+    :param project: the GCP project ID
+    :param rate: requests per second
+    :param burst: maximum burst size
+    :return: TokenBucket
+    """
+    key = (project, rate, burst or max(1, rate))
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = TokenBucket(rate, burst)
+        return _rate_limiters[key]
+
+
+class LatencyTracker(object):
+    """
+    Tracks the latencies of the most recent `window` requests.
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, p):
+        """
+        Returns the p-th percentile of recent latencies, or None if there
+        aren't yet enough samples.
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100.0))]
+
+
+class RequestExecutor(object):
+    """
+    Executes API requests over pooled connections, applying the client-side
+    rate limit and retrying idempotent requests that fail transiently (e.g.
+    with a 429 or 503).
+
+    If `hedge` is set, a GET that takes longer than the p95 of recent GET
+    latencies is sent again on another connection, and whichever response
+    arrives first is used.
+
+    If `stats` is set, each call (including any retries) is recorded there.
+    """
+
+    def __init__(self, http_pool, retry_policy=None, rate_limiter=None, hedge=False, stats=None):
+
+        assert http_pool
+
+        self.http_pool = http_pool
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.hedge = hedge
+        self.stats = stats
+        self.latencies = LatencyTracker()
+
+        self._hedge_executor = None
+        if hedge:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=2 * http_pool.size)
+
+    def close(self):
+        """
+        Shuts down the threads used to send hedged requests, if any.
+
+        :return: None
+        """
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+
+    def execute(self, request, idempotent=None):
+        """
+        Executes a request, retrying if it is idempotent and fails transiently.
+
+        :param request: the request to execute
+        :param idempotent: whether the request is safe to retry. Defaults to
+        True for GETs, False otherwise.
+        :return: the response
+        """
+        # deferred, as it's slow to import
+        import httplib2
+
+        is_get = getattr(request, 'method', None) == 'GET'
+        if idempotent is None:
+            idempotent = is_get
+
+        start = time.time()
+        attempt = 0
+        status = None
+        try:
+            while True:
+                attempt += 1
+                try:
+                    if self.hedge and is_get:
+                        response = self._execute_hedged(request)
+                    else:
+                        response = self._execute_once(request)
+                    status = 200
+                    return response
+                except HttpError as e:
+                    status = int(e.resp['status'])
+                    if not idempotent or not self.retry_policy.should_retry(attempt, status):
+                        raise e
+                    delay = self.retry_policy.delay(attempt, e.resp.get('retry-after'))
+                    log.debug("Request failed with HTTP {}, retrying in {:.1f}s...".format(
+                        status, delay))
+                except (socket.error, httplib2.HttpLib2Error) as e:
+                    status = None
+                    if not idempotent or not self.retry_policy.should_retry(attempt):
+                        raise e
+                    delay = self.retry_policy.delay(attempt)
+                    log.debug("Request failed ({}), retrying in {:.1f}s...".format(e, delay))
+
+                self.retry_policy.sleep(delay)
+        finally:
+            if self.stats is not None:
+                operation = getattr(request, 'methodId', None) or 'batch'
+                self.stats.record(CallEvent(operation, time.time() - start, status, attempt - 1))
+
+    def _execute_once(self, request):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        start = time.time()
+        with self.http_pool.connection() as http:
+            response = request.execute(http=http)
+
+        if getattr(request, 'method', None) == 'GET':
+            self.latencies.record(time.time() - start)
+        return response
+
+    def _execute_hedged(self, request):
+        threshold = self.latencies.percentile(95)
+        if threshold is None:
+            return self._execute_once(request)
+
+        primary = self._hedge_executor.submit(self._execute_once, request)
+        try:
+            return primary.result(timeout=threshold)
+        except FutureTimeoutError:
+            pass
+
+        log.debug("Request slower than {:.2f}s, sending hedged request...".format(threshold))
+        hedged = copy.copy(request)
+        hedged.headers = dict(request.headers)
+        backup = self._hedge_executor.submit(self._execute_once, hedged)
+
+        error = None
+        for future in as_completed([primary, backup]):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        raise error
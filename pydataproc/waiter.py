@@ -0,0 +1,123 @@
+import random
+import time
+
+from pydataproc.errors import WaitTimeoutException
+
+
+class Waiter(object):
+    """
+    Repeatedly polls for some condition (e.g. a cluster becoming RUNNING),
+    backing off exponentially between polls.
+
+    The interval between polls starts at `initial_interval` seconds and is
+    multiplied by `backoff` after each poll, up to `max_interval`. Each interval
+    is randomly adjusted by up to +/- `jitter` (as a fraction of the interval),
+    so that many waiters started together don't poll in lockstep.
+
+    If `timeout` (seconds) is set and the condition isn't met in time, a
+    WaitTimeoutException is raised. If `on_progress` is set, it is called with
+    the polled value and the seconds elapsed after every poll.
+
+    The clock, sleep and random functions can be swapped out, e.g. to test
+    without any real sleeping.
+    """
+
+    def __init__(self, initial_interval=2, max_interval=30, backoff=1.5, jitter=0.1,
+                 timeout=None, on_progress=None, clock=time.time, sleep=time.sleep,
+                 random=random.random):
+
+        assert initial_interval > 0
+        assert max_interval >= initial_interval
+        assert backoff >= 1
+        assert 0 <= jitter < 1
+
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.clock = clock
+        self.sleep = sleep
+        self.random = random
+
+    def delays(self):
+        """
+        Yields the (jittered) interval to wait before each successive poll.
+
+        :return: generator of intervals, in seconds
+        """
+        interval = self.initial_interval
+        while True:
+            yield interval * (1 + self.jitter * (2 * self.random() - 1))
+            interval = min(interval * self.backoff, self.max_interval)
+
+    def deadline(self, start):
+        """
+        Returns the time by which waiting must finish, given the time it started.
+
+        :param start: the time waiting started, according to self.clock
+        :return: the deadline, or None if there's no timeout
+        """
+        if self.timeout is None:
+            return None
+        return start + self.timeout
+
+    def intervals(self, start, description='condition'):
+        """
+        Yields how long to sleep before each poll after the first, raising a
+        WaitTimeoutException once the timeout passes. ticks() sleeps for these
+        with self.sleep; callers that have to sleep some other way (e.g. on an
+        asyncio event loop) can use them directly.
+
+        :param start: the time waiting started, according to self.clock
+        :param description: what's being waited for, used in error messages
+        :return: generator of intervals, in seconds
+        """
+        deadline = self.deadline(start)
+        delays = self.delays()
+
+        while True:
+            now = self.clock()
+            if deadline is not None and now >= deadline:
+                raise WaitTimeoutException("Timed out after {:.0f}s waiting for {}".format(
+                    now - start, description))
+
+            delay = next(delays)
+            if deadline is not None:
+                delay = min(delay, deadline - now)
+            yield max(delay, 0)
+
+    def ticks(self, description='condition'):
+        """
+        Yields once per poll, sleeping between polls, for callers that need to
+        do more on each poll than Waiter.wait allows (e.g. yielding output as
+        they go). Stop iterating once finished; if the timeout passes first, a
+        WaitTimeoutException is raised.
+
+        :param description: what's being waited for, used in error messages
+        :return: generator of seconds elapsed since waiting started
+        """
+        start = self.clock()
+        intervals = self.intervals(start, description)
+
+        while True:
+            yield self.clock() - start
+            self.sleep(next(intervals))
+
+    def wait(self, poll, is_done, description='condition'):
+        """
+        Calls poll() until is_done(result) is True, sleeping between polls.
+
+        :param poll: function returning the current value (e.g. a cluster state)
+        :param is_done: function returning True if the value means waiting has finished
+        :param description: what's being waited for, used in log/error messages
+        :return: the final polled value
+        """
+        for elapsed in self.ticks(description):
+            value = poll()
+            if self.on_progress:
+                self.on_progress(value, elapsed)
+
+            if is_done(value):
+                return value
@@ -0,0 +1,116 @@
+from collections import namedtuple
+
+from pydataproc.waiter import Waiter
+
+ADDED = 'ADDED'
+CHANGED = 'CHANGED'
+REMOVED = 'REMOVED'
+
+# a change to a watched cluster or job. old_state is None for ADDED events, and
+# new_state is None for REMOVED events where the cluster/job no longer exists
+ChangeEvent = namedtuple('ChangeEvent', ['type', 'name', 'old_state', 'new_state',
+                                         'state_start_time'])
+
+
+class Watch(object):
+    """
+    An incremental change feed for a set of clusters or jobs (see Clusters.watch
+    and Jobs.watch).
+
+    A snapshot of the state (and state start time) of each cluster/job is kept,
+    and each poll lists just those fields, yielding only what has changed since
+    the last poll: clusters/jobs that have appeared (ADDED), changed state
+    (CHANGED) or are no longer listed (REMOVED). Those no longer listed are
+    fetched (in one batched call) to find their final state: if it changed, a
+    CHANGED event is yielded (e.g. a job going from RUNNING to DONE, when only
+    running jobs are watched), otherwise a REMOVED one. Either way, they are no
+    longer tracked.
+
+    The snapshot can be saved with checkpoint() and passed back in to resume
+    watching later, yielding only what has changed since. Without a checkpoint,
+    the first poll yields an ADDED event for everything currently listed.
+
+    :param dataproc: the DataProc client, whose metadata cache is invalidated
+    for anything that changes
+    :param kind: 'cluster' or 'job'
+    :param key: identifies what's being watched (e.g. the list filter), so a
+    checkpoint can't be resumed against a different watch
+    :param list_states: function returning dict of name -> (state, state start time)
+    :param fetch_states: function taking names, returning dict of name ->
+    (state, state start time), omitting any that no longer exist
+    """
+
+    def __init__(self, dataproc, kind, key, list_states, fetch_states, checkpoint=None,
+                 waiter=None):
+
+        assert dataproc
+        assert kind in ('cluster', 'job')
+
+        self.dataproc = dataproc
+        self.kind = kind
+        self.key = list(key)
+        self.waiter = waiter
+        self._list_states = list_states
+        self._fetch_states = fetch_states
+        self._snapshot = {}
+
+        if checkpoint is not None:
+            assert checkpoint.get('kind') == kind and checkpoint.get('key') == self.key, \
+                "Checkpoint is for a different watch: {}".format(checkpoint.get('key'))
+            self._snapshot = {name: tuple(value) for name, value in checkpoint['states'].items()}
+
+    def checkpoint(self):
+        """
+        Returns the current snapshot, as a JSON-serialisable dict, to resume
+        watching from later.
+
+        :return: dict
+        """
+        return {
+            'kind': self.kind,
+            'key': list(self.key),
+            'states': {name: list(value) for name, value in self._snapshot.items()}
+        }
+
+    def poll(self):
+        """
+        Lists the watched clusters/jobs once, updating the snapshot.
+
+        :return: list of ChangeEvents since the last poll, ordered by name
+        """
+        current = self._list_states()
+        gone = [name for name in self._snapshot if name not in current]
+        final = self._fetch_states(gone) if gone else {}
+
+        events = []
+        for name in sorted(set(current) | set(gone)):
+            old = self._snapshot.get(name)
+            new = current.get(name, final.get(name))
+
+            if old is None:
+                events.append(ChangeEvent(ADDED, name, None, new[0], new[1]))
+            elif new is None:
+                events.append(ChangeEvent(REMOVED, name, old[0], None, old[1]))
+            elif name not in current:
+                event_type = CHANGED if new != old else REMOVED
+                events.append(ChangeEvent(event_type, name, old[0], new[0], new[1]))
+            elif new != old:
+                events.append(ChangeEvent(CHANGED, name, old[0], new[0], new[1]))
+            else:
+                continue
+            self.dataproc.cache.invalidate((self.kind, name))
+
+        self._snapshot = current
+        return events
+
+    def __iter__(self):
+        """
+        Polls indefinitely (with the given Waiter, which backs off between
+        polls), yielding each change as it is seen. If the Waiter has a
+        timeout, a WaitTimeoutException is raised once it passes.
+
+        :return: generator of ChangeEvents
+        """
+        for _ in (self.waiter or Waiter()).ticks("changes to {}s".format(self.kind)):
+            for event in self.poll():
+                yield event
@@ -2,9 +2,11 @@ from setuptools import setup
 
 install_requires = [
     'google-api-python-client==1.6.3',
+    'futures; python_version < "3"',
 ]
 
 test_requires = [
+    'pytest',
 ]
 
 setup(
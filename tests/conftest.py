@@ -0,0 +1,33 @@
+import sys
+
+import pytest
+
+from pydataproc.testing import FakeDataProc, FakeDataProcAPI
+from pydataproc.transport import RetryPolicy
+from pydataproc.waiter import Waiter
+
+# the asyncio front end is Python 3.7+ only
+collect_ignore = ['test_aio.py'] if sys.version_info < (3, 7) else []
+
+
+@pytest.fixture
+def api():
+    # lifecycles scaled down further than the fake's defaults, to keep tests fast
+    return FakeDataProcAPI(cluster_create_time=0.02, cluster_update_time=0.02,
+                           cluster_delete_time=0.02, job_run_time=0.02)
+
+
+@pytest.fixture
+def retry_policy():
+    return RetryPolicy(max_attempts=3, sleep=lambda seconds: None)
+
+
+@pytest.fixture
+def dataproc(api, retry_policy):
+    with FakeDataProc(api, retry_policy=retry_policy) as dataproc:
+        yield dataproc
+
+
+@pytest.fixture
+def waiter():
+    return Waiter(initial_interval=0.005, max_interval=0.01, timeout=5)
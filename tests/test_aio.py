@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from pydataproc.aio import AsyncDataProc
+from pydataproc.errors import NoSuchJobException
+from pydataproc.testing import FakeDataProc
+from pydataproc.waiter import Waiter
+
+
+class FakeAsyncDataProc(AsyncDataProc):
+
+    def __init__(self, api, **kwargs):
+        self.api = api
+        super(FakeAsyncDataProc, self).__init__('fake-project', **kwargs)
+
+    def _build_dataproc(self, **kwargs):
+        return FakeDataProc(self.api, region=self.region, zone=self.zone, **kwargs)
+
+
+def no_thread_waiter():
+    """A Waiter that fails if it is used to sleep on a thread, rather than the event loop."""
+    def sleep(seconds):
+        raise AssertionError("Slept on a worker thread")
+    return Waiter(initial_interval=0.005, max_interval=0.01, timeout=5, sleep=sleep)
+
+
+def run(api, retry_policy, coroutine, **kwargs):
+    async def main():
+        async with FakeAsyncDataProc(api, retry_policy=retry_policy, **kwargs) as dataproc:
+            return await coroutine(dataproc)
+    return asyncio.run(main())
+
+
+def test_clusters_are_created_concurrently(api, retry_policy):
+    async def create(dataproc):
+        clusters = await asyncio.gather(*[
+            dataproc.clusters().create('cluster-{}'.format(i), waiter=no_thread_waiter())
+            for i in range(5)
+        ])
+        return [await cluster.status(refresh=True) for cluster in clusters]
+
+    assert run(api, retry_policy, create, max_concurrency=2) == ['RUNNING'] * 5
+
+
+def test_busy_clusters_are_deleted_once_settled(api, retry_policy):
+    async def create_and_delete(dataproc):
+        cluster = await dataproc.clusters().create('my-cluster', block=False)
+        # still CREATING, so the deletion waits for it on the event loop
+        operation = await cluster.delete(block=True, waiter=no_thread_waiter())
+        return operation.done(refresh=False)
+
+    assert run(api, retry_policy, create_and_delete, max_concurrency=1)
+    assert 'my-cluster' not in api.clusters_by_name
+
+
+def test_jobs_are_waited_for(api, retry_policy):
+    api.add_cluster('my-cluster')
+
+    async def submit_and_wait(dataproc):
+        job = await dataproc.clusters('my-cluster').submit_job('gs://bucket/job.py')
+        return await job.wait(waiter=no_thread_waiter())
+
+    assert run(api, retry_policy, submit_and_wait) == 'DONE'
+
+
+def test_errors_are_raised_from_awaits(api, retry_policy):
+    async def status(dataproc):
+        return await dataproc.jobs('missing').status()
+
+    with pytest.raises(NoSuchJobException):
+        run(api, retry_policy, status)
@@ -0,0 +1,107 @@
+import pytest
+
+from pydataproc.autoscaler import Autoscaler, ScalingEvent
+
+PATCH_CLUSTER = 'dataproc.projects.regions.clusters.patch'
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def autoscaler(api, dataproc, waiter, clock):
+    api.add_cluster('my-cluster', workerConfig={'numInstances': 2})
+    return Autoscaler(dataproc, 'my-cluster', min_workers=2, max_workers=4,
+                      max_secondary_workers=2, scale_up_cooldown=60, scale_down_cooldown=300,
+                      hysteresis=0.25, waiter=waiter, clock=clock)
+
+
+def run_jobs(api, count):
+    api.jobs_by_id.clear()
+    for i in range(count):
+        api.add_job('job-{}'.format(i), cluster_name='my-cluster', state='RUNNING')
+
+
+def worker_counts(api):
+    config = api.clusters_by_name['my-cluster']['config']
+    return (config['workerConfig']['numInstances'],
+            config.get('secondaryWorkerConfig', {}).get('numInstances', 0))
+
+
+def test_target_fills_primary_workers_first(autoscaler):
+    assert autoscaler.target(0) == (2, 0)
+    assert autoscaler.target(3) == (3, 0)
+    assert autoscaler.target(5) == (4, 1)
+    assert autoscaler.target(100) == (4, 2)
+
+
+def test_scales_up_with_load(api, autoscaler):
+    run_jobs(api, 5)
+
+    assert autoscaler.step() == ScalingEvent('my-cluster', 5, (2, 0), (4, 1))
+    assert worker_counts(api) == (4, 1)
+    assert api.clusters_by_name['my-cluster']['status']['state'] == 'RUNNING'
+
+
+def test_clusters_at_their_target_are_left_alone(api, autoscaler):
+    run_jobs(api, 1)
+
+    assert autoscaler.step() is None
+    assert PATCH_CLUSTER not in api.calls
+
+
+def test_clusters_that_are_not_running_are_left_alone(api, autoscaler):
+    api.clusters_by_name['my-cluster']['status']['state'] = 'UPDATING'
+    run_jobs(api, 5)
+
+    assert autoscaler.step() is None
+    assert PATCH_CLUSTER not in api.calls
+
+
+def test_scaling_down_waits_for_the_cooldown(api, autoscaler, clock):
+    run_jobs(api, 6)
+    autoscaler.step()
+    run_jobs(api, 0)
+
+    clock.now += 299
+    assert autoscaler.step() is None
+
+    clock.now += 1
+    assert autoscaler.step().target == (2, 0)
+    assert worker_counts(api) == (2, 0)
+
+
+def test_scaling_up_waits_for_the_cooldown(api, autoscaler, clock):
+    run_jobs(api, 3)
+    autoscaler.step()
+    run_jobs(api, 6)
+
+    assert autoscaler.step() is None
+
+    clock.now += 60
+    assert autoscaler.step().target == (4, 2)
+
+
+def test_small_decreases_are_ignored(api, autoscaler, clock):
+    run_jobs(api, 4)
+    autoscaler.step()
+    clock.now += 300
+
+    # within the 25% hysteresis of the current size
+    run_jobs(api, 3)
+    assert autoscaler.step() is None
+    assert worker_counts(api) == (4, 0)
+
+    run_jobs(api, 2)
+    assert autoscaler.step().target == (2, 0)
@@ -0,0 +1,76 @@
+from pydataproc.batch import execute_batched
+from pydataproc.errors import ClusterHasGoneAwayException, NoSuchJobException
+
+
+def get_job(api, job_id):
+    return api.jobs().get(projectId='fake', region='global', jobId=job_id)
+
+
+def test_requests_are_batched(api, dataproc):
+    for i in range(250):
+        api.add_job('job-{}'.format(i))
+
+    results = execute_batched(dataproc, {i: get_job(api, 'job-{}'.format(i)) for i in range(250)})
+
+    assert all(error is None for _, error in results.values())
+    assert results[42][0]['reference']['jobId'] == 'job-42'
+    # at most 100 requests per batch
+    assert api.calls['batch'] == 3
+
+
+def test_errors_are_collected_per_request(api, dataproc):
+    api.add_job('job-1')
+
+    results = execute_batched(dataproc, {
+        job_id: get_job(api, job_id) for job_id in ('job-1', 'missing')
+    })
+
+    assert results['job-1'][1] is None
+    assert results['missing'][0] is None
+    assert results['missing'][1].resp['status'] == '404'
+
+
+def test_statuses(api, dataproc):
+    api.add_job('job-1', state='RUNNING')
+    api.add_cluster('my-cluster', state='CREATING')
+
+    jobs = dataproc.jobs().statuses(['job-1', 'missing'])
+    clusters = dataproc.clusters().statuses(['my-cluster', 'missing'])
+
+    assert jobs['job-1'] == 'RUNNING'
+    assert isinstance(jobs['missing'], NoSuchJobException)
+    assert clusters['my-cluster'] == 'CREATING'
+    assert isinstance(clusters['missing'], ClusterHasGoneAwayException)
+    assert api.calls['batch'] == 2
+
+
+def test_infos_are_cached(api, dataproc):
+    api.add_job('job-1')
+
+    infos = dataproc.jobs().infos(['job-1'])
+
+    assert infos['job-1']['reference']['jobId'] == 'job-1'
+    calls = api.total_calls
+    assert dataproc.jobs('job-1', lazy=True).status() == 'DONE'
+    assert api.total_calls == calls
+
+
+def test_statuses_invalidates_stale_entries(api, dataproc):
+    api.add_job('job-1', state='RUNNING')
+    job = dataproc.jobs('job-1')
+    assert job.status() == 'RUNNING'
+
+    api.jobs_by_id['job-1']['status']['state'] = 'DONE'
+    assert dataproc.jobs().statuses(['job-1']) == {'job-1': 'DONE'}
+    assert dataproc.cache.get(('job', 'job-1')) is None
+    assert job.status() == 'DONE'
+
+
+def test_statuses_invalidates_stale_cluster_entries(api, dataproc):
+    api.add_cluster('my-cluster', state='CREATING')
+    cluster = dataproc.clusters('my-cluster')
+
+    api.clusters_by_name['my-cluster']['status']['state'] = 'RUNNING'
+    dataproc.clusters().statuses(['my-cluster'])
+
+    assert cluster.status() == 'RUNNING'
@@ -0,0 +1,76 @@
+from pydataproc.cache import MetadataCache
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_stored_value():
+    cache = MetadataCache()
+    cache.put(('cluster', 'a'), 'RUNNING')
+
+    assert cache.get(('cluster', 'a')) == 'RUNNING'
+    assert cache.get(('cluster', 'b')) is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1}
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = MetadataCache(ttl=5, clock=clock)
+    cache.put(('job', 'a'), 'RUNNING')
+
+    clock.now = 4.9
+    assert cache.get(('job', 'a')) == 'RUNNING'
+    clock.now = 5
+    assert cache.get(('job', 'a')) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MetadataCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_zero_ttl_disables_caching():
+    cache = MetadataCache(ttl=0)
+    cache.put('a', 1)
+
+    assert not cache.enabled
+    assert cache.get('a') is None
+
+
+def test_invalidate_and_clear():
+    cache = MetadataCache()
+    cache.put('a', 1)
+    cache.put('b', 2)
+
+    cache.invalidate('a')
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_status_is_served_from_cache(api, dataproc):
+    api.add_cluster('my-cluster')
+    cluster = dataproc.clusters('my-cluster')
+
+    calls = api.total_calls
+    assert cluster.status() == 'RUNNING'
+    assert cluster.status() == 'RUNNING'
+    assert api.total_calls == calls
+
@@ -0,0 +1,41 @@
+from pydataproc.errors import ClusterAlreadyExistsException, OperationFailedException
+
+GET_OPERATION = 'dataproc.projects.regions.operations.get'
+
+
+def test_create_many_waits_for_all(api, dataproc, waiter):
+    api.add_cluster('existing')
+    api.cluster_outcome = lambda cluster: 'ERROR' if cluster['clusterName'] == 'bad' else 'RUNNING'
+
+    results = dataproc.clusters().create_many(
+        [{'cluster_name': name} for name in ('good', 'bad', 'existing')], waiter=waiter)
+
+    assert results['good'].status(refresh=True) == 'RUNNING'
+    assert isinstance(results['bad'], OperationFailedException)
+    assert isinstance(results['existing'], ClusterAlreadyExistsException)
+
+
+def test_transient_poll_errors_dont_fail_operations(api, dataproc, waiter, retry_policy):
+    results = dataproc.clusters().create_many([{'cluster_name': 'a'}, {'cluster_name': 'b'}],
+                                              block=False)
+    # more failures than the batch's own retries cover
+    api.inject_error(503, GET_OPERATION, count=2 * retry_policy.max_attempts)
+
+    dataproc.clusters()._wait_for_all(results, {
+        name: cluster.operation for name, cluster in results.items()
+    }, waiter)
+
+    assert [cluster.status(refresh=True) for cluster in results.values()] == \
+        ['RUNNING', 'RUNNING']
+
+
+def test_delete_many(api, dataproc, waiter):
+    api.add_cluster('a', labels={'env': 'test'})
+    api.add_cluster('b', labels={'env': 'prod'})
+
+    results = dataproc.clusters().delete_many(
+        predicate=lambda info: info['labels']['env'] == 'test', waiter=waiter)
+
+    assert list(results) == ['a']
+    assert results['a'].done(refresh=False)
+    assert list(dataproc.clusters().list()) == ['b']
@@ -0,0 +1,80 @@
+import os
+import time
+
+import pytest
+
+from pydataproc import discovery_cache
+
+DOCUMENT = u'{"name": "dataproc", "version": "v1"}'
+
+
+@pytest.fixture
+def cache_dir(tmpdir, monkeypatch):
+    monkeypatch.setenv('PYDATAPROC_CACHE_DIR', str(tmpdir))
+    return tmpdir
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    fetches = []
+
+    def fetch(api, version):
+        fetches.append((api, version))
+        return DOCUMENT
+
+    monkeypatch.setattr(discovery_cache, '_fetch', fetch)
+    return fetches
+
+
+def fail_fetch(api, version):
+    raise Exception('offline')
+
+
+def test_cache_dir_is_configurable(cache_dir):
+    assert discovery_cache.cache_dir() == str(cache_dir)
+
+
+def test_documents_are_fetched_once_then_cached(cache_dir, fetches):
+    assert discovery_cache.load_document('dataproc', 'v1') == DOCUMENT
+    assert discovery_cache.load_document('dataproc', 'v1') == DOCUMENT
+
+    assert fetches == [('dataproc', 'v1')]
+    # written atomically, leaving no temporary files behind
+    assert os.listdir(str(cache_dir)) == ['dataproc.v1.json']
+
+
+def test_stale_documents_are_refreshed(cache_dir, fetches):
+    cache_dir.join('dataproc.v1.json').write('old')
+    old = time.time() - discovery_cache.MAX_AGE - 60
+    os.utime(str(cache_dir.join('dataproc.v1.json')), (old, old))
+
+    assert discovery_cache.load_document('dataproc', 'v1') == DOCUMENT
+    assert cache_dir.join('dataproc.v1.json').read() == DOCUMENT
+    assert len(fetches) == 1
+
+
+def test_stale_documents_are_used_if_fetching_fails(cache_dir, monkeypatch):
+    cache_dir.join('dataproc.v1.json').write('old')
+    old = time.time() - discovery_cache.MAX_AGE - 60
+    os.utime(str(cache_dir.join('dataproc.v1.json')), (old, old))
+    monkeypatch.setattr(discovery_cache, '_fetch', fail_fetch)
+
+    assert discovery_cache.load_document('dataproc', 'v1') == 'old'
+
+
+def test_fetch_errors_are_raised_without_a_cached_document(cache_dir, monkeypatch):
+    monkeypatch.setattr(discovery_cache, '_fetch', fail_fetch)
+
+    with pytest.raises(Exception, match='offline'):
+        discovery_cache.load_document('dataproc', 'v1')
+
+
+def test_failed_writes_clean_up_temporary_files(cache_dir, fetches, monkeypatch):
+    def fail_replace(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(discovery_cache, '_replace', fail_replace)
+
+    # the document is still returned, just not cached
+    assert discovery_cache.load_document('dataproc', 'v1') == DOCUMENT
+    assert os.listdir(str(cache_dir)) == []
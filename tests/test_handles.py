@@ -0,0 +1,73 @@
+import pytest
+
+from pydataproc.errors import ClusterHasGoneAwayException, NoSuchClusterException, \
+    NoSuchJobException
+from pydataproc.testing import FakeDataProc
+
+GET_CLUSTER = 'dataproc.projects.regions.clusters.get'
+GET_JOB = 'dataproc.projects.regions.jobs.get'
+
+
+def test_handles_check_existence_on_construction(api, dataproc):
+    api.add_cluster('my-cluster')
+
+    dataproc.clusters('my-cluster')
+    assert api.calls[GET_CLUSTER] == 1
+    with pytest.raises(NoSuchClusterException):
+        dataproc.clusters('missing')
+    with pytest.raises(NoSuchJobException):
+        dataproc.jobs('missing')
+
+
+def test_lazy_handles_make_no_calls_until_used(api, dataproc):
+    api.add_cluster('my-cluster')
+    api.add_job('job-1')
+
+    cluster = dataproc.clusters('my-cluster', lazy=True)
+    job = dataproc.jobs('job-1', lazy=True)
+    assert api.total_calls == 0
+
+    assert cluster.status() == 'RUNNING'
+    assert job.status() == 'DONE'
+    assert api.total_calls == 2
+
+
+def test_lazy_is_a_client_wide_default(api, retry_policy):
+    with FakeDataProc(api, lazy=True, retry_policy=retry_policy) as dataproc:
+        cluster = dataproc.clusters('missing')
+        assert api.total_calls == 0
+
+        with pytest.raises(NoSuchClusterException):
+            cluster.status()
+
+
+def test_lazy_handles_raise_on_first_use(dataproc):
+    with pytest.raises(NoSuchClusterException):
+        dataproc.clusters('missing', lazy=True).info()
+    with pytest.raises(NoSuchJobException):
+        dataproc.jobs('missing', lazy=True).status(refresh=True)
+
+    assert not dataproc.clusters('missing', lazy=True).exists()
+    assert not dataproc.jobs('missing', lazy=True).exists()
+
+
+def test_clusters_seen_and_then_deleted_have_gone_away(api, dataproc):
+    api.add_cluster('my-cluster')
+    cluster = dataproc.clusters('my-cluster')
+
+    del api.clusters_by_name['my-cluster']
+
+    with pytest.raises(ClusterHasGoneAwayException):
+        cluster.info(refresh=True)
+
+
+def test_clusters_seen_through_the_cache_have_gone_away(api, dataproc):
+    api.add_cluster('my-cluster')
+    dataproc.clusters().list(minimal=False)
+    # the existence check is answered from the cache primed by the listing
+    cluster = dataproc.clusters('my-cluster')
+
+    del api.clusters_by_name['my-cluster']
+
+    with pytest.raises(ClusterHasGoneAwayException):
+        cluster.info(refresh=True)
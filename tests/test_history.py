@@ -0,0 +1,143 @@
+import pytest
+from googleapiclient.errors import HttpError
+
+from pydataproc.history import JobHistory
+from pydataproc.testing import FakeDataProc
+
+LIST_JOBS = 'dataproc.projects.regions.jobs.list'
+
+
+@pytest.fixture
+def history():
+    history = JobHistory()
+    yield history
+    history.close()
+
+
+def add_jobs(api, count, state='DONE', start=0):
+    for i in range(start, start + count):
+        api.add_job('job-{}'.format(i), cluster_name='cluster-{}'.format(i % 2), state=state,
+                    labels={'name': 'report' if i % 2 else 'etl'})
+
+
+def interrupt_after_first_page(api, dataproc, retry_policy):
+    """Makes every list call after the first fail, as if the sync was interrupted."""
+    def hook(event):
+        if event.operation == LIST_JOBS and not hook.fired:
+            hook.fired = True
+            api.inject_error(500, LIST_JOBS, count=retry_policy.max_attempts)
+    hook.fired = False
+    dataproc.add_stats_hook(hook)
+
+
+def test_first_sync_stores_every_job(api, dataproc, history):
+    add_jobs(api, 25)
+
+    assert history.sync(dataproc, page_size=10) == 25
+    assert len(history.query()) == 25
+    assert history.age() is not None
+
+
+def test_query_filters(api, dataproc, history):
+    add_jobs(api, 10)
+    api.add_job('failed', cluster_name='cluster-0', state='ERROR')
+    history.sync(dataproc)
+
+    assert len(history.query(cluster_name='cluster-0')) == 6
+    assert [j.job_id for j in history.query(state='ERROR')] == ['failed']
+    assert len(history.query(labels={'name': 'report'})) == 5
+    assert len(history.query(limit=3)) == 3
+
+
+def test_later_syncs_only_write_changes(api, dataproc, history):
+    add_jobs(api, 10)
+    api.add_job('running', state='RUNNING')
+    history.sync(dataproc)
+
+    api.jobs_by_id['running']['status'] = {'state': 'DONE', 'stateStartTime': 'later'}
+    api.add_job('new', state='DONE')
+
+    assert history.sync(dataproc) == 2
+    assert history.query(state='RUNNING') == []
+
+
+def test_incremental_sync_stops_once_nothing_has_changed(api, dataproc, history):
+    add_jobs(api, 200)
+    history.sync(dataproc, page_size=10)
+    add_jobs(api, 5, start=200)
+
+    calls = api.calls[LIST_JOBS]
+    assert history.sync(dataproc, page_size=10) == 5
+    # the active jobs, the page with the new jobs, and one with nothing new
+    assert api.calls[LIST_JOBS] - calls <= 3
+
+    assert history.sync(dataproc, page_size=10, full=True) == 0
+    assert len(history.query()) == 205
+
+
+def test_incremental_sync_looks_past_pages_of_active_jobs(api, dataproc, history):
+    add_jobs(api, 30)
+    history.sync(dataproc, page_size=10)
+    add_jobs(api, 5, start=30)
+    # a page's worth of newer active jobs, already written before the crawl
+    add_jobs(api, 10, state='RUNNING', start=35)
+
+    assert history.sync(dataproc, page_size=10) == 15
+    assert len(history.query()) == 45
+
+
+def test_interrupted_sync_resumes(api, dataproc, history, retry_policy):
+    add_jobs(api, 30)
+    interrupt_after_first_page(api, dataproc, retry_policy)
+
+    with pytest.raises(HttpError):
+        history.sync(dataproc, page_size=10)
+    assert len(history.query()) == 10
+    assert history.last_synced() is None
+
+    assert history.sync(dataproc, page_size=10) == 20
+    assert history.last_synced() is not None
+
+
+def test_sync_restarts_if_page_token_has_expired(api, dataproc, history, retry_policy):
+    add_jobs(api, 30)
+    interrupt_after_first_page(api, dataproc, retry_policy)
+    with pytest.raises(HttpError):
+        history.sync(dataproc, page_size=10)
+
+    api.inject_error(400, LIST_JOBS)
+
+    assert history.sync(dataproc, page_size=10) == 20
+    assert len(history.query()) == 30
+
+
+def test_runtime_percentile(api, dataproc, history, waiter):
+    api.add_cluster('my-cluster')
+    cluster = dataproc.clusters('my-cluster')
+    for i in range(4):
+        cluster.submit_job('gs://bucket/job.py').wait(stream_logs=False, waiter=waiter)
+    history.sync(dataproc)
+
+    runtimes = history.runtimes(state='DONE')
+    assert len(runtimes) == 4
+    assert all(runtime > 0 for runtime in runtimes)
+    assert history.runtime_percentile(100, state='DONE') == runtimes[-1]
+    assert history.runtime_percentile(50, state='ERROR') is None
+
+
+def test_jobs_query_syncs_stale_history(api, retry_policy):
+    add_jobs(api, 3)
+    with FakeDataProc(api, retry_policy=retry_policy, history=JobHistory()) as dataproc:
+        assert len(dataproc.jobs().query(max_age=60)) == 3
+
+        add_jobs(api, 1, start=3)
+        assert len(dataproc.jobs().query(max_age=60)) == 3
+        assert len(dataproc.jobs().query(max_age=0)) == 4
+
+
+def test_clients_for_other_regions_dont_share_history(api, history):
+    with FakeDataProc(api, history=history) as dataproc:
+        other = dataproc.for_region('us-central1')
+
+        assert dataproc.history is history
+        assert other.history is None
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from pydataproc.transport import HttpPool
+
+
+class Transport(object):
+    pass
+
+
+def test_transports_are_reused():
+    pool = HttpPool(Transport, size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+
+
+def test_concurrent_requests_never_share_a_transport():
+    pool = HttpPool(Transport, size=4)
+    in_use = set()
+    lock = threading.Lock()
+    errors = []
+    used = []
+
+    def request():
+        for _ in range(50):
+            with pool.connection() as http:
+                with lock:
+                    if http in in_use:
+                        errors.append(http)
+                    in_use.add(http)
+                    used.append(http)
+                time.sleep(0.0001)
+                with lock:
+                    in_use.discard(http)
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(used)) <= 4
+
+
+def test_callers_block_once_every_transport_is_in_use():
+    pool = HttpPool(Transport, size=1)
+    acquired = threading.Event()
+
+    def request():
+        with pool.connection():
+            acquired.set()
+
+    with pool.connection():
+        thread = threading.Thread(target=request)
+        thread.start()
+        assert not acquired.wait(0.05)
+
+    thread.join(1)
+    assert acquired.is_set()
+
+
+def test_failed_transport_creation_frees_its_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise IOError('no credentials')
+        return Transport()
+
+    pool = HttpPool(factory, size=1)
+    with pytest.raises(IOError):
+        with pool.connection():
+            pass
+
+    with pool.connection() as http:
+        assert isinstance(http, Transport)
+
+
+def test_client_is_shared_between_threads(api, dataproc):
+    api.add_cluster('my-cluster')
+    statuses = []
+
+    def status():
+        statuses.append(dataproc.clusters('my-cluster', lazy=True).status(refresh=True))
+
+    threads = [threading.Thread(target=status) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == ['RUNNING'] * 20
+    assert dataproc.http_pool._created <= dataproc.http_pool.size
@@ -0,0 +1,78 @@
+import io
+
+from pydataproc.storage import MemoryStorage, OutputTail, split_gcs_uri
+
+URI = 'gs://bucket/jobs/job-1/driveroutput'
+
+
+class RecordingStorage(MemoryStorage):
+    """Records the offset of every read."""
+
+    def __init__(self):
+        super(RecordingStorage, self).__init__()
+        self.reads = []
+
+    def read(self, bucket, name, start=0):
+        self.reads.append((name, start))
+        return super(RecordingStorage, self).read(bucket, name, start)
+
+
+def test_split_gcs_uri():
+    assert split_gcs_uri('gs://bucket/a/b') == ('bucket', 'a/b')
+
+
+def test_tail_reads_only_new_output():
+    storage = RecordingStorage()
+    tail = OutputTail(storage, URI)
+    assert tail.read_new() == []
+
+    storage.append(URI + '.000000000', b'hello ')
+    assert tail.read_new() == [b'hello ']
+    assert tail.read_new() == []
+
+    storage.append(URI + '.000000000', b'world\n')
+    storage.append(URI + '.000000001', b'more\n')
+    assert tail.read_new() == [b'world\n', b'more\n']
+
+    assert storage.reads == [('jobs/job-1/driveroutput.000000000', 0),
+                             ('jobs/job-1/driveroutput.000000000', 6),
+                             ('jobs/job-1/driveroutput.000000001', 0)]
+
+
+def test_wait_streams_driver_output(api, dataproc, waiter):
+    api.add_cluster('my-cluster')
+    job = dataproc.clusters('my-cluster').submit_job('gs://bucket/job.py', job_id='job-1')
+    output = io.StringIO()
+
+    assert job.wait(output=output, waiter=waiter) == 'DONE'
+
+    assert 'Running job job-1\nJob job-1 finished\n' in output.getvalue()
+
+
+def test_wait_without_streaming(api, dataproc, waiter):
+    api.job_outcome = lambda job: 'ERROR'
+    api.add_cluster('my-cluster')
+    job = dataproc.clusters('my-cluster').submit_job('gs://bucket/job.py')
+
+    assert job.wait(stream_logs=False, waiter=waiter) == 'ERROR'
+
+
+def test_iter_output_decodes_characters_split_across_reads(api, dataproc, waiter):
+    job = api.add_job('job-1', state='RUNNING')
+    uri = job['driverOutputResourceUri'] + '.000000000'
+    snowman = u'\u2603'.encode('utf-8')
+    api.storage.append(uri, b'a' + snowman[:1])
+
+    output = dataproc.jobs('job-1').iter_output(waiter=waiter)
+    assert next(output) == u'a'
+
+    api.storage.append(uri, snowman[1:] + b'b')
+    job['status']['state'] = 'DONE'
+    assert list(output) == [u'\u2603b']
+
+
+def test_iter_output_without_follow_returns_output_so_far(api, dataproc):
+    job = api.add_job('job-1', state='RUNNING')
+    api.storage.append(job['driverOutputResourceUri'] + '.000000000', b'partial\n')
+
+    assert list(dataproc.jobs('job-1').iter_output(follow=False)) == [u'partial\n']
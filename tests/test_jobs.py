@@ -0,0 +1,80 @@
+import pytest
+
+from pydataproc.errors import NoSuchJobException
+from pydataproc.jobs import JobGroup, wait_all
+
+GET_JOB = 'dataproc.projects.regions.jobs.get'
+
+
+@pytest.fixture
+def cluster(api, dataproc):
+    api.add_cluster('my-cluster')
+    return dataproc.clusters('my-cluster')
+
+
+def submit(cluster, job_id):
+    return cluster.submit_job('gs://bucket/job.py', job_id=job_id)
+
+
+def test_wait_all_returns_final_states(api, cluster, waiter):
+    api.job_outcome = lambda job: 'ERROR' if job['reference']['jobId'] == 'job-2' else 'DONE'
+    jobs = [submit(cluster, 'job-{}'.format(i)) for i in range(3)]
+
+    assert wait_all(jobs, waiter) == {'job-0': 'DONE', 'job-1': 'DONE', 'job-2': 'ERROR'}
+
+
+def test_jobs_are_polled_together(api, dataproc, cluster, waiter):
+    jobs = [submit(cluster, 'job-{}'.format(i)) for i in range(20)]
+
+    JobGroup(dataproc, jobs).wait_all(waiter)
+    # each poll is a single batch, rather than a call per job
+    assert api.calls['batch'] < api.calls[GET_JOB]
+
+
+def test_as_completed_yields_jobs_in_order_of_completion(api, dataproc, waiter):
+    api.add_job('finished', state='DONE')
+    api.add_job('running', state='RUNNING')
+    group = JobGroup(dataproc, [dataproc.jobs('running'), dataproc.jobs('finished')])
+
+    completed = group.as_completed(waiter)
+    assert next(completed).job_id == 'finished'
+
+    api.jobs_by_id['running']['status']['state'] = 'DONE'
+    assert [job.job_id for job in completed] == ['running']
+
+
+def test_fail_fast_cancels_remaining_jobs(api, dataproc, cluster, waiter):
+    api.job_run_time = 60
+    api.add_job('failed', state='ERROR')
+    jobs = [dataproc.jobs('failed')] + [submit(cluster, 'job-{}'.format(i)) for i in range(2)]
+
+    states = wait_all(jobs, waiter, fail_fast=True)
+
+    assert states == {'failed': 'ERROR', 'job-0': 'CANCELLED', 'job-1': 'CANCELLED'}
+
+
+def test_fail_fast_tolerates_jobs_finishing_before_cancel(api, dataproc, waiter):
+    api.add_job('failed', state='ERROR')
+    api.add_job('running', state='RUNNING')
+    api.inject_error(400, 'dataproc.projects.regions.jobs.cancel')
+    group = JobGroup(dataproc, [dataproc.jobs('failed'), dataproc.jobs('running')])
+
+    completed = group.as_completed(waiter, fail_fast=True)
+    assert next(completed).job_id == 'failed'
+
+    api.jobs_by_id['running']['status']['state'] = 'DONE'
+    assert [job.job_id for job in completed] == ['running']
+
+
+def test_transient_poll_errors_are_retried(api, dataproc, waiter, retry_policy):
+    api.add_job('job-1', state='DONE')
+    # more failures than the batch's own retries cover
+    api.inject_error(503, GET_JOB, count=retry_policy.max_attempts)
+
+    assert wait_all([dataproc.jobs('job-1', lazy=True)], waiter) == {'job-1': 'DONE'}
+
+
+def test_missing_jobs_raise(dataproc, waiter):
+    with pytest.raises(NoSuchJobException):
+        wait_all([dataproc.jobs('missing', lazy=True)], waiter)
+
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+import pytest
+
+from pydataproc.errors import RegionsFailedException
+from pydataproc.multiregion import MultiRegionDataProc
+from pydataproc.testing import FakeDataProc, FakeDataProcAPI
+
+LIST_CLUSTERS = 'dataproc.projects.regions.clusters.list'
+
+
+class FakeMultiRegionDataProc(MultiRegionDataProc):
+
+    def __init__(self, apis, **kwargs):
+        super(FakeMultiRegionDataProc, self).__init__('fake-project', list(apis), **kwargs)
+        # a fake API per region, so that errors can be injected into one region
+        for region, dataproc in self._dataprocs.items():
+            dataproc.api = apis[region]
+            dataproc._client = None
+
+    def _build_dataproc(self, region, zone, **kwargs):
+        return FakeDataProc(region=region, zone=zone, **kwargs)
+
+
+@pytest.fixture
+def apis():
+    return OrderedDict([('europe-west1', FakeDataProcAPI()), ('us-central1', FakeDataProcAPI())])
+
+
+@pytest.fixture
+def fleet(apis, retry_policy):
+    with FakeMultiRegionDataProc(apis, retry_policy=retry_policy) as fleet:
+        yield fleet
+
+
+def test_listings_are_merged(apis, fleet):
+    apis['europe-west1'].add_cluster('a')
+    apis['us-central1'].add_cluster('b')
+
+    assert fleet.list_clusters() == {('europe-west1', 'a'): 'RUNNING',
+                                     ('us-central1', 'b'): 'RUNNING'}
+    assert fleet.clusters('b').dataproc.region == 'us-central1'
+
+
+def test_partial_failures_keep_other_regions_results(apis, fleet):
+    apis['europe-west1'].add_cluster('a')
+    apis['us-central1'].inject_error(403, LIST_CLUSTERS)
+
+    with pytest.raises(RegionsFailedException) as raised:
+        fleet.list_clusters()
+
+    assert list(raised.value.errors) == ['us-central1']
+    assert raised.value.results == {('europe-west1', 'a'): 'RUNNING'}
+
+
+def test_region_of(apis, fleet):
+    apis['us-central1'].add_cluster('b')
+
+    assert fleet.region_of(cluster_name='b') == 'us-central1'
+    assert fleet.region_of(cluster_name='missing') is None
@@ -0,0 +1,85 @@
+import pytest
+
+from pydataproc.errors import NoSuchOperationException, OperationFailedException
+from pydataproc.operation import wait_all
+
+GET_OPERATION = 'dataproc.projects.regions.operations.get'
+
+
+def create(dataproc, cluster_name):
+    return dataproc.clusters().create(cluster_name, block=False).operation
+
+
+def test_operations_describe_themselves(dataproc):
+    operation = create(dataproc, 'my-cluster')
+
+    assert operation.cluster_name == 'my-cluster'
+    assert operation.operation_type == 'CREATE'
+    assert operation.description == "creation of cluster 'my-cluster'"
+
+
+def test_result_waits_for_the_operation(api, dataproc, waiter):
+    operation = create(dataproc, 'my-cluster')
+
+    assert operation.result(waiter=waiter) == {}
+    assert operation.done()
+    assert api.clusters_by_name['my-cluster']['status']['state'] == 'RUNNING'
+
+
+def test_finished_operations_are_not_fetched_again(api, dataproc, waiter):
+    operation = create(dataproc, 'my-cluster').wait(waiter=waiter)
+    calls = api.calls[GET_OPERATION]
+
+    assert operation.done()
+    assert operation.info(refresh=True)['done']
+    assert api.calls[GET_OPERATION] == calls
+
+
+def test_failed_operations_raise(api, dataproc, waiter):
+    api.cluster_outcome = lambda cluster: 'ERROR'
+    operation = create(dataproc, 'my-cluster')
+
+    with pytest.raises(OperationFailedException, match="Creation of cluster 'my-cluster'"):
+        operation.result(waiter=waiter)
+    assert operation.error()['message'] == 'Cluster failed to start'
+
+
+def test_cancel(api, dataproc, waiter):
+    operation = create(dataproc, 'my-cluster')
+
+    operation.cancel()
+
+    with pytest.raises(OperationFailedException, match='Operation cancelled'):
+        operation.result(waiter=waiter)
+    assert api.clusters_by_name['my-cluster']['status']['state'] == 'ERROR'
+
+
+def test_missing_operations_raise(dataproc):
+    operation = dataproc.operations('projects/fake/regions/fake/operations/missing')
+
+    with pytest.raises(NoSuchOperationException):
+        operation.info()
+    with pytest.raises(NoSuchOperationException):
+        operation.cancel()
+
+
+def test_wait_all_polls_operations_together(api, dataproc, waiter):
+    api.cluster_outcome = lambda cluster: 'ERROR' if cluster['clusterName'] == 'c-1' else 'RUNNING'
+    operations = [create(dataproc, 'c-{}'.format(i)) for i in range(3)]
+
+    wait_all(operations, waiter)
+
+    assert all(operation.done(refresh=False) for operation in operations)
+    assert [operation.error() is None for operation in operations] == [True, False, True]
+    # each poll is a single batch, rather than a call per operation
+    assert api.calls['batch'] < api.calls[GET_OPERATION]
+
+
+def test_list_operations(api, dataproc, waiter):
+    create(dataproc, 'c-1').wait(waiter=waiter)
+    running = create(dataproc, 'c-2')
+
+    operations = dataproc.operations().list()
+    assert sorted(op.cluster_name for op in operations.values()) == ['c-1', 'c-2']
+    assert list(dataproc.operations().list(cluster_name='c-2')) == [running.name]
+    assert list(dataproc.operations().list(running=True)) == [running.name]
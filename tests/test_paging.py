@@ -0,0 +1,62 @@
+import itertools
+
+LIST_CLUSTERS = 'dataproc.projects.regions.clusters.list'
+LIST_JOBS = 'dataproc.projects.regions.jobs.list'
+
+
+def add_jobs(api, count, state='DONE'):
+    for i in range(count):
+        api.add_job('job-{}'.format(i), state=state)
+
+
+def test_iter_jobs_pages_through_every_job(api, dataproc):
+    add_jobs(api, 25)
+
+    job_ids = [j['reference']['jobId'] for j in
+               dataproc.jobs().iter_jobs(running=False, page_size=10)]
+
+    assert sorted(job_ids) == sorted('job-{}'.format(i) for i in range(25))
+    assert api.calls[LIST_JOBS] == 3
+
+
+def test_iter_jobs_only_fetches_pages_as_consumed(api, dataproc):
+    add_jobs(api, 25)
+    jobs = dataproc.jobs().iter_jobs(running=False, page_size=10)
+    assert LIST_JOBS not in api.calls
+
+    list(itertools.islice(jobs, 10))
+    assert api.calls[LIST_JOBS] == 1
+    next(jobs)
+    assert api.calls[LIST_JOBS] == 2
+
+
+def test_iter_pages_resumes_from_a_page_token(api, dataproc):
+    add_jobs(api, 25)
+    pages = dataproc.jobs().iter_pages(running=False, page_size=10)
+    first, page_token = next(pages)
+
+    resumed = dataproc.jobs().iter_pages(running=False, page_size=10, page_token=page_token)
+
+    assert [len(jobs) for jobs, _ in resumed] == [10, 5]
+    assert first[0]['reference']['jobId'] == 'job-24'
+
+
+def test_list_stops_at_count(api, dataproc):
+    add_jobs(api, 50, state='RUNNING')
+
+    assert len(dataproc.jobs().list(count=15)) == 15
+    assert api.calls[LIST_JOBS] == 1
+
+
+def test_iter_clusters(api, dataproc):
+    api.max_page_size = 2
+    for i in range(5):
+        api.add_cluster('cluster-{}'.format(i))
+
+    clusters = dataproc.clusters().iter_clusters()
+    assert next(clusters)['clusterName'] == 'cluster-0'
+    assert api.calls[LIST_CLUSTERS] == 1
+
+    assert len(list(clusters)) == 4
+    assert api.calls[LIST_CLUSTERS] == 3
+    assert len(dataproc.clusters().list()) == 5
@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pydataproc.errors import ClusterPoolClosedException, WaitTimeoutException
+from pydataproc.pool import ClusterPool
+
+CREATE_CLUSTER = 'dataproc.projects.regions.clusters.create'
+
+
+@pytest.fixture
+def pool(dataproc, waiter):
+    pool = ClusterPool(dataproc, size=1, max_size=2, maintenance_interval=None,
+                       name_prefix='test-pool', waiter=waiter)
+    yield pool
+    pool.close()
+
+
+def set_state(api, cluster, state):
+    api.clusters_by_name[cluster.cluster_name]['status']['state'] = state
+
+
+def test_lease_and_release(pool):
+    with pool.start():
+        cluster = pool.lease(timeout=5)
+        assert cluster.cluster_name.startswith('test-pool-')
+        assert pool.counts() == {'idle': 0, 'leased': 1, 'creating': 0}
+
+        pool.release(cluster)
+        assert pool.counts() == {'idle': 1, 'leased': 0, 'creating': 0}
+        assert pool.lease(timeout=5) is cluster
+
+
+def test_pool_grows_up_to_max_size(pool):
+    pool.start()
+    clusters = [pool.lease(timeout=5), pool.lease(timeout=5)]
+
+    assert len(set(c.cluster_name for c in clusters)) == 2
+    with pytest.raises(WaitTimeoutException):
+        pool.lease(timeout=0.05)
+
+
+def test_clusters_in_error_are_replaced_on_release(api, pool):
+    pool.start()
+    cluster = pool.lease(timeout=5)
+    set_state(api, cluster, 'ERROR')
+
+    pool.release(cluster)
+
+    assert pool.counts()['idle'] == 0
+    replacement = pool.lease(timeout=5)
+    assert replacement.cluster_name != cluster.cluster_name
+
+
+def test_updating_clusters_are_kept(api, pool):
+    pool.start()
+    cluster = pool.lease(timeout=5)
+    set_state(api, cluster, 'UPDATING')
+
+    pool.release(cluster)
+
+    assert pool.counts() == {'idle': 1, 'leased': 0, 'creating': 0}
+    # as if the update finished, so the cluster can be deleted
+    set_state(api, cluster, 'RUNNING')
+
+
+def test_maintain_replaces_idle_clusters_that_have_gone(api, pool):
+    pool.start()
+    cluster = pool.lease(timeout=5)
+    pool.release(cluster)
+    del api.clusters_by_name[cluster.cluster_name]
+
+    pool.maintain()
+
+    assert pool.lease(timeout=5).cluster_name != cluster.cluster_name
+
+
+def test_maintain_after_close_creates_nothing(api, pool):
+    pool.start()
+    pool.release(pool.lease(timeout=5))
+    pool.close()
+    creates = api.calls[CREATE_CLUSTER]
+
+    pool.maintain()
+
+    assert pool.counts() == {'idle': 0, 'leased': 0, 'creating': 0}
+    assert api.calls[CREATE_CLUSTER] == creates
+
+
+def test_close_deletes_clusters(api, pool):
+    pool.start()
+    cluster = pool.lease(timeout=5)
+    pool.close()
+
+    with pytest.raises(ClusterPoolClosedException):
+        pool.lease(timeout=5)
+
+    pool.release(cluster)
+    assert api.clusters_by_name[cluster.cluster_name]['status']['state'] == 'DELETING'
+
+
+def test_close_skips_queued_creations(api, dataproc, waiter):
+    api.cluster_create_time = 0.1
+    pool = ClusterPool(dataproc, size=2, maintenance_interval=None, name_prefix='test-pool',
+                       waiter=waiter)
+    # a single worker, so the second creation is queued behind the first
+    pool._executor = ThreadPoolExecutor(max_workers=1)
+
+    pool.start()
+    pool.close()
+    pool._executor.shutdown(wait=True)
+
+    assert api.calls.get(CREATE_CLUSTER, 0) <= 1
+    assert pool.counts() == {'idle': 0, 'leased': 0, 'creating': 0}
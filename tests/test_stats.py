@@ -0,0 +1,66 @@
+from pydataproc.stats import CallEvent, Histogram, Stats
+
+GET_JOB = 'dataproc.projects.regions.jobs.get'
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    histogram = Histogram()
+    for latency in (0.001, 0.02, 0.02, 0.3):
+        histogram.observe(latency)
+
+    assert histogram.percentile(25) == 0.005
+    assert histogram.percentile(50) == 0.025
+    # capped at the largest value seen
+    assert histogram.percentile(99) == 0.3
+    assert Histogram().percentile(50) is None
+
+
+def test_snapshot_counts_calls_errors_and_retries():
+    stats = Stats()
+    stats.record(CallEvent('get', 0.01, 200, 0))
+    stats.record(CallEvent('get', 0.02, 503, 2))
+    stats.record(CallEvent('get', 0.03, None, 1))
+
+    snapshot = stats.snapshot()['get']
+    assert (snapshot['calls'], snapshot['errors'], snapshot['retries']) == (3, 2, 3)
+    assert snapshot['statuses'] == {200: 1, 503: 1, None: 1}
+    assert snapshot['latency']['count'] == 3
+    assert stats.total_calls == 3
+
+
+def test_scope_only_collects_calls_within_it():
+    stats = Stats()
+    stats.record(CallEvent('get', 0.01, 200, 0))
+    with stats.scope() as scoped:
+        stats.record(CallEvent('list', 0.01, 200, 0))
+    stats.record(CallEvent('get', 0.01, 200, 0))
+
+    assert list(scoped.snapshot()) == ['list']
+    assert stats.total_calls == 3
+
+
+def test_dataproc_records_api_calls(api, dataproc):
+    api.add_job('job-1')
+    api.inject_error(503, GET_JOB)
+
+    with dataproc.measure() as measured:
+        dataproc.jobs('job-1')
+
+    calls = dataproc.stats()['calls'][GET_JOB]
+    assert (calls['calls'], calls['retries'], calls['statuses']) == (1, 1, {200: 1})
+    assert measured.total_calls == 1
+
+
+def test_failing_stats_hooks_are_logged(api, dataproc, caplog):
+    events = []
+
+    def broken(event):
+        raise ValueError('broken hook')
+
+    dataproc.add_stats_hook(broken)
+    dataproc.add_stats_hook(events.append)
+    api.add_job('job-1')
+
+    assert dataproc.jobs('job-1').status() == 'DONE'
+    assert [event.operation for event in events] == [GET_JOB]
+    assert 'broken hook' in caplog.text
@@ -0,0 +1,82 @@
+import pytest
+
+from googleapiclient.errors import HttpError
+
+SUBMIT_JOB = 'dataproc.projects.regions.jobs.submit'
+
+
+@pytest.fixture
+def cluster(api, dataproc):
+    api.add_cluster('my-cluster')
+    return dataproc.clusters('my-cluster')
+
+
+def test_submit_job_sets_ids(api, cluster):
+    job = cluster.submit_job('gs://bucket/job.py', job_id='my-job')
+
+    assert job.job_id == 'my-job'
+    assert list(api.jobs_by_id) == ['my-job']
+
+
+def test_failed_submissions_are_retried_without_duplicating_the_job(api, cluster):
+    api.inject_error(503, SUBMIT_JOB)
+
+    job = cluster.submit_job('gs://bucket/job.py')
+
+    assert api.calls[SUBMIT_JOB] == 2
+    assert list(api.jobs_by_id) == [job.job_id]
+
+
+def test_resubmitting_a_request_returns_the_same_job(api, cluster):
+    job_details = cluster.submit_job('gs://bucket/job.py').info()
+    body = {'job': {'placement': job_details['placement'],
+                    'pysparkJob': job_details['pysparkJob']},
+            'requestId': 'my-request'}
+
+    first = cluster.submit_job(job_details=body)
+    second = cluster.submit_job(job_details=body)
+
+    assert first.job_id == second.job_id
+    assert len(api.jobs_by_id) == 2
+
+
+def test_submit_jobs_returns_jobs_in_order(api, cluster):
+    specs = [{'file_to_run': 'gs://bucket/job.py', 'job_id': 'job-{}'.format(i)}
+             for i in range(5)]
+
+    jobs = cluster.submit_jobs(specs, max_workers=3)
+
+    assert [job.job_id for job in jobs] == ['job-{}'.format(i) for i in range(5)]
+    assert sorted(api.jobs_by_id) == ['job-{}'.format(i) for i in range(5)]
+
+
+def test_submit_jobs_returns_errors_per_spec(api, cluster):
+    api.add_job('taken', cluster_name='my-cluster')
+    specs = [
+        {'file_to_run': 'gs://bucket/job.py', 'job_id': 'job-0'},
+        {'file_to_run': 'gs://bucket/job.py', 'job_id': 'taken'},
+        {'file_to_run': 'gs://bucket/job.py', 'job_id': 'job-2'}
+    ]
+
+    jobs = cluster.submit_jobs(specs)
+
+    assert jobs[0].job_id == 'job-0'
+    assert isinstance(jobs[1], HttpError) and jobs[1].resp['status'] == '409'
+    assert jobs[2].job_id == 'job-2'
+
+
+def test_submit_jobs_isolates_invalid_specs(api, cluster):
+    specs = [
+        {'file_to_run': 'gs://bucket/job.py', 'job_id': 'job-0'},
+        {'job_id': 'no-file'},
+        {'file_to_run': 'gs://bucket/job.py', 'no_such_argument': True},
+        {'file_to_run': 'gs://bucket/job.py', 'job_id': 'job-3'}
+    ]
+
+    jobs = cluster.submit_jobs(specs)
+
+    assert jobs[0].job_id == 'job-0'
+    assert isinstance(jobs[1], AssertionError)
+    assert isinstance(jobs[2], TypeError)
+    assert jobs[3].job_id == 'job-3'
+    assert sorted(api.jobs_by_id) == ['job-0', 'job-3']
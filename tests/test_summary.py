@@ -0,0 +1,83 @@
+import pytest
+
+from pydataproc.summary import ClusterSummary, JobSummary, to_columns
+
+JOB = {
+    'reference': {'jobId': 'job-1'},
+    'placement': {'clusterName': 'my-cluster'},
+    'status': {'state': 'DONE', 'stateStartTime': '2020-01-01T00:00:00Z'},
+    'pysparkJob': {'mainPythonFileUri': 'gs://bucket/job.py'},
+    'driverOutputResourceUri': 'gs://bucket/output',
+    'labels': {'team': 'data'}
+}
+
+
+def test_job_summary_from_resource():
+    summary = JobSummary.from_resource(JOB)
+
+    assert summary.as_tuple() == ('job-1', 'my-cluster', 'DONE', '2020-01-01T00:00:00Z',
+                                  'pyspark', 'gs://bucket/output', {'team': 'data'})
+    assert summary.raw is None
+    assert JobSummary.from_resource(JOB, keep_raw=True).raw is JOB
+
+
+def test_cluster_summary_from_resource():
+    cluster = {
+        'clusterName': 'my-cluster',
+        'status': {'state': 'RUNNING'},
+        'config': {'workerConfig': {'numInstances': 3}}
+    }
+
+    summary = ClusterSummary.from_resource(cluster)
+
+    assert summary.as_tuple() == ('my-cluster', 'RUNNING', None, 3, 0, {})
+
+
+def test_summaries_have_no_instance_dict():
+    summary = JobSummary.from_resource(JOB)
+
+    assert not hasattr(summary, '__dict__')
+    with pytest.raises(AttributeError):
+        summary.unknown = 1
+
+
+def test_summaries_compare_by_value():
+    assert JobSummary.from_resource(JOB) == JobSummary.from_resource(JOB, keep_raw=True)
+    assert JobSummary.from_resource(JOB) != JobSummary('job-1', 'my-cluster', 'ERROR')
+
+
+def test_to_columns():
+    summaries = [JobSummary('job-1', 'c-1', 'DONE'), JobSummary('job-2', 'c-2', 'ERROR')]
+
+    columns = to_columns(summaries, fields=['job_id', 'state'])
+
+    assert list(columns.items()) == [('job_id', ['job-1', 'job-2']),
+                                     ('state', ['DONE', 'ERROR'])]
+    assert list(to_columns(summaries)) == list(JobSummary.FIELDS)
+    assert to_columns([]) == {}
+
+
+def test_jobs_summaries_fetch_only_summary_fields(api, dataproc):
+    api.add_job('job-1', cluster_name='my-cluster', state='RUNNING',
+                pysparkJob={'mainPythonFileUri': 'gs://bucket/job.py', 'args': ['-v']})
+    api.add_job('job-2', cluster_name='my-cluster', state='DONE')
+
+    summaries = dataproc.jobs().summaries()
+
+    assert [(s.job_id, s.state, s.job_type) for s in summaries] == [('job-1', 'RUNNING',
+                                                                     'pyspark')]
+    assert summaries[0].raw is None
+
+    raw = dataproc.jobs().summaries(keep_raw=True)[0].raw
+    assert raw['pysparkJob']['args'] == ['-v']
+
+
+def test_clusters_summaries(api, dataproc):
+    api.add_cluster('c-1', workerConfig={'numInstances': 2}, labels={'team': 'data'})
+    api.add_cluster('c-2', secondaryWorkerConfig={'numInstances': 4})
+
+    summaries = sorted(dataproc.clusters().summaries(), key=lambda s: s.cluster_name)
+
+    assert [(s.cluster_name, s.workers, s.secondary_workers) for s in summaries] == \
+        [('c-1', 2, 0), ('c-2', 0, 4)]
+    assert summaries[0].labels == {'team': 'data'}
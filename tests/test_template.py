@@ -0,0 +1,93 @@
+import pytest
+
+from pydataproc.template import JobTemplate, parse_args
+
+
+def test_parse_args_splits_like_a_shell():
+    assert parse_args('--day 1 --name "daily report"') == ['--day', '1', '--name', 'daily report']
+    assert parse_args(['--day', 1]) == ['--day', '1']
+    assert parse_args(None) == []
+
+
+@pytest.mark.parametrize('args', [5, ['--day', None], {'day': 1}])
+def test_parse_args_rejects_other_types(args):
+    with pytest.raises(TypeError):
+        parse_args(args)
+
+
+def test_render():
+    template = JobTemplate('pyspark', mainPythonFileUri='gs://bucket/job.py', args='--day 1',
+                           properties={'spark.executor.memory': '4g'}, labels={'team': 'data'},
+                           max_failures_per_hour=2)
+
+    assert template.render('my-project', 'my-cluster') == {
+        'projectId': 'my-project',
+        'job': {
+            'placement': {'clusterName': 'my-cluster'},
+            'pysparkJob': {
+                'mainPythonFileUri': 'gs://bucket/job.py',
+                'args': ['--day', '1'],
+                'properties': {'spark.executor.memory': '4g'}
+            },
+            'labels': {'team': 'data'},
+            'scheduling': {'maxFailuresPerHour': 2}
+        }
+    }
+
+
+def test_render_overrides():
+    template = JobTemplate('hive', queryList=['SELECT 1'], scriptVariables={'a': '1'})
+
+    job = template.render('p', 'c', scriptVariables={'b': 2}, labels={'run': 3})['job']
+    assert job['hiveJob'] == {'queryList': {'queries': ['SELECT 1']},
+                              'scriptVariables': {'a': '1', 'b': '2'}}
+    assert job['labels'] == {'run': '3'}
+
+    job = template.render('p', 'c', queryFileUri='gs://bucket/q.sql', scriptVariables=None)['job']
+    assert job['hiveJob'] == {'queryFileUri': 'gs://bucket/q.sql'}
+
+
+@pytest.mark.parametrize('job_type, config', [
+    ('flink', {'mainJarFileUri': 'gs://bucket/job.jar'}),
+    ('spark', {}),
+    ('spark', {'mainClass': 'Main', 'mainJarFileUri': 'gs://bucket/job.jar'}),
+    ('pyspark', {'mainPythonFileUri': 'gs://bucket/job.py', 'mainClass': 'Main'}),
+    ('pyspark', {'mainPythonFileUri': 'gs://bucket/job.py', 'max_failures_per_hour': -1}),
+])
+def test_invalid_templates_raise_value_error(job_type, config):
+    with pytest.raises(ValueError):
+        JobTemplate(job_type, **config)
+
+
+@pytest.mark.parametrize('job_type, config', [
+    ('hive', {'queryList': 'SELECT 1'}),
+    ('hive', {'queryList': {'query': ['SELECT 1']}}),
+    ('pyspark', {'mainPythonFileUri': 'gs://bucket/job.py', 'args': 5}),
+    ('pyspark', {'mainPythonFileUri': 'gs://bucket/job.py', 'jarFileUris': 'gs://bucket/a.jar'}),
+    ('pyspark', {'mainPythonFileUri': 'gs://bucket/job.py', 'properties': 'a=b'}),
+    ('pyspark', {'mainPythonFileUri': 5}),
+])
+def test_wrongly_typed_fields_raise_type_error(job_type, config):
+    with pytest.raises(TypeError):
+        JobTemplate(job_type, **config)
+
+
+def test_overrides_are_validated():
+    template = JobTemplate('pyspark', mainPythonFileUri='gs://bucket/job.py')
+
+    with pytest.raises(ValueError):
+        template.render('p', 'c', mainClass='Main')
+    with pytest.raises(TypeError):
+        template.render('p', 'c', properties='a=b')
+
+
+def test_submit_many(api, dataproc):
+    api.add_cluster('my-cluster')
+    template = JobTemplate('pyspark', mainPythonFileUri='gs://bucket/job.py')
+
+    jobs = template.submit_many(dataproc.clusters('my-cluster'), [
+        {'args': ['--day', day], 'job_id': 'day-{}'.format(day)} for day in range(3)
+    ])
+
+    assert [job.job_id for job in jobs] == ['day-0', 'day-1', 'day-2']
+    assert api.jobs_by_id['day-2']['pysparkJob']['args'] == ['--day', '2']
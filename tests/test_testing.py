@@ -0,0 +1,80 @@
+import pytest
+from googleapiclient.errors import HttpError
+
+from pydataproc.testing import FakeDataProcAPI
+
+
+def list_jobs(api, **params):
+    return api.jobs().list(projectId='fake', region='global', **params).execute()
+
+
+def test_lists_are_paginated(api):
+    api.max_page_size = 2
+    for i in range(5):
+        api.add_job('job-{}'.format(i))
+
+    pages, page_token = [], None
+    while True:
+        page = list_jobs(api, pageToken=page_token)
+        pages.append([job['reference']['jobId'] for job in page['jobs']])
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            break
+
+    # newest first, as the API returns them
+    assert pages == [['job-4', 'job-3'], ['job-2', 'job-1'], ['job-0']]
+
+
+def test_responses_are_trimmed_to_fields(api):
+    api.add_job('job-1', cluster_name='my-cluster')
+
+    page = list_jobs(api, fields='jobs(reference.jobId,status.state)')
+
+    assert page == {'jobs': [{'reference': {'jobId': 'job-1'}, 'status': {'state': 'DONE'}}]}
+
+
+def test_lists_are_filtered(api):
+    api.add_job('running', state='RUNNING', labels={'env': 'prod'})
+    api.add_job('done', state='DONE', labels={'env': 'prod'})
+
+    page = list_jobs(api, filter='status.state = ACTIVE AND labels.env = prod')
+
+    assert [job['reference']['jobId'] for job in page['jobs']] == ['running']
+
+
+def test_injected_errors_fail_matching_requests(api):
+    api.add_job('job-1')
+    api.inject_error(429, 'dataproc.projects.regions.jobs.list', retry_after=3)
+
+    api.jobs().get(projectId='fake', region='global', jobId='job-1').execute()
+    with pytest.raises(HttpError) as raised:
+        list_jobs(api)
+    assert raised.value.resp['status'] == '429'
+    assert raised.value.resp['retry-after'] == '3'
+    assert list_jobs(api)['jobs']
+
+
+def test_clusters_go_through_their_lifecycle(dataproc, waiter):
+    cluster = dataproc.clusters().create('my-cluster', block=False)
+    assert cluster.status() == 'CREATING'
+
+    cluster.operation.result(waiter=waiter)
+    assert cluster.status(refresh=True) == 'RUNNING'
+
+    cluster.delete(block=True, waiter=waiter)
+    assert 'my-cluster' not in dataproc.api.clusters_by_name
+
+
+def test_jobs_end_in_their_outcome(waiter):
+    api = FakeDataProcAPI(job_run_time=0.01)
+    api.job_outcome = lambda job: 'ERROR'
+    api.add_cluster('my-cluster')
+    api.jobs().submit(projectId='fake', region='global', body={
+        'job': {'reference': {'jobId': 'job-1'}, 'placement': {'clusterName': 'my-cluster'}}
+    }).execute()
+
+    job = waiter.wait(
+        lambda: api.jobs().get(projectId='fake', region='global', jobId='job-1').execute(),
+        lambda job: job['status']['state'] not in ('PENDING', 'RUNNING'))
+
+    assert job['status']['state'] == 'ERROR'
@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from pydataproc.batch import execute_batched
+from pydataproc.testing import FakeDataProc, FakeDataProcAPI
+from pydataproc.transport import RetryPolicy, TokenBucket, rate_limiter_for
+
+GET_JOB = 'dataproc.projects.regions.jobs.get'
+
+
+class FakeTime(object):
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_retry_policy_retries_transient_statuses():
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.should_retry(1, 503)
+    assert policy.should_retry(1, 429)
+    assert policy.should_retry(1)
+    assert not policy.should_retry(1, 404)
+    assert not policy.should_retry(3, 503)
+
+
+def test_retry_policy_backs_off_exponentially():
+    policy = RetryPolicy(initial_backoff=1, max_backoff=5, random=lambda: 1)
+
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [1, 2, 4, 5, 5]
+
+
+def test_retry_policy_honours_retry_after():
+    policy = RetryPolicy(initial_backoff=1, random=lambda: 1)
+
+    assert policy.delay(1, '10') == 10
+    # an HTTP date falls back to the backoff
+    assert policy.delay(2, 'Wed, 21 Oct 2015 07:28:00 GMT') == 2
+
+
+def test_token_bucket_allows_bursts_then_limits_rate():
+    time = FakeTime()
+    bucket = TokenBucket(rate=2, burst=3, clock=time.clock, sleep=time.sleep)
+
+    for _ in range(3):
+        bucket.acquire()
+    assert time.sleeps == []
+
+    bucket.acquire()
+    bucket.acquire()
+    assert time.sleeps == [0.5, 0.5]
+
+
+def test_rate_limiter_is_shared_per_project():
+    limiter = rate_limiter_for('test-shared-project', 5)
+
+    assert rate_limiter_for('test-shared-project', 5) is limiter
+    assert rate_limiter_for('test-other-project', 5) is not limiter
+
+
+def test_rate_limiter_is_separate_per_limit():
+    limiter = rate_limiter_for('test-limits-project', 5)
+
+    assert rate_limiter_for('test-limits-project', 5, burst=5) is limiter
+    assert rate_limiter_for('test-limits-project', 10) is not limiter
+    assert rate_limiter_for('test-limits-project', 5, burst=20) is not limiter
+
+
+def test_gets_are_retried(api, dataproc):
+    api.add_job('job-1')
+    api.inject_error(503, GET_JOB, count=2)
+
+    assert dataproc.jobs('job-1').status() == 'DONE'
+    assert dataproc.stats()['calls'][GET_JOB]['retries'] == 2
+
+
+def test_gets_give_up_after_max_attempts(api, dataproc):
+    api.add_job('job-1')
+    api.inject_error(503, GET_JOB, count=3)
+
+    with pytest.raises(HttpError):
+        dataproc.jobs('job-1', lazy=True).status()
+
+
+def test_non_idempotent_requests_are_not_retried(api, dataproc):
+    api.add_job('job-1')
+    api.inject_error(503, GET_JOB)
+
+    with pytest.raises(HttpError):
+        dataproc.execute(api.jobs().get(projectId='fake', region='global', jobId='job-1'),
+                         idempotent=False)
+
+
+def test_batched_requests_retry_transient_failures(api, dataproc):
+    api.add_job('job-1')
+    api.add_job('job-2')
+    api.inject_error(503, GET_JOB)
+
+    results = execute_batched(dataproc, {
+        job_id: api.jobs().get(projectId='fake', region='global', jobId=job_id)
+        for job_id in ('job-1', 'job-2')
+    })
+
+    assert {job_id: error for job_id, (_, error) in results.items()} == \
+        {'job-1': None, 'job-2': None}
+    assert api.calls['batch'] == 2
+
+
+
+def test_slow_gets_are_hedged():
+    released = threading.Event()
+    slow = []
+
+    def sleep(seconds):
+        # the first request after `slow` is set stalls until released
+        if slow and slow.pop():
+            released.wait(5)
+
+    api = FakeDataProcAPI(latency=0.001, sleep=sleep)
+    api.add_job('job-1')
+    with FakeDataProc(api, hedge=True) as dataproc:
+        job = dataproc.jobs('job-1', lazy=True)
+        for _ in range(20):
+            job.status(refresh=True)
+
+        slow.append(True)
+        try:
+            assert job.status(refresh=True) == 'DONE'
+            # answered by the hedged request, while the first is still stalled
+            assert api.calls[GET_JOB] == 21
+        finally:
+            released.set()
@@ -0,0 +1,66 @@
+import pytest
+
+from pydataproc.errors import WaitTimeoutException
+from pydataproc.waiter import Waiter
+
+
+class FakeTime(object):
+    """A clock that only moves when slept on."""
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def fake_waiter(time, **kwargs):
+    return Waiter(clock=time.clock, sleep=time.sleep, random=lambda: 0.5, **kwargs)
+
+
+def test_intervals_back_off_up_to_max():
+    waiter = Waiter(initial_interval=1, max_interval=4, backoff=2, random=lambda: 0.5)
+    delays = waiter.delays()
+
+    assert [next(delays) for _ in range(5)] == [1, 2, 4, 4, 4]
+
+
+def test_intervals_are_jittered():
+    waiter = Waiter(initial_interval=10, jitter=0.1, random=lambda: 1)
+
+    assert next(waiter.delays()) == pytest.approx(11)
+
+
+def test_wait_polls_until_done():
+    time = FakeTime()
+    values = iter(['CREATING', 'CREATING', 'RUNNING'])
+    progress = []
+    waiter = fake_waiter(time, initial_interval=1, backoff=2,
+                         on_progress=lambda value, elapsed: progress.append((value, elapsed)))
+
+    assert waiter.wait(lambda: next(values), lambda value: value == 'RUNNING') == 'RUNNING'
+    assert time.sleeps == [1, 2]
+    assert progress == [('CREATING', 0), ('CREATING', 1), ('RUNNING', 3)]
+
+
+def test_wait_times_out():
+    time = FakeTime()
+    waiter = fake_waiter(time, initial_interval=2, backoff=2, timeout=5)
+
+    with pytest.raises(WaitTimeoutException):
+        waiter.wait(lambda: 'CREATING', lambda value: False, 'cluster to start')
+    # the last sleep is cut short at the deadline
+    assert time.sleeps == [2, 3]
+
+
+def test_ticks_yield_elapsed_time():
+    time = FakeTime()
+    waiter = fake_waiter(time, initial_interval=1, backoff=1)
+
+    ticks = waiter.ticks()
+    assert [next(ticks) for _ in range(3)] == [0, 1, 2]
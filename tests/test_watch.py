@@ -0,0 +1,88 @@
+import pytest
+
+from pydataproc.watch import ADDED, CHANGED, REMOVED
+
+
+def events(watch):
+    return [(event.type, event.name, event.old_state, event.new_state) for event in watch.poll()]
+
+
+def test_first_poll_adds_everything(api, dataproc):
+    api.add_cluster('a')
+    api.add_cluster('b', state='CREATING')
+
+    assert events(dataproc.clusters().watch()) == [
+        (ADDED, 'a', None, 'RUNNING'),
+        (ADDED, 'b', None, 'CREATING')
+    ]
+
+
+def test_polls_yield_only_changes(api, dataproc):
+    api.add_cluster('a')
+    api.add_cluster('b', state='CREATING')
+    watch = dataproc.clusters().watch()
+    watch.poll()
+
+    assert events(watch) == []
+
+    api.clusters_by_name['b']['status']['state'] = 'RUNNING'
+    del api.clusters_by_name['a']
+    api.add_cluster('c')
+
+    assert events(watch) == [
+        (REMOVED, 'a', 'RUNNING', None),
+        (CHANGED, 'b', 'CREATING', 'RUNNING'),
+        (ADDED, 'c', None, 'RUNNING')
+    ]
+
+
+def test_finished_jobs_are_reported_with_their_final_state(api, dataproc):
+    api.add_job('job-1', state='RUNNING')
+    watch = dataproc.jobs().watch(running=True)
+    watch.poll()
+
+    api.jobs_by_id['job-1']['status']['state'] = 'DONE'
+
+    assert events(watch) == [(CHANGED, 'job-1', 'RUNNING', 'DONE')]
+    assert events(watch) == []
+
+
+def test_changes_invalidate_the_cache(api, dataproc):
+    api.add_cluster('a', state='CREATING')
+    cluster = dataproc.clusters('a')
+    watch = dataproc.clusters().watch()
+    watch.poll()
+    assert cluster.status() == 'CREATING'
+
+    api.clusters_by_name['a']['status']['state'] = 'RUNNING'
+    watch.poll()
+
+    assert cluster.status() == 'RUNNING'
+
+
+def test_resumes_from_checkpoint(api, dataproc):
+    api.add_cluster('a', labels={'env': 'prod'})
+    api.add_cluster('b', labels={'env': 'prod'})
+    watch = dataproc.clusters().watch('labels.env = prod')
+    watch.poll()
+    checkpoint = watch.checkpoint()
+
+    api.clusters_by_name['b']['status']['state'] = 'UPDATING'
+    resumed = dataproc.clusters().watch('labels.env = prod', checkpoint=checkpoint)
+
+    assert events(resumed) == [(CHANGED, 'b', 'RUNNING', 'UPDATING')]
+
+
+def test_checkpoint_for_another_watch_is_rejected(dataproc):
+    checkpoint = dataproc.clusters().watch('labels.env = prod').checkpoint()
+
+    with pytest.raises(AssertionError):
+        dataproc.jobs().watch(checkpoint=checkpoint)
+
+
+def test_iterating_polls_until_a_change(api, dataproc, waiter):
+    api.add_cluster('a')
+
+    event = next(iter(dataproc.clusters().watch(waiter=waiter)))
+
+    assert (event.type, event.name) == (ADDED, 'a')